@@ -1,20 +1,40 @@
 import os
+import json
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-import shutil
+import asyncio
+import tempfile
+import threading
+import time
 import uuid
+import secrets
+import shutil
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import random
 
 from config import config
-from services.audio_processor import load_and_preprocess_audio
 from services.ai_classifier import classifier, ANIMALS, EMOTIONS
+from services.audio_processor import warm_up
 from services.nlp_translator import translator
 from services.murf_integration import murf_client
+from services.demo_cache import DemoResponseCache
+from services.pipeline import save_upload, analyze_audio, analyze_timeline, synthesize_speech, process_job
+from services.batch import collect_items, process_batch, shutdown_process_pool
+from services.stream_classifier import StreamingSession
+from services.fingerprint import fingerprint_index
+from services.job_queue import JobStore, JobQueue, QueueFullError, QUEUED, TERMINAL_STATES
+from services.response_cache import CachedJSONResponse, FastJSONResponse
+from services import metrics
+from services.structured_logging import request_id_var
+from services.tracing import tracer, parse_traceparent
+from services.loop_monitor import loop_monitor, run_in_threadpool
+from services.admission import admission, Rejected
+from services.rate_limit import TokenBucketLimiter, client_key, endpoint_cost, parse_networks, resolve_client_ip
+from services.profiler import sample_stacks, format_collapsed, capture_allocations, ProfilerBusyError
 
 # Setup logging
 config.setup_logging()
@@ -60,41 +80,225 @@ app.add_middleware(
 # Ensure temp directory exists
 os.makedirs(config.UPLOAD_DIR, exist_ok=True)
 
-# Request logging middleware
+# Precompute every demo response once
+demo_cache = DemoResponseCache(translator, ANIMALS, EMOTIONS, config.UPLOAD_DIR)
+
+@app.on_event("startup")
+async def prerender_demo_audio():
+    """Warm demo TTS audio in the background so demo requests make no outbound calls"""
+    if config.MURF_API_KEY and config.DEMO_PRERENDER_AUDIO:
+        threading.Thread(
+            target=demo_cache.prerender,
+            args=(murf_client,),
+            name="demo-prerender",
+            daemon=True
+        ).start()
+
+@app.on_event("startup")
+async def warm_up_audio_stack():
+    """Import librosa and compile its kernels in the background, off the first request's path"""
+    if config.WARM_UP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="audio-warm-up", daemon=True).start()
+
+@app.on_event("startup")
+async def load_fingerprint_index():
+    """Index reference clips in the background; lookups are skipped until it is ready"""
+    threading.Thread(
+        target=fingerprint_index.load_directory,
+        args=(config.FINGERPRINT_DIR, config.FINGERPRINT_CACHE_PATH),
+        name="fingerprint-index",
+        daemon=True
+    ).start()
+
+# Async job queue, persisted in SQLite so jobs survive a worker restart
+job_upload_dir = os.path.join(config.JOB_DIR, "uploads")
+os.makedirs(job_upload_dir, exist_ok=True)
+job_store = JobStore(os.path.join(config.JOB_DIR, "jobs.sqlite3"), max_attempts=config.JOB_MAX_ATTEMPTS)
+job_queue = JobQueue(
+    job_store,
+    process_job,
+    workers=config.JOB_WORKERS,
+    max_queued=config.JOB_QUEUE_MAX
+)
+
+@app.on_event("startup")
+async def start_job_queue():
+    """Purge expired jobs and start the worker pool"""
+    purged = job_store.purge(config.JOB_RETENTION_SECONDS)
+    if purged:
+        logger.info("Purged %d expired jobs", purged)
+    job_queue.start()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Watch this worker's event loop for stalls"""
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """Let workers finish their current job before exiting"""
+    job_queue.stop()
+    shutdown_process_pool()
+    loop_monitor.stop()
+
+class ReleaseAfterResponse:
+    """
+    ASGI wrapper that calls `release` once the wrapped response has been
+    sent in full, or has failed or been cancelled while sending.
+    """
+
+    def __init__(self, response, release):
+        self.response = response
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.release()
+
+# Admission control for CPU-heavy endpoints. Registered before log_requests so
+# it runs inside it: shed requests still get an access line and a request ID.
+# Everything else (health, metadata, cached demos) bypasses the limiter.
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = datetime.now()
-    logger.info(f"Request: {request.method} {request.url.path}")
-    
+async def admit_heavy_requests(request: Request, call_next):
+    if not config.ADMISSION_ENABLED or request.url.path not in config.HEAVY_PATHS:
+        return await call_next(request)
+    try:
+        await admission.acquire()
+    except Rejected as e:
+        return FastJSONResponse(
+            content={"status": "error", "message": "Server busy, please retry"},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        admission.release(time.perf_counter() - start)
+        raise
+    # The body (a streamed batch runs entirely inside it) is still to come
+    return ReleaseAfterResponse(response, lambda: admission.release(time.perf_counter() - start))
+
+# Per-client rate limiting. Registered between admission and logging so a
+# limited client is refused before it can take (or queue for) a heavy slot.
+os.makedirs(os.path.dirname(config.RATE_LIMIT_DB) or ".", exist_ok=True)
+rate_limiter = TokenBucketLimiter(config.RATE_LIMIT_DB)
+
+trusted_proxies = parse_networks(config.RATE_LIMIT_TRUSTED_PROXIES)
+
+def client_ip(request: Request) -> Optional[str]:
+    return resolve_client_ip(
+        request.client.host if request.client else None,
+        request.headers.get("x-forwarded-for"),
+        request.headers.get("x-real-ip"),
+        trusted_proxies
+    )
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    cost = endpoint_cost(request.method, request.url.path, config.RATE_LIMIT_COSTS)
+    if not config.RATE_LIMIT_ENABLED or not cost:
+        return await call_next(request)
+    scope, key = client_key(request.headers.get("x-api-key"), client_ip(request), config.API_KEYS)
+    if scope == "key":
+        rate, burst = config.RATE_LIMIT_KEY_RATE, config.RATE_LIMIT_KEY_BURST
+    else:
+        rate, burst = config.RATE_LIMIT_IP_RATE, config.RATE_LIMIT_IP_BURST
+    allowed, remaining, retry_after = rate_limiter.consume(key, cost, rate, burst)
+    if not allowed:
+        metrics.RATE_LIMITED.labels(scope).inc()
+        return FastJSONResponse(
+            content={"status": "error", "message": "Rate limit exceeded"},
+            status_code=429,
+            headers={"Retry-After": str(retry_after), "X-RateLimit-Remaining": "0"}
+        )
     response = await call_next(request)
+    response.headers["X-RateLimit-Remaining"] = str(int(remaining))
+    return response
+
+# Request logging middleware: one access line per request, tagged with its request ID
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    start_time = time.perf_counter()
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
     
-    duration = (datetime.now() - start_time).total_seconds()
-    logger.info(f"Response: {response.status_code} - Duration: {duration:.2f}s")
+    metrics.IN_FLIGHT.inc()
+    loop_monitor.in_flight += 1
+    status = 500
+    trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+    with tracer.start_trace(f"{request.method} {request.url.path}", trace_id=trace_id, parent_id=parent_id,
+                            request_id=request_id) as root_span:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            metrics.IN_FLIGHT.dec()
+            loop_monitor.in_flight -= 1
+            duration = time.perf_counter() - start_time
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = request.scope.get("route")
+            route_path = route.path if route else "unmatched"
+            metrics.REQUEST_SECONDS.labels(request.method, route_path, str(status)).observe(duration)
+            root_span.name = f"{request.method} {route_path}"
+            root_span.set_attribute("http.status_code", status)
+            logger.info("%s %s -> %d in %.3fs", request.method, request.url.path, status, duration)
+            request_id_var.reset(token)
     
+    response.headers["X-Request-ID"] = request_id
+    response.headers["X-Trace-ID"] = root_span.trace.trace_id
     return response
 
+# Metadata only changes on deploy, so serialize it once
+root_response = CachedJSONResponse({
+    "message": "ZooLingo API is running",
+    "status": "active",
+    "version": "1.0.0",
+    "environment": config.ENVIRONMENT,
+    "endpoints": {
+        "health": "/health",
+        "ready": "/ready",
+        "docs": "/docs" if config.ENVIRONMENT != "production" else "disabled",
+        "process_audio": "/api/process-audio",
+        "demo": "/api/demo/{demo_id}",
+        "config": "/api/config"
+    }
+}, max_age=config.METADATA_CACHE_MAX_AGE)
+
+config_response = CachedJSONResponse({
+    "environment": config.ENVIRONMENT,
+    "max_upload_size_mb": config.MAX_UPLOAD_SIZE / (1024 * 1024),
+    "allowed_extensions": sorted(config.ALLOWED_EXTENSIONS),
+    "murf_configured": bool(config.MURF_API_KEY),
+    "supported_animals": translator.get_supported_animals(),
+    "supported_emotions": translator.get_supported_emotions()
+}, max_age=config.METADATA_CACHE_MAX_AGE)
+
+supported_response = CachedJSONResponse({
+    "animals": translator.get_supported_animals(),
+    "emotions": translator.get_supported_emotions()
+}, max_age=config.METADATA_CACHE_MAX_AGE)
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint"""
-    return {
-        "message": "ZooLingo API is running",
-        "status": "active",
-        "version": "1.0.0",
-        "environment": config.ENVIRONMENT,
-        "endpoints": {
-            "health": "/health",
-            "docs": "/docs" if config.ENVIRONMENT != "production" else "disabled",
-            "process_audio": "/api/process-audio",
-            "demo": "/api/demo/{demo_id}",
-            "config": "/api/config"
-        }
-    }
+    return root_response.respond(request)
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for monitoring"""
+    """
+    Liveness check endpoint for monitoring.
+    Always 200 while the process answers, so orchestrators don't restart busy
+    but healthy instances; sustained saturation shows up as "degraded" in the
+    body. Load balancers should use /ready instead.
+    """
+    load = loop_monitor.snapshot()
+    saturation = loop_monitor.saturation(load)
     health_status = {
-        "status": "healthy",
+        "status": "degraded" if saturation else "healthy",
+        "degraded": bool(saturation),
         "timestamp": datetime.now().isoformat(),
         "services": {
             "api": "operational",
@@ -108,19 +312,90 @@ async def health_check():
         health_status["services"]["ml_model"] = "loaded"
     else:
         health_status["services"]["ml_model"] = "using_fallback"
+    health_status["services"]["classifier_backend"] = classifier.active_backend
+    health_status["load"] = load
+    health_status["admission"] = admission.snapshot()
+    if saturation:
+        health_status["saturation"] = saturation
     
     return health_status
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check for load balancers: 503 while this worker has been
+    saturated for a sustained period, so traffic is steered to other workers
+    until it drains.
+    """
+    saturation = loop_monitor.saturation()
+    if saturation:
+        return FastJSONResponse(content={"status": "saturated", "saturation": saturation}, status_code=503,
+                                headers={"Retry-After": "5"})
+    return {"status": "ready"}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if not metrics.PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Metrics unavailable: prometheus_client is not installed")
+    metrics.JOB_QUEUE_DEPTH.set(await run_in_threadpool(job_store.count, QUEUED))
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+def require_debug_access(request: Request):
+    """
+    Guard for /debug endpoints: require X-Debug-Token when DEBUG_TOKEN is set,
+    otherwise only allow them outside production.
+    """
+    if config.DEBUG_TOKEN:
+        if not secrets.compare_digest(request.headers.get("x-debug-token", ""), config.DEBUG_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid debug token")
+    elif config.ENVIRONMENT == "production":
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/traces")
+async def slowest_traces(request: Request, limit: int = 20):
+    """The slowest recent traces in this worker, slowest first, with all their spans"""
+    require_debug_access(request)
+    return {"traces": tracer.slowest.snapshot()[:limit]}
+
+@app.get("/debug/profile")
+async def profile_worker(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, idle: bool = False):
+    """
+    Sample all thread stacks in this worker for N seconds.
+    Returns collapsed stacks for flamegraph.pl / speedscope.
+    """
+    require_debug_access(request)
+    if not 0 < seconds <= 60 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 60], interval_ms in [1, 1000]")
+    try:
+        stacks = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000, idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(format_collapsed(stacks), headers={"X-Profile-Samples": str(sum(stacks.values()))})
+
+@app.get("/debug/alloc")
+async def allocation_snapshot(request: Request, seconds: float = 10.0, top: int = 25, frames: int = 1):
+    """Top allocation sites, and their growth over N seconds, from tracemalloc"""
+    require_debug_access(request)
+    if not 0 <= seconds <= 300 or not 1 <= top <= 500 or not 1 <= frames <= 50:
+        raise HTTPException(status_code=400, detail="seconds must be in [0, 300], top in [1, 500], frames in [1, 50]")
+    try:
+        return await capture_allocations(seconds, top, frames)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.get("/api/config")
-async def get_config():
+async def get_config(request: Request):
     """Get non-sensitive configuration info"""
+    return config_response.respond(request)
+
+@app.get("/api/classifier/stats")
+async def classifier_stats():
+    """Per-stage cascade hit rates and latencies, for tuning CASCADE_THRESHOLD"""
     return {
-        "environment": config.ENVIRONMENT,
-        "max_upload_size_mb": config.MAX_UPLOAD_SIZE / (1024 * 1024),
-        "allowed_extensions": list(config.ALLOWED_EXTENSIONS),
-        "murf_configured": bool(config.MURF_API_KEY),
-        "supported_animals": translator.get_supported_animals(),
-        "supported_emotions": translator.get_supported_emotions()
+        "backend": classifier.active_backend,
+        "cascade_threshold": classifier.cascade_threshold,
+        "stages": classifier.stats.snapshot()
     }
 
 def validate_file_extension(filename: str) -> bool:
@@ -128,97 +403,76 @@ def validate_file_extension(filename: str) -> bool:
     ext = filename.split(".")[-1].lower()
     return ext in config.ALLOWED_EXTENSIONS
 
+def validate_upload(file: UploadFile):
+    """Reject uploads with a disallowed extension or over the size limit"""
+    # Validate file extension
+    if not validate_file_extension(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(config.ALLOWED_EXTENSIONS)}"
+        )
+    
+    # Validate file size
+    file.file.seek(0, 2)  # Seek to end
+    file_size = file.file.tell()
+    file.file.seek(0)  # Reset to beginning
+    
+    if file_size > config.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Max size: {config.MAX_UPLOAD_SIZE / (1024 * 1024)}MB"
+        )
+
 @app.post("/api/process-audio")
-async def process_audio(file: UploadFile = File(...)):
+async def process_audio(file: UploadFile = File(...), segment: bool = False):
     """
-    Process uploaded animal audio and return translation with TTS
+    Process uploaded animal audio and return translation with TTS.
+    With ?segment=true, also return a timeline of active segments.
     """
     file_path: Optional[str] = None
     output_audio_path: Optional[str] = None
     
     try:
-        logger.info(f"Processing audio file: {file.filename}")
-        
-        # Validate file extension
-        if not validate_file_extension(file.filename):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(config.ALLOWED_EXTENSIONS)}"
-            )
-        
-        # Validate file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
+        logger.info("Processing audio file: %s", file.filename)
         
-        if file_size > config.MAX_UPLOAD_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {config.MAX_UPLOAD_SIZE / (1024 * 1024)}MB"
-            )
+        validate_upload(file)
         
         # Save uploaded file
-        file_extension = file.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(config.UPLOAD_DIR, filename)
+        file_path, filename = await run_in_threadpool(save_upload, file.file, file.filename, config.UPLOAD_DIR)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"File saved: {file_path}")
-        
-        # 1. Process Audio
-        logger.info("Extracting audio features...")
-        features = load_and_preprocess_audio(file_path)
-        if features is None:
+        # 1-3. Extract features, classify and translate (off the event loop)
+        analysis = await run_in_threadpool(analyze_timeline, file_path) if segment else None
+        if analysis is None:
+            analysis = await run_in_threadpool(analyze_audio, file_path)
+        if analysis is None:
             raise HTTPException(status_code=400, detail="Could not process audio file")
         
-        # 2. Classify Emotion/Intent
-        logger.info("Classifying emotion and animal...")
-        classification = classifier.predict(features)
-        animal = classification["animal"]
-        emotion = classification["emotion"]
-        confidence = classification["confidence"]
-        
-        logger.info(f"Classification: {animal} - {emotion} (confidence: {confidence})")
-        
-        # 3. Translate to Human Language
-        logger.info("Generating translation...")
-        translation_text = translator.translate(animal, emotion)
+        animal = analysis["animal"]
+        emotion = analysis["emotion"]
+        confidence = analysis["confidence"]
+        translation_text = analysis["translation"]
         
         # 4. Generate Speech (Murf)
-        audio_url = None
-        if config.MURF_API_KEY:
-            logger.info("Generating TTS with Murf...")
-            audio_content = murf_client.generate_speech(translation_text)
-            
-            if audio_content:
-                output_audio_filename = f"response_{filename}.mp3"
-                output_audio_path = os.path.join(config.UPLOAD_DIR, output_audio_filename)
-                
-                with open(output_audio_path, "wb") as f:
-                    f.write(audio_content)
-                audio_url = f"/static/{output_audio_filename}"
-                logger.info(f"TTS audio generated: {audio_url}")
-            else:
-                logger.warning("TTS generation failed")
-        else:
-            logger.info("Murf API key not configured, skipping TTS")
+        audio_url, output_audio_path = await run_in_threadpool(synthesize_speech, translation_text, filename)
         
         # Cleanup input file
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
         
-        return JSONResponse(content={
+        data = {
+            "animal": animal,
+            "emotion": emotion,
+            "confidence": confidence,
+            "translation": translation_text,
+            "audio_url": audio_url
+        }
+        if segment:
+            data["timeline"] = analysis.get("timeline", [])
+        
+        return FastJSONResponse(content={
             "status": "success",
             "message": "Processed successfully",
-            "data": {
-                "animal": animal,
-                "emotion": emotion,
-                "confidence": confidence,
-                "translation": translation_text,
-                "audio_url": audio_url
-            }
+            "data": data
         })
         
     except HTTPException:
@@ -232,11 +486,107 @@ async def process_audio(file: UploadFile = File(...)):
         if output_audio_path and os.path.exists(output_audio_path):
             os.remove(output_audio_path)
         
-        return JSONResponse(
+        return FastJSONResponse(
             content={"status": "error", "message": "Internal server error"},
             status_code=500
         )
 
+@app.post("/api/process-batch")
+async def process_batch_audio(files: List[UploadFile] = File(...)):
+    """
+    Process many clips (multipart files and/or zip archives) in one request.
+    Results stream back as NDJSON, one line per clip in completion order.
+    """
+    logger.info("Processing batch of %d uploads", len(files))
+    work_dir = tempfile.mkdtemp(prefix="zoolingo_batch_")
+    uploads = [(upload.filename, upload.file) for upload in files]
+    try:
+        items = await run_in_threadpool(collect_items, uploads, work_dir)
+    except BaseException:
+        # process_batch owns the directory only once it has the items
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    
+    return StreamingResponse(
+        process_batch(items, work_dir),
+        media_type="application/x-ndjson"
+    )
+
+def job_view(job: dict) -> dict:
+    """Public representation of a job"""
+    return {
+        "job_id": job["job_id"],
+        "state": job["state"],
+        "stage": job["stage"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Accept audio for asynchronous processing and return a job ID immediately
+    """
+    validate_upload(file)
+    file_path, _ = await run_in_threadpool(save_upload, file.file, file.filename, job_upload_dir)
+    
+    try:
+        job_id = await run_in_threadpool(job_queue.submit, file_path)
+    except QueueFullError:
+        os.remove(file_path)
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, try again later",
+            headers={"Retry-After": "5"}
+        )
+    
+    logger.info("Job queued: %s", job_id)
+    return FastJSONResponse(status_code=202, content={
+        "status": "success",
+        "message": "Job queued",
+        "data": {
+            "job_id": job_id,
+            "state": "queued",
+            "status_url": f"/api/jobs/{job_id}",
+            "events_url": f"/api/jobs/{job_id}/events"
+        }
+    })
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the current state and partial results of a job"""
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(content={"status": "success", "data": job_view(job)})
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events stream emitting one event per published stage
+    """
+    if await run_in_threadpool(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_update = None
+        while True:
+            job = await run_in_threadpool(job_store.get, job_id)
+            if job is None:
+                return
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield f"event: {job['stage']}\ndata: {json.dumps(job_view(job))}\n\n"
+            if job["state"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 # Demo endpoint for testing without actual audio
 @app.post("/api/demo/{demo_id}")
 async def process_demo(demo_id: str):
@@ -245,62 +595,51 @@ async def process_demo(demo_id: str):
     Useful for demonstrations and testing.
     """
     try:
-        logger.info(f"Processing demo: {demo_id}")
+        logger.debug("Processing demo: %s", demo_id)
         
         # Parse demo_id (format: "animal-emotion", e.g., "dog-happy")
         parts = demo_id.lower().split("-")
         if len(parts) != 2:
             raise HTTPException(status_code=400, detail="Invalid demo ID format. Use 'animal-emotion'")
         
-        animal_key, emotion_key = parts
-        
-        # Map to proper case - support all animals and emotions
-        animal_map = {
-            "dog": "Dog", "cat": "Cat", "cow": "Cow", "lion": "Lion", 
-            "bird": "Bird", "horse": "Horse", "elephant": "Elephant",
-            "sheep": "Sheep", "goat": "Goat", "pig": "Pig",
-            "chicken": "Chicken", "duck": "Duck", "monkey": "Monkey",
-            "parrot": "Parrot", "wolf": "Wolf"
-        }
-        emotion_map = {
-            "happy": "Happy", "angry": "Angry", "sad": "Sad", "hungry": "Hungry",
-            "pain": "Pain", "excited": "Excited", "scared": "Scared", 
-            "curious": "Curious", "playful": "Playful", "calm": "Calm",
-            "demanding": "Demanding", "alert": "Alert", "mischievous": "Mischievous",
-            "proud": "Proud", "bossy": "Bossy", "singing": "Singing",
-            "chatty": "Chatty", "aggressive": "Aggressive", "lonely": "Lonely"
-        }
-        
-        animal = animal_map.get(animal_key)
-        emotion = emotion_map.get(emotion_key)
-        
-        if not animal:
-            # Try to use any supported animal
+        # Precomputed table covers every supported animal/emotion pair
+        result = demo_cache.pick(demo_id)
+        if result is None:
+            # Unknown names fall back to the translator's default responses
+            animal_key, emotion_key = parts
             animal = animal_key.capitalize()
-        if not emotion:
-            # Try to use any supported emotion  
             emotion = emotion_key.capitalize()
+            translation_text = translator.translate(animal, emotion)
+            result = {
+                "animal": animal,
+                "emotion": emotion,
+                "translation": translation_text,
+                "audio_url": None
+            }
         
-        # Generate translation
-        translation_text = translator.translate(animal, emotion)
         confidence = round(random.uniform(0.85, 0.98), 2)
         
-        # Generate TTS if configured
-        audio_url = None
-        if config.MURF_API_KEY:
-            logger.info("Generating TTS with Murf...")
-            audio_content = murf_client.generate_speech(translation_text)
-            
-            if audio_content:
-                output_filename = f"demo_{demo_id}_{uuid.uuid4().hex[:8]}.mp3"
-                output_path = os.path.join(config.UPLOAD_DIR, output_filename)
-                
-                with open(output_path, "wb") as f:
-                    f.write(audio_content)
-                audio_url = f"/static/{output_filename}"
-                logger.info(f"Demo TTS generated: {audio_url}")
+        # Render TTS once per phrase if configured and not cached yet. This
+        # shares the heavy lane's slots; when none is free, answer text-only.
+        if result["audio_url"] is None and config.MURF_API_KEY:
+            if admission.try_acquire():
+                start = time.perf_counter()
+                try:
+                    logger.info("Generating TTS with Murf...")
+                    result["audio_url"] = await run_in_threadpool(demo_cache.render, result["translation"], murf_client)
+                finally:
+                    admission.release(time.perf_counter() - start)
+                if result["audio_url"]:
+                    logger.info("Demo TTS generated: %s", result["audio_url"])
+            else:
+                metrics.ADMISSION_DECISIONS.labels("demo_tts", "degraded").inc()
         
-        return JSONResponse(content={
+        animal = result["animal"]
+        emotion = result["emotion"]
+        translation_text = result["translation"]
+        audio_url = result["audio_url"]
+        
+        return FastJSONResponse(content={
             "status": "success",
             "message": "Demo processed successfully",
             "data": {
@@ -317,19 +656,103 @@ async def process_demo(demo_id: str):
         raise
     except Exception as e:
         logger.error(f"Error processing demo: {str(e)}", exc_info=True)
-        return JSONResponse(
+        return FastJSONResponse(
             content={"status": "error", "message": "Internal server error"},
             status_code=500
         )
 
+def new_stream_session(sample_rate=None, encoding="pcm16") -> StreamingSession:
+    """Create a live classification session with configured limits"""
+    return StreamingSession(
+        sample_rate=sample_rate or config.STREAM_DEFAULT_SAMPLE_RATE,
+        encoding=encoding,
+        update_interval=config.STREAM_UPDATE_INTERVAL_MS / 1000,
+        max_seconds=config.STREAM_MAX_SECONDS
+    )
+
+def parse_stream_config(payload: dict):
+    """
+    Validate a {"type": "config"} message.
+
+    Returns:
+        (sample_rate or None, encoding)
+
+    Raises:
+        ValueError: on a non-numeric sample rate or non-string encoding
+    """
+    sample_rate = payload.get("sample_rate")
+    if sample_rate is not None:
+        if isinstance(sample_rate, bool):
+            raise ValueError("sample_rate must be a number")
+        try:
+            sample_rate = int(sample_rate)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError("sample_rate must be a number")
+    encoding = payload.get("encoding", "pcm16")
+    if not isinstance(encoding, str):
+        raise ValueError("encoding must be a string")
+    return sample_rate, encoding
+
+@app.websocket("/ws/listen")
+async def listen(websocket: WebSocket):
+    """
+    Live classification while recording.
+    
+    Protocol: an optional {"type": "config", "sample_rate": ..., "encoding":
+    "pcm16" | "float32"} text message, then binary mono PCM chunks. The
+    server pushes {"type": "classification"} updates as audio accumulates;
+    send {"type": "stop"} to receive {"type": "final"} and close.
+    """
+    await websocket.accept()
+    session = new_stream_session()
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            if message.get("bytes") is not None:
+                chunk = message["bytes"]
+                if len(chunk) > config.STREAM_MAX_CHUNK_BYTES:
+                    await websocket.send_json({"type": "error", "message": "Chunk too large"})
+                    await websocket.close(code=1009)
+                    return
+                
+                update = await run_in_threadpool(session.feed, chunk)
+                if update:
+                    await websocket.send_json({"type": "classification", "data": update})
+                if not session.exhausted:
+                    continue
+                payload = {"type": "stop"}
+            else:
+                payload = json.loads(message.get("text") or "{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("Control messages must be JSON objects")
+            
+            if payload.get("type") == "config":
+                if session.seconds > 0:
+                    raise ValueError("Config must be sent before audio")
+                session = new_stream_session(*parse_stream_config(payload))
+                await websocket.send_json({"type": "ready"})
+            elif payload.get("type") == "stop":
+                final = await run_in_threadpool(session.finish)
+                await websocket.send_json({"type": "final", "data": final})
+                await websocket.close()
+                return
+            
+    except WebSocketDisconnect:
+        return
+    except ValueError as e:
+        # Covers malformed JSON, non-object messages and invalid session config
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1003)
+
 # Get supported animals and emotions
 @app.get("/api/supported")
-async def get_supported():
+async def get_supported(request: Request):
     """Get list of supported animals and emotions"""
-    return {
-        "animals": translator.get_supported_animals(),
-        "emotions": translator.get_supported_emotions()
-    }
+    return supported_response.respond(request)
 
 # Serve static files for audio playback
 app.mount("/static", StaticFiles(directory=config.UPLOAD_DIR), name="static")
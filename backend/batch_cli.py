@@ -0,0 +1,219 @@
+"""
+zoolingo-batch: classify directories of recordings without going through the API.
+
+    ./zoolingo-batch recordings/ -o results.csv
+    ./zoolingo-batch recordings/ -o results.parquet --workers 16
+
+Decoding and feature extraction fan out over a process pool while the main
+process classifies completed batches in single forward passes. Results are
+appended as each batch finishes, and the output doubles as the checkpoint:
+re-running the same command skips every file already in it.
+
+CSV output is a single appendable file. Parquet output (requires pyarrow)
+is a directory of part files, readable as one table with
+pandas.read_parquet or pyarrow.dataset.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import config
+from services.audio_processor import load_and_preprocess_audio
+from services.ai_classifier import classifier
+from services.nlp_translator import translator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger("zoolingo-batch")
+
+FIELDS = ["path", "status", "animal", "emotion", "confidence", "translation"]
+
+
+def find_recordings(inputs):
+    """Yield audio file paths under the given files/directories, in sorted order."""
+    for entry in inputs:
+        if os.path.isfile(entry):
+            yield entry
+            continue
+        for root, dirs, files in os.walk(entry):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.split(".")[-1].lower() in config.ALLOWED_EXTENSIONS:
+                    yield os.path.join(root, filename)
+
+
+class CsvResults:
+    """Append-only CSV output; rows already in the file count as done."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done(self):
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline="") as f:
+            return {row["path"] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetResults:
+    """Parquet dataset directory with one part file per flushed batch."""
+
+    def __init__(self, path):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(f for f in os.listdir(self.path) if f.startswith("part-") and f.endswith(".parquet"))
+
+    def done(self):
+        done = set()
+        for part in self._parts():
+            done.update(pq.read_table(os.path.join(self.path, part), columns=["path"]).column("path").to_pylist())
+        return done
+
+    def write(self, rows):
+        table = pa.Table.from_pylist(rows, schema=pa.schema([
+            ("path", pa.string()), ("status", pa.string()), ("animal", pa.string()),
+            ("emotion", pa.string()), ("confidence", pa.float64()), ("translation", pa.string()),
+        ]))
+        part = os.path.join(self.path, f"part-{len(self._parts()):05d}.parquet")
+        # Write then rename, so an interrupted run never leaves a truncated part behind
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+
+
+def open_results(path):
+    if path.endswith(".parquet"):
+        return ParquetResults(path)
+    return CsvResults(path)
+
+
+def classify_batch(paths, features):
+    """Classify the successfully decoded clips of a batch in one pass."""
+    rows = []
+    ok = [i for i, f in enumerate(features) if f is not None]
+    classifications = classifier.predict_batch(np.stack([features[i] for i in ok])) if ok else []
+    by_index = dict(zip(ok, classifications))
+    for i, path in enumerate(paths):
+        result = by_index.get(i)
+        if result is None:
+            rows.append({"path": path, "status": "error", "animal": None, "emotion": None,
+                         "confidence": None, "translation": None})
+            continue
+        rows.append({
+            "path": path,
+            "status": "ok",
+            "animal": result["animal"],
+            "emotion": result["emotion"],
+            "confidence": result["confidence"],
+            "translation": translator.translate(result["animal"], result["emotion"]),
+        })
+    return rows
+
+
+def _extract(path):
+    try:
+        # Strict: an undecodable file becomes an error row, not a confident guess from mock features
+        return load_and_preprocess_audio(path, strict=True)
+    except Exception as e:
+        logger.error(f"Could not process {path}: {e}")
+        return None
+
+
+def run(inputs, output, workers=None, batch_size=256):
+    """
+    Classify every recording under `inputs` that is not already in `output`.
+
+    Returns:
+        dict with total (files found), skipped (already done), processed and errors
+    """
+    results = open_results(output)
+    done = results.done()
+    paths = [p for p in find_recordings(inputs) if p not in done]
+    summary = {"total": len(paths) + len(done), "skipped": len(done), "processed": 0, "errors": 0}
+    if not paths:
+        return summary
+
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Classifying {len(paths)} recordings with {workers} decode processes ({len(done)} already done)")
+    started = time.perf_counter()
+
+    def flush(batch_paths, batch_features):
+        rows = classify_batch(batch_paths, batch_features)
+        results.write(rows)
+        summary["processed"] += len(rows)
+        summary["errors"] += sum(1 for row in rows if row["status"] == "error")
+        rate = summary["processed"] / (time.perf_counter() - started)
+        logger.info(f"{summary['processed']}/{len(paths)} done ({rate:.1f} files/s)")
+
+    pool = None
+    if workers > 1:
+        # One BLAS/OpenMP thread per worker so the processes, not threads, use the cores
+        for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ.setdefault(var, "1")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        features_iter = pool.map(_extract, paths, chunksize=max(1, min(32, len(paths) // (workers * 4))))
+    else:
+        features_iter = map(_extract, paths)
+
+    try:
+        batch_paths, batch_features = [], []
+        for path, features in zip(paths, features_iter):
+            batch_paths.append(path)
+            batch_features.append(features)
+            if len(batch_paths) >= batch_size:
+                flush(batch_paths, batch_features)
+                batch_paths, batch_features = [], []
+        if batch_paths:
+            flush(batch_paths, batch_features)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="zoolingo-batch", description="Offline bulk classification of recordings")
+    parser.add_argument("inputs", nargs="+", help="Audio files or directories to scan recursively")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Results file: .csv, or .parquet for a Parquet dataset directory")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Decode processes (default: CPU count)")
+    parser.add_argument("-b", "--batch-size", type=int, default=256, help="Clips per inference batch and write")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", stream=sys.stderr)
+    try:
+        summary = run(args.inputs, args.output, args.workers, args.batch_size)
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"{summary['processed']} processed, {summary['errors']} errors, "
+          f"{summary['skipped']} already done, {summary['total']} total")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
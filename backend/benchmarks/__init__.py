@@ -0,0 +1 @@
+"""Benchmarks for the audio pipeline; see benchmarks/pipeline_bench.py."""
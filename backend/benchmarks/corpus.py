@@ -0,0 +1,97 @@
+"""
+Deterministic synthetic audio corpus for benchmarks.
+
+Each clip is a seeded "call": a harmonic tone with vibrato, a few bursts
+with attack/decay envelopes, background noise and leading/trailing
+silence, so trimming, resampling and MFCC extraction all do real work.
+The same (seed, duration, format) always produces the same samples.
+"""
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+DURATIONS = (0.5, 3.0, 10.0, 30.0)
+QUICK_DURATIONS = (0.5, 3.0)
+
+# soundfile writes these; the rest need ffmpeg
+_SOUNDFILE_FORMATS = {"wav": ("WAV", "PCM_16"), "flac": ("FLAC", "PCM_16"), "ogg": ("OGG", "VORBIS")}
+_FFMPEG_CODECS = {"mp3": ["-c:a", "libmp3lame", "-b:a", "128k"], "m4a": ["-c:a", "aac", "-b:a", "128k"]}
+
+
+def synth_call(duration, sr=SAMPLE_RATE, seed=0):
+    """Synthesize one mono float32 clip."""
+    rng = np.random.default_rng(seed)
+    n = int(duration * sr)
+    t = np.arange(n) / sr
+    y = 0.01 * rng.standard_normal(n)
+
+    f0 = rng.uniform(150, 900)
+    for _ in range(max(1, int(duration * 2))):
+        start = rng.uniform(0.1, 0.8) * duration
+        length = min(rng.uniform(0.1, 0.6), duration - start)
+        mask = (t >= start) & (t < start + length)
+        local = t[mask] - start
+        vibrato = 1 + 0.02 * np.sin(2 * np.pi * rng.uniform(4, 8) * local)
+        phase = 2 * np.pi * f0 * np.cumsum(vibrato) / sr
+        tone = sum(np.sin(k * phase) / k for k in range(1, 5))
+        envelope = np.minimum(1, local / 0.02) * np.exp(-local / max(length, 1e-3))
+        y[mask] += 0.3 * tone * envelope
+
+    y /= max(1.0, np.abs(y).max())
+    return y.astype(np.float32)
+
+
+def available_formats(extensions):
+    """The requested extensions this machine can encode, and those it can't."""
+    have_ffmpeg = shutil.which("ffmpeg") is not None
+    usable, skipped = [], []
+    for ext in sorted(extensions):
+        if ext in _SOUNDFILE_FORMATS or (ext in _FFMPEG_CODECS and have_ffmpeg):
+            usable.append(ext)
+        else:
+            skipped.append(ext)
+    return usable, skipped
+
+
+def write_clip(path, y, sr=SAMPLE_RATE):
+    """Encode `y` to `path` (format from the extension), atomically."""
+    stem, ext = os.path.splitext(path)
+    ext = ext.lstrip(".").lower()
+    partial = f"{stem}.partial.{ext}"
+    if ext in _SOUNDFILE_FORMATS:
+        import soundfile as sf
+        fmt, subtype = _SOUNDFILE_FORMATS[ext]
+        sf.write(partial, y, sr, format=fmt, subtype=subtype)
+    else:
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-y", "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0"]
+            + _FFMPEG_CODECS[ext] + [partial],
+            input=y.tobytes(), check=True
+        )
+    os.replace(partial, path)
+
+
+def build_corpus(directory, extensions, durations=DURATIONS, seed=0):
+    """
+    Write one clip per (format, duration) into `directory`, reusing files
+    already there.
+
+    Returns:
+        (list of dicts with path/format/seconds, list of skipped formats)
+    """
+    os.makedirs(directory, exist_ok=True)
+    usable, skipped = available_formats(extensions)
+    clips = []
+    for index, duration in enumerate(durations):
+        y = None
+        for ext in usable:
+            path = os.path.join(directory, f"call_s{seed}_{duration:g}s.{ext}")
+            if not os.path.exists(path):
+                if y is None:
+                    y = synth_call(duration, seed=seed + index)
+                write_clip(path, y)
+            clips.append({"path": path, "format": ext, "seconds": duration})
+    return clips, skipped
@@ -0,0 +1,349 @@
+"""
+Load generator replaying mixed traffic against the API.
+
+    # Bring up the mock Murf server and a pre-fork app server, then load them
+    python -m benchmarks.loadgen --spawn --workers 4 --rps 40 --duration 60 -o load.json
+
+    # Or load a server that is already running (pass its master PID for CPU/memory)
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --server-pid 1234 --rps 20
+
+Requests are sent open-loop: one is started every 1/rps seconds whether or
+not earlier ones finished, so a slow server builds a backlog like it would
+under real traffic instead of slowing the generator down. The mix
+(--mix upload=1,demo=3,metadata=6) picks uploads of a synthetic clip,
+demo lookups, and metadata/health reads.
+
+The report has latency percentiles and status counts per request kind,
+achieved throughput, and CPU and memory per server worker sampled from
+/proc (Linux only).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+from benchmarks.corpus import build_corpus
+from benchmarks.pipeline_bench import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METADATA_PATHS = ("/api/supported", "/api/config", "/health", "/")
+DEFAULT_MIX = "upload=1,demo=3,metadata=6"
+
+
+def parse_mix(spec: str):
+    """'upload=1,demo=3' -> ([kinds], [weights])"""
+    kinds, weights = [], []
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("upload", "demo", "metadata"):
+            raise ValueError(f"Unknown request kind {kind!r}")
+        kinds.append(kind)
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+
+class WorkerSampler:
+    """Samples CPU time and memory of a server's worker processes from /proc."""
+
+    def __init__(self, master_pid):
+        self.master_pid = master_pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.first = {}
+        self.last = {}
+        self.peak_rss_kb = defaultdict(int)
+        self.started = None
+
+    def _workers(self):
+        """The master's children, or the master itself for a single-process server."""
+        children = []
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        fields = f.read().rsplit(")", 1)[1].split()
+                except OSError:
+                    continue
+                if int(fields[1]) == self.master_pid:
+                    children.append(int(entry))
+        return children or [self.master_pid]
+
+    @staticmethod
+    def _read(pid):
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        rss_kb = pss_kb = None
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss_kb = int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss_kb = int(line.split()[1])
+        except OSError:
+            pass
+        return cpu_ticks, rss_kb, pss_kb
+
+    def sample(self):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        for pid in self._workers():
+            try:
+                cpu_ticks, rss_kb, pss_kb = self._read(pid)
+            except (OSError, IndexError, ValueError):
+                continue
+            self.first.setdefault(pid, (now, cpu_ticks))
+            self.last[pid] = (now, cpu_ticks, rss_kb, pss_kb)
+            self.peak_rss_kb[pid] = max(self.peak_rss_kb[pid], rss_kb or 0)
+
+    def report(self):
+        rows = []
+        for pid, (now, cpu_ticks, rss_kb, pss_kb) in sorted(self.last.items()):
+            first_time, first_ticks = self.first[pid]
+            elapsed = now - first_time
+            rows.append({
+                "pid": pid,
+                "cpu_percent": round(100 * (cpu_ticks - first_ticks) / self.ticks / elapsed, 1) if elapsed else None,
+                "rss_mb": round(rss_kb / 1024, 1) if rss_kb else None,
+                "pss_mb": round(pss_kb / 1024, 1) if pss_kb else None,
+                "peak_rss_mb": round(self.peak_rss_kb[pid] / 1024, 1),
+            })
+        return rows
+
+
+async def run_load(client, rps, duration, mix=DEFAULT_MIX, upload=None, demo_ids=None,
+                   max_in_flight=256, seed=0, on_tick=None):
+    """
+    Send open-loop mixed traffic through an httpx.AsyncClient.
+
+    Args:
+        upload: (filename, bytes) posted by upload requests
+        demo_ids: ids for /api/demo/{id}
+        on_tick: called about once a second (e.g. to sample worker stats)
+
+    Returns:
+        report dict with per-kind latency stats and status counts
+    """
+    rng = random.Random(seed)
+    kinds, weights = parse_mix(mix)
+    demo_ids = demo_ids or ["dog-happy"]
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    skipped = 0
+    in_flight = set()
+
+    async def one(kind):
+        start = time.perf_counter()
+        try:
+            if kind == "upload":
+                response = await client.post("/api/process-audio", files={"file": upload})
+            elif kind == "demo":
+                response = await client.post(f"/api/demo/{rng.choice(demo_ids)}")
+            else:
+                response = await client.get(rng.choice(METADATA_PATHS))
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        latencies[kind].append(time.perf_counter() - start)
+        statuses[kind][status] += 1
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    next_send = start
+    next_tick = start
+    sent = 0
+    while loop.time() - start < duration:
+        if len(in_flight) >= max_in_flight:
+            skipped += 1
+        else:
+            task = asyncio.ensure_future(one(rng.choices(kinds, weights)[0]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            sent += 1
+        if on_tick and loop.time() >= next_tick:
+            on_tick()
+            next_tick += 1
+        next_send += 1 / rps
+        await asyncio.sleep(max(0.0, next_send - loop.time()))
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    elapsed = loop.time() - start
+
+    by_kind = {}
+    for kind in kinds:
+        if not latencies[kind]:
+            continue
+        counts = dict(statuses[kind])
+        ok = sum(n for status, n in counts.items() if status.isdigit() and int(status) < 400)
+        by_kind[kind] = dict(summarize(latencies[kind]), statuses=counts,
+                             error_rate=round(1 - ok / len(latencies[kind]), 4))
+    completed = sum(len(v) for v in latencies.values())
+    return {
+        "target_rps": rps,
+        "achieved_rps": round(completed / elapsed, 2),
+        "duration_s": round(elapsed, 2),
+        "sent": sent,
+        "skipped_over_max_in_flight": skipped,
+        "requests": by_kind,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url, process, timeout=120):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class SpawnedStack:
+    """Mock Murf plus a pre-fork app server, with TTS pointed at the mock."""
+
+    def __init__(self, workers, murf_args):
+        self.workers = workers
+        self.murf_args = murf_args
+        self.processes = []
+        self.work_dir = tempfile.mkdtemp(prefix="zoolingo-load-")
+
+    def __enter__(self):
+        murf_port, app_port = _free_port(), _free_port()
+        murf = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_murf", "--port", str(murf_port)]
+                                + self.murf_args, cwd=BACKEND_DIR)
+        self.processes.append(murf)
+        self.murf_url = f"http://127.0.0.1:{murf_port}"
+        _wait_for(self.murf_url + "/stats", murf)
+
+        env = dict(
+            os.environ,
+            MURF_API_URL=self.murf_url + "/v1/speech/generate",
+            MURF_API_KEY="mock",
+            # Every simulated client shares one IP; limits would measure the limiter
+            RATE_LIMIT_ENABLED="false",
+            JOB_DIR=os.path.join(self.work_dir, "jobs"),
+            # Demo and response MP3s from the mock Murf stay out of the source tree
+            UPLOAD_DIR=os.path.join(self.work_dir, "uploads"),
+            PROMETHEUS_MULTIPROC_DIR=os.path.join(self.work_dir, "metrics"),
+            LOG_FILE="",
+            LOG_LEVEL="WARNING",
+        )
+        server = subprocess.Popen([sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(app_port),
+                                   "--workers", str(self.workers)], cwd=BACKEND_DIR, env=env)
+        self.processes.append(server)
+        self.url = f"http://127.0.0.1:{app_port}"
+        self.server_pid = server.pid
+        _wait_for(self.url + "/api/supported", server)
+        return self
+
+    def murf_stats(self):
+        import httpx
+        return httpx.get(self.murf_url + "/stats", timeout=5).json()
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.send_signal(signal.SIGTERM)
+        for process in reversed(self.processes):
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return False
+
+
+async def _run(args, url, server_pid):
+    import httpx
+
+    clips, _ = build_corpus(args.corpus_dir, {"wav"}, (args.clip_seconds,))
+    with open(clips[0]["path"], "rb") as f:
+        upload = (os.path.basename(clips[0]["path"]), f.read())
+
+    sampler = WorkerSampler(server_pid) if server_pid and os.path.isdir("/proc") else None
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout,
+                                 limits=httpx.Limits(max_connections=args.max_in_flight)) as client:
+        supported = (await client.get("/api/supported")).json()
+        demo_ids = [f"{a.lower()}-{e.lower()}" for a in supported["animals"] for e in supported["emotions"]]
+        if sampler:
+            sampler.sample()
+        report = await run_load(client, args.rps, args.duration, args.mix, upload, demo_ids,
+                                args.max_in_flight, args.seed, sampler.sample if sampler else None)
+    if sampler:
+        sampler.sample()
+        report["workers"] = sampler.report()
+    return report
+
+
+def format_report(report):
+    lines = [f"Target {report['target_rps']} rps, achieved {report['achieved_rps']} rps over "
+             f"{report['duration_s']}s ({report['skipped_over_max_in_flight']} skipped at max in flight)"]
+    for kind, stats in report["requests"].items():
+        lines.append(f"  {kind:<9} n={stats['samples']:<6} p50 {stats['p50_ms']:>9.1f}ms  p95 {stats['p95_ms']:>9.1f}ms  "
+                     f"p99 {stats['p99_ms']:>9.1f}ms  errors {100 * stats['error_rate']:.1f}%  {stats['statuses']}")
+    for worker in report.get("workers", []):
+        lines.append(f"  worker {worker['pid']}: cpu {worker['cpu_percent']}%  rss {worker['rss_mb']}MB  "
+                     f"pss {worker['pss_mb']}MB  peak rss {worker['peak_rss_mb']}MB")
+    if "murf" in report:
+        lines.append(f"  mock murf: {report['murf']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="loadgen", description="Replay mixed traffic against the API")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument("--spawn", action="store_true", help="Start mock Murf and serve.py for the run")
+    parser.add_argument("--server-pid", type=int, help="Master PID of --url's server, for per-worker CPU/memory")
+    parser.add_argument("--workers", type=int, default=2, help="Workers for --spawn")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Traffic mix (default {DEFAULT_MIX})")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--clip-seconds", type=float, default=3.0, help="Length of the uploaded clip")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "zoolingo-bench-corpus"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--murf-latency", default="lognormal:300:0.4", help="Mock Murf latency spec (--spawn)")
+    parser.add_argument("--murf-error-rate", type=float, default=0.0)
+    parser.add_argument("--murf-throttle-rate", type=float, default=0.0)
+    parser.add_argument("-o", "--output", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.spawn:
+        murf_args = ["--latency", args.murf_latency, "--error-rate", str(args.murf_error_rate),
+                     "--throttle-rate", str(args.murf_throttle_rate), "--seed", str(args.seed)]
+        with SpawnedStack(args.workers, murf_args) as stack:
+            report = asyncio.run(_run(args, stack.url, stack.server_pid))
+            report["murf"] = stack.murf_stats()
+    else:
+        report = asyncio.run(_run(args, args.url, args.server_pid))
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
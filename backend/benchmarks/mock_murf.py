@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Murf TTS API, for load tests.
+
+    python -m benchmarks.mock_murf --port 8900 --latency lognormal:350:0.4 --throttle-rate 0.02
+    MURF_API_URL=http://127.0.0.1:8900/v1/speech/generate MURF_API_KEY=mock python serve.py
+
+Serves POST /v1/speech/generate the way MurfClient uses it: an `api-key`
+header, a JSON body with voiceId/text/format, and the audio bytes in the
+response. Latency follows a configurable distribution, a share of calls
+answer 429 or 500, and the payload size grows with the text length.
+GET /stats reports what was served.
+
+Latency specs (milliseconds):
+    fixed:MS
+    uniform:LOW:HIGH
+    lognormal:MEDIAN:SIGMA
+    exponential:MEAN
+"""
+import sys
+import math
+import random
+import asyncio
+import argparse
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a function returning one delay in seconds."""
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(":")] if args else []
+        if kind == "fixed" and len(values) == 1:
+            return lambda rng: values[0] / 1000
+        if kind == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(values[0], values[1]) / 1000
+        if kind == "lognormal" and len(values) == 2:
+            mu = math.log(values[0])
+            return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+        if kind == "exponential" and len(values) == 1:
+            return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Bad latency spec {spec!r}; see python -m benchmarks.mock_murf --help")
+
+
+def build_app(latency="lognormal:300:0.4", error_rate=0.0, throttle_rate=0.0,
+              base_bytes=8000, bytes_per_char=400, seed=0):
+    """
+    Create the mock Murf app.
+
+    Args:
+        latency: Latency spec for every answered call
+        error_rate: Share of calls answered 500
+        throttle_rate: Share of calls answered 429
+        base_bytes: Audio payload size for empty text
+        bytes_per_char: Extra payload bytes per character of text (~MP3 at 48kHz speech)
+        seed: Seed for latency, outcome and payload randomness
+    """
+    app = FastAPI(title="Mock Murf TTS", docs_url=None, redoc_url=None)
+    rng = random.Random(seed)
+    delay = parse_latency(latency)
+    stats = Counter()
+
+    @app.post("/v1/speech/generate")
+    async def generate(request: Request):
+        stats["requests"] += 1
+        if not request.headers.get("api-key"):
+            stats["401"] += 1
+            return JSONResponse({"errorMessage": "Invalid api-key"}, status_code=401)
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or not body.get("text") or not body.get("voiceId"):
+            stats["400"] += 1
+            return JSONResponse({"errorMessage": "text and voiceId are required"}, status_code=400)
+
+        await asyncio.sleep(delay(rng))
+        roll = rng.random()
+        if roll < throttle_rate:
+            stats["429"] += 1
+            return JSONResponse({"errorMessage": "Rate limit exceeded"}, status_code=429,
+                                headers={"Retry-After": "1"})
+        if roll < throttle_rate + error_rate:
+            stats["500"] += 1
+            return JSONResponse({"errorMessage": "Internal error"}, status_code=500)
+
+        size = base_bytes + bytes_per_char * len(body["text"])
+        stats["200"] += 1
+        stats["bytes"] += size
+        # An ID3 header and filler: clients store it, nothing decodes it
+        audio = b"ID3\x04\x00\x00\x00\x00\x00\x00" + rng.randbytes(max(0, size - 10))
+        media_type = "audio/wav" if str(body.get("format", "MP3")).upper() == "WAV" else "audio/mpeg"
+        return Response(audio, media_type=media_type)
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mock_murf", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:300:0.4", help="Latency spec (default lognormal:300:0.4)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls answered 429")
+    parser.add_argument("--base-bytes", type=int, default=8000)
+    parser.add_argument("--bytes-per-char", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    app = build_app(args.latency, args.error_rate, args.throttle_rate,
+                    args.base_bytes, args.bytes_per_char, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
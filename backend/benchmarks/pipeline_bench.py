@@ -0,0 +1,248 @@
+"""
+End-to-end benchmarks for the audio pipeline.
+
+    python -m benchmarks.pipeline_bench -o benchmark-results.json
+    python -m benchmarks.pipeline_bench --quick -o quick.json
+
+Measures, over a synthetic corpus in every allowed upload format:
+
+- load_and_preprocess_audio per format and clip length
+- EmotionClassifier.predict and predict_batch at several batch sizes
+- NLPTranslator.translate over every animal/emotion pair
+- POST /api/process-audio latency and throughput at several concurrency
+  levels, in-process through the ASGI app (or against --url)
+
+In-process runs switch the rate limiter off. A server benchmarked with
+--url must be started with RATE_LIMIT_ENABLED=false, or uploads (10 tokens
+each) are mostly answered 429 and the figures measure the limiter.
+
+Results are one JSON document. Every result carries a stable `name` and
+`params`, so two runs can be compared entry by entry.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.corpus import build_corpus, DURATIONS, QUICK_DURATIONS
+
+BATCH_SIZES = (1, 8, 32, 128)
+CONCURRENCY = (1, 4, 16)
+
+
+def summarize(seconds):
+    """Latency statistics in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(seconds, dtype=float) * 1000
+    return {
+        "samples": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """Call fn `warmup` times untimed, then `repeat` times; returns the durations."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def result(name, params, durations, **extra):
+    return dict({"name": name, "params": params}, **summarize(durations), **extra)
+
+
+def bench_feature_extraction(clips, repeat):
+    from services.audio_processor import load_and_preprocess_audio
+
+    results = []
+    for clip in clips:
+        durations = measure(lambda: load_and_preprocess_audio(clip["path"]), repeat)
+        results.append(result("load_and_preprocess_audio",
+                              {"format": clip["format"], "seconds": clip["seconds"]}, durations))
+    return results
+
+
+def bench_classifier(features, repeat):
+    from services.ai_classifier import classifier
+
+    results = [result("classifier.predict", {"backend": classifier.active_backend},
+                      measure(lambda: classifier.predict(features), repeat * 10))]
+    for size in BATCH_SIZES:
+        batch = np.tile(features, (size, 1))
+        durations = measure(lambda: classifier.predict_batch(batch), repeat)
+        results.append(result(
+            "classifier.predict_batch", {"backend": classifier.active_backend, "batch_size": size}, durations,
+            rows_per_second=round(size / float(np.median(durations)), 1)
+        ))
+    return results
+
+
+def bench_translation(repeat):
+    from services.nlp_translator import translator
+
+    pairs = [(animal, emotion) for animal in translator.get_supported_animals()
+             for emotion in translator.get_supported_emotions()]
+
+    def translate_all():
+        for animal, emotion in pairs:
+            translator.translate(animal, emotion)
+
+    # Per-call figures: each sample is one pass over every pair
+    durations = [d / len(pairs) for d in measure(translate_all, repeat)]
+    return [result("translator.translate", {"pairs": len(pairs)}, durations)]
+
+
+async def _load(send, requests, concurrency):
+    """Issue `requests` calls of `send` with at most `concurrency` in flight."""
+    latencies, statuses = [], {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            status = await send()
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def bench_end_to_end(clip, requests, levels, url=None):
+    """POST /api/process-audio at each concurrency level."""
+    import httpx
+
+    with open(clip["path"], "rb") as f:
+        payload = f.read()
+    filename = os.path.basename(clip["path"])
+
+    if url is None:
+        from app import app
+        client_args = {"transport": httpx.ASGITransport(app=app), "base_url": "http://bench"}
+    else:
+        client_args = {"base_url": url}
+
+    async def run_level(concurrency):
+        async with httpx.AsyncClient(timeout=120, **client_args) as client:
+            async def send():
+                response = await client.post("/api/process-audio", files={"file": (filename, payload)})
+                return response.status_code
+            await send()  # warm up
+            return await _load(send, requests, concurrency)
+
+    from config import config
+    # Measure the pipeline, not this client's rate-limit bucket. Only affects
+    # the in-process app; a --url target has to disable it itself.
+    rate_limit_enabled, config.RATE_LIMIT_ENABLED = config.RATE_LIMIT_ENABLED, False
+    results = []
+    try:
+        for concurrency in levels:
+            latencies, statuses, elapsed = asyncio.run(run_level(concurrency))
+            ok = statuses.get("200", 0)
+            if statuses.get("429", 0) > len(latencies) / 2:
+                print(f"warning: {statuses['429']}/{len(latencies)} requests at concurrency {concurrency} "
+                      "were rate limited (429); start the target with RATE_LIMIT_ENABLED=false",
+                      file=sys.stderr)
+            results.append(result(
+                "process_audio", {"format": clip["format"], "seconds": clip["seconds"], "concurrency": concurrency},
+                latencies, requests_per_second=round(ok / elapsed, 2), statuses=statuses,
+                error_rate=round(1 - ok / len(latencies), 4)
+            ))
+    finally:
+        config.RATE_LIMIT_ENABLED = rate_limit_enabled
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(corpus_dir, quick=False, url=None, levels=None, requests=None):
+    """Run every benchmark and return the results document."""
+    from config import config
+    from services.audio_processor import load_and_preprocess_audio, warm_up, FEATURE_VERSION
+    from services.ai_classifier import classifier
+
+    repeat = 2 if quick else 5
+    levels = levels or ((1, 4) if quick else CONCURRENCY)
+    requests = requests or (8 if quick else 64)
+    clips, skipped = build_corpus(corpus_dir, config.ALLOWED_EXTENSIONS,
+                                  QUICK_DURATIONS if quick else DURATIONS)
+
+    results = [result("audio_warm_up", {}, [warm_up()])]
+    results += bench_feature_extraction(clips, repeat)
+    features = load_and_preprocess_audio(clips[0]["path"])
+    results += bench_classifier(features, repeat)
+    results += bench_translation(repeat)
+    e2e_clip = next(c for c in clips if c["format"] == "wav" and c["seconds"] == 3.0)
+    results += bench_end_to_end(e2e_clip, requests, levels, url)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+            "feature_version": FEATURE_VERSION,
+            "classifier_backend": classifier.active_backend,
+            "target": url or "in-process",
+            "skipped_formats": skipped,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pipeline_bench", description="Benchmark the audio pipeline")
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="JSON results file ('-' for stdout)")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "zoolingo-bench-corpus"),
+                        help="Where the synthetic clips are written (reused between runs)")
+    parser.add_argument("--quick", action="store_true", help="Short clips, fewer repeats and requests")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, nargs="+", help=f"Concurrency levels (default {CONCURRENCY})")
+    parser.add_argument("--requests", type=int, help="Requests per concurrency level")
+    args = parser.parse_args(argv)
+
+    # Keep per-request log lines out of the measurement output
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    report = run(args.corpus_dir, args.quick, args.url, args.concurrency, args.requests)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        for row in report["results"]:
+            params = " ".join(f"{k}={v}" for k, v in row["params"].items())
+            print(f"{row['name']:<28} {params:<40} p50 {row['p50_ms']:>10.3f}ms  p95 {row['p95_ms']:>10.3f}ms")
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
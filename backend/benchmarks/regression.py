@@ -0,0 +1,271 @@
+"""
+Performance regression gate for the pipeline's hot paths.
+
+    python -m benchmarks.regression check             # exit 1 on a regression
+    python -m benchmarks.regression update            # re-record the baseline
+    python -m benchmarks.regression check --threshold 0.25 --json
+
+CI runs the gate on every push and pull request, in the "Performance
+Regression Gate" job of .github/workflows/ci-cd.yml: it re-records the
+baseline from the base commit on the same runner, then checks the new
+commit against it. The committed baseline.json is the reference for local
+runs and supplies the per-metric thresholds.
+
+Microbenchmarks: feature extraction of a 3 s clip, heuristic
+classification (single and batched), translation, and JSON encoding of a
+process-audio response with a timeline.
+
+Noise handling: each benchmark runs in several rounds, interleaved with
+the other benchmarks. A round repeats the call until it has run for at
+least --min-time and records the median call. The metric is the median over
+rounds, and its spread is the median absolute deviation (MAD). The current
+median is compared with the baseline median, like with like. A metric only
+counts as regressed when it is more than `threshold` slower AND the
+slowdown is outside the noise: the lower end of a 99% confidence interval
+for the difference of the medians, estimated from both MADs, must still be
+above zero.
+
+Baselines are machine-specific. To make a committed baseline usable on
+other hardware, every run also times a fixed pure-Python/numpy calibration
+loop, and metrics are compared after scaling by the calibration ratio
+(disable with --no-normalize).
+"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.corpus import build_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.15
+
+
+def _calibration():
+    """Fixed CPU work standing in for "how fast is this machine"."""
+    total = 0
+    for i in range(20000):
+        total += i * i % 7
+    a = np.arange(20000, dtype=np.float64)
+    return total + float(np.sqrt(a).sum())
+
+
+def microbenchmarks(corpus_dir):
+    """name -> zero-argument callable for every gated metric."""
+    from services.audio_processor import load_and_preprocess_audio, warm_up
+    from services.ai_classifier import EmotionClassifier
+    from services.nlp_translator import translator
+    from services.response_cache import FastJSONResponse
+
+    warm_up()
+    clips, _ = build_corpus(corpus_dir, {"wav"}, (3.0,))
+    clip = clips[0]["path"]
+    features = load_and_preprocess_audio(clip)
+    heuristic = EmotionClassifier(backend="heuristic")
+    batch = np.tile(features, (32, 1))
+    pairs = [(a, e) for a in translator.get_supported_animals()[:5] for e in translator.get_supported_emotions()[:5]]
+    response = {
+        "status": "success",
+        "message": "Processed successfully",
+        "data": {
+            "animal": "Dog", "emotion": "Happy", "confidence": 0.91,
+            "translation": translator.translate("Dog", "Happy"), "audio_url": "/static/tts_example.mp3",
+            "timeline": [
+                {"start": i * 0.5, "end": i * 0.5 + 1.0, "animal": "Dog", "emotion": "Happy", "confidence": 0.9}
+                for i in range(200)
+            ],
+        },
+    }
+
+    def translate_pairs():
+        for animal, emotion in pairs:
+            translator.translate(animal, emotion)
+
+    return {
+        "feature_extraction.wav_3s": lambda: load_and_preprocess_audio(clip),
+        "classify.heuristic": lambda: heuristic.predict(features),
+        "classify.heuristic_batch32": lambda: heuristic.predict_batch(batch),
+        "translate.25_pairs": translate_pairs,
+        "json.process_audio_timeline200": lambda: FastJSONResponse(content=response),
+    }
+
+
+def _calls_per_round(fn, min_time):
+    fn()  # warm-up
+    start = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - start, 1e-7)
+    return max(3, int(min_time / single))
+
+
+def _round(fn, calls):
+    """Median call time in seconds over `calls` back-to-back calls."""
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def _stats(rounds):
+    values = np.asarray(rounds) * 1000
+    median = float(np.median(values))
+    return {
+        "median_ms": round(median, 5),
+        "min_ms": round(float(values.min()), 5),
+        "mad_ms": round(float(np.median(np.abs(values - median))), 5),
+        "rounds": len(values),
+    }
+
+
+def measure(corpus_dir, rounds=7, min_time=0.1):
+    """
+    Run the calibration and every microbenchmark; returns a results document.
+
+    Rounds are interleaved (calibration, metric 1, metric 2, ... then the
+    next round), so a slow patch on the machine hits the calibration and the
+    metrics alike instead of skewing a single metric.
+    """
+    benches = dict({"calibration": _calibration}, **microbenchmarks(corpus_dir))
+    calls = {name: _calls_per_round(fn, min_time) for name, fn in benches.items()}
+    samples = {name: [] for name in benches}
+    for _ in range(rounds):
+        for name, fn in benches.items():
+            samples[name].append(_round(fn, calls[name]))
+    calibration = samples.pop("calibration")
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "calibration": _stats(calibration),
+        "metrics": {name: _stats(values) for name, values in samples.items()},
+    }
+
+
+# Two-sided 99% normal quantile
+Z_99 = 2.576
+
+
+def _median_se(stats, scale=1.0):
+    """Standard error of a median over rounds, from the MAD (normal approximation)."""
+    sigma = 1.4826 * stats["mad_ms"] * scale
+    return 1.2533 * sigma / math.sqrt(max(1, stats["rounds"]))
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, normalize=True):
+    """
+    Compare a run against the baseline.
+
+    Returns:
+        list of row dicts (name, baseline/current medians, change, noise,
+        status), where noise is the half-width of the 99% interval for the
+        change and status is "regressed", "improved", "ok", "new" or "missing"
+    """
+    scale = 1.0
+    if normalize and "calibration" in current and "calibration" in baseline:
+        scale = baseline["calibration"]["median_ms"] / current["calibration"]["median_ms"]
+    thresholds = baseline.get("thresholds", {})
+
+    rows = []
+    for name in sorted(set(current["metrics"]) | set(baseline["metrics"])):
+        base = baseline["metrics"].get(name)
+        cur = current["metrics"].get(name)
+        if base is None or cur is None:
+            rows.append({"name": name, "status": "new" if base is None else "missing"})
+            continue
+        limit = thresholds.get(name, threshold)
+        median = cur["median_ms"] * scale
+        change = median / base["median_ms"] - 1
+        noise = Z_99 * math.hypot(_median_se(base), _median_se(cur, scale)) / base["median_ms"]
+        if change > limit and change - noise > 0:
+            status = "regressed"
+        elif change < -limit and change + noise < 0:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({
+            "name": name, "status": status, "threshold": limit,
+            "baseline_ms": base["median_ms"], "current_ms": round(median, 5),
+            "change": round(change, 4), "noise": round(noise, 4),
+        })
+    return rows
+
+
+def format_rows(rows, scale_note=""):
+    lines = [f"{'metric':<34} {'baseline':>12} {'current':>12} {'change':>9} {'noise':>7}  status"]
+    for row in rows:
+        if "change" not in row:
+            lines.append(f"{row['name']:<34} {'':>12} {'':>12} {'':>9} {'':>7}  {row['status']}")
+            continue
+        lines.append(f"{row['name']:<34} {row['baseline_ms']:>10.4f}ms {row['current_ms']:>10.4f}ms "
+                     f"{100 * row['change']:>+8.1f}% {100 * row['noise']:>5.1f}%  {row['status']}"
+                     + (f" (limit +{100 * row['threshold']:.0f}%)" if row["status"] == "regressed" else ""))
+    if scale_note:
+        lines.append(scale_note)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="regression", description="Pipeline performance regression gate")
+    parser.add_argument("command", choices=("check", "update"),
+                        help="check: compare against the baseline; update: re-record the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction (default 0.15); per-metric overrides "
+                             "live under \"thresholds\" in the baseline file")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Seconds per round per metric")
+    parser.add_argument("--no-normalize", action="store_true", help="Compare raw times, without calibration")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "zoolingo-bench-corpus"))
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    current = measure(args.corpus_dir, args.rounds, args.min_time)
+
+    if args.command == "update":
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                current["thresholds"] = json.load(f).get("thresholds", {})
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}; review and commit it")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run `python -m benchmarks.regression update` first")
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold, normalize=not args.no_normalize)
+    regressed = [row for row in rows if row["status"] == "regressed"]
+
+    if args.json:
+        print(json.dumps({"rows": rows, "regressed": len(regressed)}, indent=2))
+    else:
+        note = ""
+        if not args.no_normalize:
+            ratio = current["calibration"]["median_ms"] / baseline["calibration"]["median_ms"]
+            note = f"\nTimes scaled to the baseline machine (this machine's calibration: {ratio:.2f}x baseline)"
+        print(format_rows(rows, note))
+        if regressed:
+            print(f"\n{len(regressed)} metric(s) regressed. If the slowdown is intended, re-record with "
+                  "`python -m benchmarks.regression update` and commit benchmarks/baseline.json.")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
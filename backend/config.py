@@ -1,8 +1,25 @@
 import os
-from dotenv import load_dotenv
 import logging
 
-load_dotenv()
+
+def _find_dotenv():
+    """Nearest .env in this directory or a parent (what python-dotenv's find_dotenv would pick)."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Only import python-dotenv when there is a file for it to read
+_dotenv_path = _find_dotenv()
+if _dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(_dotenv_path)
 
 class Config:
     """Application configuration with validation"""
@@ -16,6 +33,8 @@ class Config:
     
     # API Keys
     MURF_API_KEY = os.getenv("MURF_API_KEY")
+    # Murf API endpoint; point it at benchmarks/mock_murf.py for load tests
+    MURF_API_URL = os.getenv("MURF_API_URL", "https://api.murf.ai/v1/speech/generate")
     DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
     
     # CORS
@@ -23,14 +42,122 @@ class Config:
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_FILE = os.getenv("LOG_FILE", "app.log")
+    # Max INFO/DEBUG lines per call site per second; warnings and errors are never throttled
+    LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "10"))
+    
+    # Tracing: the slowest N request traces are kept for /debug/traces; spans
+    # are optionally exported as JSONL and/or to an OTLP/HTTP collector
+    TRACE_FILE = os.getenv("TRACE_FILE") or None
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT") or None
+    TRACE_SLOWEST_N = int(os.getenv("TRACE_SLOWEST_N", "20"))
+    
+    # Event-loop saturation monitor; /ready answers 503 (and /health reports
+    # "degraded", still 200) while the p95 lag or threadpool wait passes the
+    # threshold, or the threadpool queue / in-flight limit stays saturated for
+    # LOOP_SATURATION_SECONDS
+    LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+    LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+    LOOP_SATURATION_SECONDS = float(os.getenv("LOOP_SATURATION_SECONDS", "5"))
+    MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "64"))
+    
+    # Adaptive admission control for heavy endpoints (per worker)
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", str(os.cpu_count() or 2)))
+    ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "1"))
+    ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", str(4 * (os.cpu_count() or 2))))
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "8"))
+    ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+    HEAVY_PATHS = ("/api/process-audio", "/api/process-batch")
+    
+    # /debug endpoints: require this token in X-Debug-Token (disabled in production when unset)
+    DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
     
     # File Upload
-    UPLOAD_DIR = "temp_uploads"
+    # Uploads in flight and rendered TTS audio (served under /static)
+    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "temp_uploads")
     MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS = {"wav", "mp3", "ogg", "flac", "m4a"}
     
+    # Async Job Queue
+    JOB_DIR = os.getenv("JOB_DIR", "job_data")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+    # Claims per job before one that keeps killing or hanging its worker is failed
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    
+    # Per-client rate limiting (token buckets shared by all workers via SQLite).
+    # Requests carrying a known X-API-Key draw from that key's bucket, all
+    # others from their IP's bucket. Each endpoint debits its cost in tokens.
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(JOB_DIR, "ratelimit.sqlite3"))
+    RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "1"))  # tokens per second
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "30"))
+    RATE_LIMIT_KEY_RATE = float(os.getenv("RATE_LIMIT_KEY_RATE", "5"))
+    RATE_LIMIT_KEY_BURST = float(os.getenv("RATE_LIMIT_KEY_BURST", "150"))
+    # Proxies (comma-separated IPs/CIDRs) whose X-Forwarded-For / X-Real-IP
+    # headers name the client. Connections from anywhere else are limited by
+    # their own address. Behind nginx or a PaaS load balancer this must cover
+    # the proxy, or every client shares the proxy's bucket.
+    RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")
+    API_KEYS = {key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()}
+    # (method, path prefix, cost); unlisted endpoints are free
+    RATE_LIMIT_COSTS = (
+        ("POST", "/api/process-audio", 10),
+        ("POST", "/api/process-batch", 10),
+        ("POST", "/api/jobs", 10),
+        ("POST", "/api/demo/", 1),
+    )
+    
+    # Sliding-window segmentation (process-audio?segment=true)
+    SEGMENT_WINDOW_SECONDS = float(os.getenv("SEGMENT_WINDOW_SECONDS", "1.0"))
+    SEGMENT_HOP_SECONDS = float(os.getenv("SEGMENT_HOP_SECONDS", "0.5"))
+    SEGMENT_THRESHOLD_DB = float(os.getenv("SEGMENT_THRESHOLD_DB", "-40"))
+    SEGMENT_MAX_WINDOWS = int(os.getenv("SEGMENT_MAX_WINDOWS", "2000"))
+    
+    # Batch Processing
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+    BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+    BATCH_MAX_TOTAL_SIZE = int(os.getenv("BATCH_MAX_TOTAL_SIZE", str(100 * 1024 * 1024)))  # 100MB
+    BATCH_TTS_CONCURRENCY = int(os.getenv("BATCH_TTS_CONCURRENCY", "4"))
+    
+    # Live Streaming (/ws/listen)
+    STREAM_DEFAULT_SAMPLE_RATE = int(os.getenv("STREAM_DEFAULT_SAMPLE_RATE", "16000"))
+    STREAM_UPDATE_INTERVAL_MS = int(os.getenv("STREAM_UPDATE_INTERVAL_MS", "500"))
+    STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "60"))
+    STREAM_MAX_CHUNK_BYTES = 256 * 1024
+    
+    # Acoustic fingerprinting of known reference clips
+    # Layout: <dir>/<Animal>/<Emotion>/*.wav or <dir>/<animal>-<emotion>*.wav
+    FINGERPRINT_DIR = os.getenv("FINGERPRINT_DIR", "reference_clips")
+    FINGERPRINT_CACHE_PATH = os.getenv("FINGERPRINT_CACHE_PATH", os.path.join(JOB_DIR, "fingerprints.npz"))
+    # Hashes that must line up at one time offset before a clip counts as a match
+    FINGERPRINT_MIN_MATCHES = int(os.getenv("FINGERPRINT_MIN_MATCHES", "15"))
+    
     # Model Configuration
     MODEL_PATH = os.getenv("MODEL_PATH", "models/emotion_classifier.h5")
+    # auto, keras, knn, heuristic or cascade (see EmotionClassifier)
+    CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "auto").lower()
+    # Reference library for the kNN backend (python -m services.knn_index <clips> <dir>)
+    KNN_LIBRARY_PATH = os.getenv("KNN_LIBRARY_PATH", "models/knn_library")
+    KNN_K = int(os.getenv("KNN_K", "10"))
+    # Minimum kNN vote share the cascade accepts without escalating to the model
+    CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.8"))
+    
+    # Import the audio stack and compile its kernels in the background at
+    # startup, instead of on the first request
+    WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+    # Import-time budget for `python startup_report.py` (milliseconds)
+    STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+    
+    # Cache-Control max-age (seconds) for deploy-static metadata endpoints
+    METADATA_CACHE_MAX_AGE = int(os.getenv("METADATA_CACHE_MAX_AGE", "300"))
+    
+    # Demo Configuration
+    # Render TTS for every demo phrase in the background at startup
+    DEMO_PRERENDER_AUDIO = os.getenv("DEMO_PRERENDER_AUDIO", "false").lower() == "true"
     
     @classmethod
     def validate(cls):
@@ -51,14 +178,13 @@ class Config:
     
     @classmethod
     def setup_logging(cls):
-        """Setup application logging"""
-        logging.basicConfig(
+        """Setup application logging: a queue handler drained by a background writer thread"""
+        from services.structured_logging import configure_logging
+        configure_logging(
             level=getattr(logging, cls.LOG_LEVEL),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('app.log')
-            ]
+            log_format=cls.LOG_FORMAT,
+            log_file=cls.LOG_FILE or None,
+            rate_limit=cls.LOG_RATE_LIMIT
         )
 
 config = Config()
@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.audio_processor import load_and_preprocess_audio, FEATURE_VERSION, N_MFCC
+from services.fingerprint import AUDIO_EXTENSIONS, label_from_path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract(path):
+    # Strict: an undecodable clip must be counted as failed, not stored as mock features
+    features = load_and_preprocess_audio(path, strict=True)
+    return None if features is None else np.asarray(features, dtype=np.float32)
+
+
+class FeatureStore:
+    """
+    On-disk store of training features, keyed by file content hash.
+
+    Each feature version gets its own directory of .npy shards plus a JSON
+    manifest, so changing the feature code never mixes old and new vectors.
+    Files are only re-hashed when their size or mtime changes, and only
+    hashes missing from the store are extracted, so re-runs over a growing
+    dataset touch just the new or edited clips.
+
+    Layout::
+
+        <root>/v<FEATURE_VERSION>/manifest.json
+        <root>/v<FEATURE_VERSION>/shard_00000.npy   (rows, N_MFCC) float32
+    """
+
+    def __init__(self, root, feature_version=FEATURE_VERSION):
+        self.directory = os.path.join(root, f"v{feature_version}")
+        self.feature_version = feature_version
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_manifest()
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        # files: relative path -> {size, mtime, hash, animal, emotion}
+        # features: hash -> [shard, row], or None if extraction failed
+        self.files = {}
+        self.features = {}
+        self.shards = []
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            self.files = manifest["files"]
+            self.features = manifest["features"]
+            self.shards = manifest["shards"]
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({
+                "feature_version": self.feature_version,
+                "files": self.files,
+                "features": self.features,
+                "shards": self.shards,
+            }, f)
+        os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        return sum(1 for entry in self.files.values() if self.features.get(entry["hash"]))
+
+    def _scan(self, data_dir):
+        """Return manifest entries for the labelled clips under data_dir, hashing only changed files."""
+        seen = {}
+        for root, _, filenames in os.walk(data_dir):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, data_dir)
+                label = label_from_path(path, data_dir)
+                if label is None:
+                    logger.warning(f"Skipping unlabelled clip: {path}")
+                    continue
+
+                stat = os.stat(path)
+                entry = self.files.get(relative)
+                if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                    entry = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": file_hash(path)}
+                entry["animal"], entry["emotion"] = label
+                seen[relative] = entry
+        return seen
+
+    def sync(self, data_dir, workers=None):
+        """
+        Bring the store up to date with the labelled clips under data_dir.
+
+        Clips are labelled like reference clips (<Animal>/<Emotion>/clip.wav
+        or animal-emotion-*.wav). Clips that disappeared are dropped from the
+        manifest; their stored rows stay in place.
+
+        Args:
+            data_dir: Directory of labelled clips
+            workers: Extraction processes (default: CPU count); 1 extracts in-process
+
+        Returns:
+            dict with total, extracted and failed counts
+        """
+        self.files = self._scan(data_dir)
+
+        # Clips whose extraction failed before are retried
+        missing = {}
+        for relative, entry in self.files.items():
+            if self.features.get(entry["hash"]) is None:
+                missing.setdefault(entry["hash"], os.path.join(data_dir, relative))
+
+        extracted = failed = 0
+        if missing:
+            hashes = list(missing)
+            paths = [missing[h] for h in hashes]
+            workers = workers or os.cpu_count() or 1
+            logger.info(f"Extracting features for {len(paths)} clips with {workers} processes")
+            if workers > 1:
+                # spawn avoids forking a process that may hold TensorFlow threads
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    results = list(pool.map(_extract, paths, chunksize=max(1, len(paths) // (workers * 4))))
+            else:
+                results = [_extract(path) for path in paths]
+
+            rows = []
+            shard = f"shard_{len(self.shards):05d}.npy"
+            for digest, features in zip(hashes, results):
+                if features is None or features.shape != (N_MFCC,):
+                    logger.warning(f"Feature extraction failed for {missing[digest]}; leaving it out of the store")
+                    self.features[digest] = None
+                    failed += 1
+                    continue
+                self.features[digest] = [shard, len(rows)]
+                rows.append(features)
+                extracted += 1
+            if rows:
+                np.save(os.path.join(self.directory, shard), np.stack(rows))
+                self.shards.append(shard)
+
+        self._save_manifest()
+        return {"total": len(self), "extracted": extracted, "failed": failed}
+
+    def index(self, keep=None):
+        """
+        Rows to read for the clips currently in the store.
+
+        Args:
+            keep: Optional predicate (animal, emotion) -> bool selecting clips
+
+        Returns:
+            list of (shard, row, animal, emotion), grouped by shard
+        """
+        rows = []
+        for relative in sorted(self.files):
+            entry = self.files[relative]
+            location = self.features.get(entry["hash"])
+            if location and (keep is None or keep(entry["animal"], entry["emotion"])):
+                rows.append((location[0], location[1], entry["animal"], entry["emotion"]))
+        rows.sort(key=lambda r: (r[0], r[1]))
+        return rows
+
+    def iter_batches(self, batch_size=256, shuffle=False, seed=None, keep=None):
+        """
+        Yield (features, animals, emotions) batches read from memory-mapped shards.
+
+        Only one shard's selected rows are in memory at a time. With shuffle,
+        shard order and the rows within each shard are permuted.
+        """
+        by_shard = {}
+        for shard, row, animal, emotion in self.index(keep):
+            by_shard.setdefault(shard, []).append((row, animal, emotion))
+
+        rng = np.random.default_rng(seed)
+        shards = list(by_shard)
+        if shuffle:
+            rng.shuffle(shards)
+
+        for shard in shards:
+            entries = by_shard[shard]
+            if shuffle:
+                entries = [entries[i] for i in rng.permutation(len(entries))]
+            matrix = np.load(os.path.join(self.directory, shard), mmap_mode="r")
+            for start in range(0, len(entries), batch_size):
+                chunk = entries[start:start + batch_size]
+                yield (
+                    np.asarray(matrix[[row for row, _, _ in chunk]], dtype=np.float32),
+                    [animal for _, animal, _ in chunk],
+                    [emotion for _, _, emotion in chunk],
+                )
+
+    def as_tf_dataset(self, label_fn, batch_size=32, shuffle=True, keep=None):
+        """
+        Stream the store as a batched, prefetching tf.data.Dataset.
+
+        Args:
+            label_fn: Maps (animals, emotions) lists to the training target
+                (an int32 array, or a dict of them for multi-output models)
+            batch_size: Training batch size
+            shuffle: Reshuffle shard and row order every epoch
+            keep: Optional predicate (animal, emotion) -> bool selecting clips
+        """
+        import tensorflow as tf
+
+        sample = label_fn(["Dog"], ["Happy"])
+
+        def signature(value):
+            return tf.TensorSpec(shape=(None,) + np.asarray(value).shape[1:], dtype=tf.int32)
+
+        if isinstance(sample, dict):
+            label_spec = {name: signature(value) for name, value in sample.items()}
+        else:
+            label_spec = signature(sample)
+
+        def generator():
+            for features, animals, emotions in self.iter_batches(batch_size=1024, shuffle=shuffle, keep=keep):
+                yield features, label_fn(animals, emotions)
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(tf.TensorSpec(shape=(None, N_MFCC), dtype=tf.float32), label_spec),
+        )
+        return dataset.unbatch().batch(batch_size).prefetch(tf.data.AUTOTUNE)
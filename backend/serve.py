@@ -0,0 +1,239 @@
+"""
+Pre-fork server entry point.
+
+    python serve.py --host 0.0.0.0 --port 8000
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker imports
+numpy/librosa, builds the translator catalog and loads the classifier on
+its own. Here the master process does that once, freezes the GC so those
+objects are never touched (and copied) again, then forks the workers.
+Pages stay shared copy-on-write, so workers start in well under a second
+and each one only adds the memory it writes to.
+
+The worker count defaults to the CPU quota of the container's cgroup rather
+than the host's core count; WEB_CONCURRENCY or --workers override it.
+Workers that die are replaced.
+"""
+import os
+import gc
+import sys
+import math
+import time
+import shutil
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+import importlib
+
+logger = logging.getLogger("zoolingo-serve")
+
+# Imported by the master before forking. The app module itself is imported
+# in each worker: it opens SQLite connections and starts threads, and
+# neither survives a fork.
+PRELOAD_MODULES = (
+    "numpy",
+    "scipy.signal",
+    "librosa",
+    "fastapi",
+    "services.audio_processor",
+    "services.nlp_translator",
+    "services.ai_classifier",
+    "services.pipeline",
+    "services.batch",
+)
+
+
+def cgroup_cpu_limit():
+    """CPU quota of this container from cgroup v2 or v1, or None when unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_workers():
+    """One worker per CPU of the cgroup quota (rounded up), capped by the usable cores."""
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.getenv("WEB_CONCURRENCY")))
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, math.ceil(limit))
+    return max(1, cores)
+
+
+def keras_model_will_load():
+    """
+    Whether importing the classifier would initialise TensorFlow.
+
+    TensorFlow's runtime is not fork-safe once started, so in that case the
+    classifier is left for each worker to load.
+    """
+    from config import config
+    return config.CLASSIFIER_BACKEND in ("auto", "keras", "cascade") and os.path.exists(config.MODEL_PATH)
+
+
+def prepare_metrics_dir(workers):
+    """Give multi-worker runs a fresh Prometheus multiprocess directory (before anything imports the client)."""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if workers < 2 and not path:
+        return
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "zoolingo-metrics")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def preload():
+    """Import the heavy modules into the master; returns seconds taken."""
+    start = time.perf_counter()
+    skip_classifier = keras_model_will_load()
+    for name in PRELOAD_MODULES:
+        if skip_classifier and name in ("services.ai_classifier", "services.pipeline", "services.batch"):
+            continue
+        importlib.import_module(name)
+    # Compile librosa's numba kernels once, before they are copied into every worker
+    from services.audio_processor import warm_up
+    warm_up()
+    return time.perf_counter() - start
+
+
+def bind_socket(host, port, backlog):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, args):
+    """Body of a forked worker; never returns."""
+    status = 0
+    try:
+        gc.enable()
+        # Forked workers would otherwise share numpy's global RNG state
+        import numpy as np
+        np.random.seed()
+
+        import uvicorn
+        from app import app
+
+        server = uvicorn.Server(uvicorn.Config(
+            app,
+            log_config=None,
+            access_log=False,  # app.py writes its own access lines
+            timeout_keep_alive=args.keep_alive,
+        ))
+        server.run(sockets=[sock])
+    except BaseException:
+        logger.exception("Worker %d crashed", os.getpid())
+        status = 1
+    finally:
+        logging.shutdown()
+        os._exit(status)
+
+
+class Master:
+    """Forks and supervises the workers."""
+
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.children = set()
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            run_worker(self.sock, self.args)
+        self.children.add(pid)
+        logger.info("Started worker %d", pid)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        from services.metrics import mark_worker_dead
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self.children.discard(pid)
+            mark_worker_dead(pid)
+            if not self.stopping:
+                logger.warning("Worker %d exited with status %d; replacing it", pid, os.waitstatus_to_exitcode(status))
+                time.sleep(1)  # don't spin if workers die on start-up
+                self.spawn()
+        logger.info("All workers stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="serve", description="Pre-forking ZooLingo API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: WEB_CONCURRENCY, else the cgroup CPU quota)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="Idle keep-alive timeout in seconds")
+    args = parser.parse_args(argv)
+    args.workers = args.workers or default_workers()
+
+    prepare_metrics_dir(args.workers)
+
+    from config import config
+    from services.structured_logging import shutdown_logging
+    config.setup_logging()
+
+    # Objects created while preloading are permanent; keep the collector from
+    # touching (and so un-sharing) their pages, in the master and the workers
+    gc.disable()
+    seconds = preload()
+    gc.freeze()
+    logger.info("Preloaded %d modules in %.2fs; forking %d workers on %s:%d",
+                len(sys.modules), seconds, args.workers, args.host, args.port)
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    # The log writer thread would not survive fork; each worker starts its own
+    shutdown_logging()
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                        force=True)
+    Master(sock, args).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
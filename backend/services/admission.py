@@ -0,0 +1,142 @@
+import math
+import asyncio
+import logging
+from collections import deque
+
+from config import config
+from services.metrics import ADMISSION_DECISIONS, ADMISSION_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Over capacity, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Adaptive per-worker concurrency limit for expensive requests.
+
+    The limit follows a gradient rule: a fast EWMA of recent latencies is
+    compared with a slow baseline EWMA, and when recent requests run slower
+    than `tolerance` times the baseline the limit shrinks proportionally;
+    otherwise it grows by about sqrt(limit) per update. Requests over the
+    limit wait in a short bounded queue and are rejected once it is full or
+    their wait times out.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=64, queue_size=8,
+                 queue_timeout=1.0, tolerance=2.0, smoothing=0.2):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_use = 0
+        self.short_rtt = None
+        self.long_rtt = None
+        self._waiters = deque()
+        ADMISSION_LIMIT.set(self.limit)
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from current latency and backlog."""
+        per_request = self.short_rtt or 1.0
+        return max(1, math.ceil(per_request * (self.queued + 1) / self.capacity))
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now (never queues)."""
+        if self.in_use < self.capacity and not self._waiters:
+            self.in_use += 1
+            return True
+        return False
+
+    async def acquire(self, lane: str = "heavy"):
+        """
+        Take a slot, waiting briefly if the worker is at its limit.
+
+        Raises:
+            Rejected: when the queue is full or the wait timed out
+        """
+        if self.try_acquire():
+            ADMISSION_DECISIONS.labels(lane, "admitted").inc()
+            return
+        if self.queued >= self.queue_size:
+            ADMISSION_DECISIONS.labels(lane, "rejected").inc()
+            raise Rejected(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_DECISIONS.labels(lane, "timed_out").inc()
+            raise Rejected(self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away after being handed a slot: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # release() handed its slot straight to this waiter
+        ADMISSION_DECISIONS.labels(lane, "queued").inc()
+
+    def release(self, latency=None):
+        """Free a slot, feeding the request's latency (seconds) into the limit."""
+        if latency is not None:
+            self.observe(latency)
+        while self._waiters and self.in_use <= self.capacity:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over without decrementing in_use
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+
+    def observe(self, latency: float):
+        if self.short_rtt is None:
+            self.short_rtt = self.long_rtt = latency
+            return
+        self.short_rtt += 0.2 * (latency - self.short_rtt)
+        self.long_rtt += 0.02 * (latency - self.long_rtt)
+        # Recover the baseline quickly when things get faster
+        self.long_rtt = min(self.long_rtt, self.short_rtt)
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit += self.smoothing * (target - self.limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, self.limit)))
+        ADMISSION_LIMIT.set(self.limit)
+
+    def snapshot(self):
+        return {
+            "limit": round(self.limit, 2),
+            "in_use": self.in_use,
+            "queued": self.queued,
+            "short_latency_ms": round(1000 * self.short_rtt, 1) if self.short_rtt else None,
+            "baseline_latency_ms": round(1000 * self.long_rtt, 1) if self.long_rtt else None,
+        }
+
+
+admission = AdmissionController(
+    initial_limit=config.ADMISSION_INITIAL_LIMIT,
+    min_limit=config.ADMISSION_MIN_LIMIT,
+    max_limit=config.ADMISSION_MAX_LIMIT,
+    queue_size=config.ADMISSION_QUEUE_SIZE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+)
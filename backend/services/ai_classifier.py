@@ -1,7 +1,13 @@
 import numpy as np
 import random
 import os
+import time
 import logging
+import threading
+
+from config import config
+from services.knn_index import load_library
+from services.metrics import stage_timer, CASCADE_CLIPS
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +25,9 @@ EMOTIONS = [
     "Singing", "Chatty", "Aggressive", "Lonely"
 ]
 
+# Batches up to this size bypass Keras predict() and call the model directly
+DIRECT_CALL_MAX_ROWS = 64
+
 # Common emotions that work for most animals
 COMMON_EMOTIONS = ["Happy", "Angry", "Sad", "Hungry", "Pain", "Excited", "Scared", "Curious"]
 
@@ -52,17 +61,79 @@ ANIMAL_FREQUENCY_PROFILES = {
 }
 
 
+class CascadeStats:
+    """
+    Thread-safe per-stage counters for the classifier cascade.
+    
+    A stage "answers" a clip when its result is returned without escalating.
+    Counts are also exported as zoolingo_cascade_clips_total.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+    
+    def record(self, stage, calls, answered, seconds):
+        CASCADE_CLIPS.labels(stage, "hit").inc(answered)
+        CASCADE_CLIPS.labels(stage, "fallback").inc(calls - answered)
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"calls": 0, "answered": 0, "seconds": 0.0})
+            entry["calls"] += calls
+            entry["answered"] += answered
+            entry["seconds"] += seconds
+    
+    def snapshot(self):
+        """Return {stage: {calls, answered, hit_rate, avg_latency_ms}}."""
+        with self._lock:
+            return {
+                stage: {
+                    "calls": entry["calls"],
+                    "answered": entry["answered"],
+                    "hit_rate": round(entry["answered"] / entry["calls"], 3) if entry["calls"] else 0.0,
+                    "avg_latency_ms": round(1000 * entry["seconds"] / entry["calls"], 3) if entry["calls"] else 0.0,
+                }
+                for stage, entry in self._stages.items()
+            }
+
+
 class EmotionClassifier:
     """
     Comprehensive AI classifier for detecting animal type and emotion from audio features.
     Supports 15+ animals with multiple emotion states.
-    Uses trained model if available, with intelligent heuristic fallback.
+    
+    Backends, selected with CLASSIFIER_BACKEND:
+    - "keras": trained model from MODEL_PATH
+    - "knn": nearest-neighbour vote over a reference library at KNN_LIBRARY_PATH
+    - "heuristic": feature-statistics heuristic
+    - "auto" (default): the first of keras, knn, heuristic that is available
+    - "cascade": kNN answers clips it is confident about (CASCADE_THRESHOLD);
+      the rest escalate to the Keras model
     """
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend=None, knn_library_path=None, cascade_threshold=None):
         self.model = None
         self.model_loaded = False
+        self.model_version = "heuristic"
+        self.knn_library = None
+        self.knn_k = config.KNN_K
+        self.backend = (backend or config.CLASSIFIER_BACKEND).lower()
+        if cascade_threshold is None:
+            cascade_threshold = config.CASCADE_THRESHOLD
+        self.cascade_threshold = cascade_threshold
+        self.stats = CascadeStats()
+        
+        if self.backend in ("auto", "keras", "cascade"):
+            self._load_model(model_path)
         
+        if self.backend in ("knn", "cascade") or (self.backend == "auto" and not self.model_loaded):
+            if knn_library_path is None:
+                knn_library_path = config.KNN_LIBRARY_PATH
+            self.knn_library = load_library(knn_library_path)
+            if self.knn_library is not None and not self.model_loaded:
+                self.model_version = f"knn:{len(self.knn_library)}"
+    
+    def _load_model(self, model_path):
+        """Load the trained Keras model if one exists."""
         if model_path is None:
             model_path = os.getenv("MODEL_PATH", "models/emotion_classifier.h5")
         
@@ -71,12 +142,27 @@ class EmotionClassifier:
                 import tensorflow as tf
                 self.model = tf.keras.models.load_model(model_path)
                 self.model_loaded = True
+                self.model_version = f"{os.path.basename(model_path)}@{int(os.path.getmtime(model_path))}"
                 logger.info(f"Loaded trained model from {model_path}")
             except Exception as e:
                 logger.warning(f"Failed to load model: {e}. Using heuristic fallback.")
         else:
             logger.info("No trained model found. Using advanced heuristic classification.")
     
+    def _span_attributes(self, rows):
+        return {"model.backend": self.active_backend, "model.version": self.model_version, "batch.size": rows}
+    
+    @property
+    def active_backend(self):
+        """Name of the backend predictions currently come from."""
+        if self.backend == "cascade" and self.knn_library is not None:
+            return "cascade"
+        if self.model and self.model_loaded:
+            return "keras"
+        if self.knn_library is not None:
+            return "knn"
+        return "heuristic"
+    
     def predict(self, features):
         """
         Predict animal and emotion from audio features.
@@ -87,16 +173,122 @@ class EmotionClassifier:
         Returns:
             dict with animal, emotion, and confidence
         """
+        with stage_timer("inference", **self._span_attributes(1)):
+            return self._predict(features)
+    
+    def _predict(self, features):
+        if self.active_backend == "cascade":
+            return self._cascade(np.expand_dims(features, axis=0))[0]
+        
         if self.model and self.model_loaded:
             try:
-                prediction = self.model.predict(np.expand_dims(features, axis=0), verbose=0)
+                prediction = self._run_model(np.expand_dims(features, axis=0))
                 return self._decode_prediction(prediction)
             except Exception as e:
                 logger.error(f"Model prediction failed: {e}. Using heuristic fallback.")
         
+        if self.knn_library is not None:
+            try:
+                return self.knn_library.predict(features, k=self.knn_k)[0]
+            except Exception as e:
+                logger.error(f"kNN prediction failed: {e}. Using heuristic fallback.")
+        
         # Advanced heuristic classification
         return self._heuristic_classify(features)
     
+    def predict_batch(self, features_batch):
+        """
+        Predict animal and emotion for many feature vectors at once.
+        
+        With a trained model the whole batch goes through a single forward
+        pass; the heuristic fallback classifies row by row.
+        
+        Args:
+            features_batch: 2D array of shape (n_samples, n_features)
+            
+        Returns:
+            list of dicts with animal, emotion, and confidence
+        """
+        with stage_timer("inference", **self._span_attributes(len(features_batch))):
+            return self._predict_batch(features_batch)
+    
+    def _predict_batch(self, features_batch):
+        features_batch = np.asarray(features_batch)
+        if len(features_batch) == 0:
+            return []
+        
+        if self.active_backend == "cascade":
+            return self._cascade(features_batch)
+        
+        if self.model and self.model_loaded:
+            try:
+                return self._model_predict_batch(features_batch)
+            except Exception as e:
+                logger.error(f"Batch model prediction failed: {e}. Using heuristic fallback.")
+        
+        if self.knn_library is not None:
+            try:
+                return self.knn_library.predict(features_batch, k=self.knn_k)
+            except Exception as e:
+                logger.error(f"Batch kNN prediction failed: {e}. Using heuristic fallback.")
+        
+        return [self._heuristic_classify(features) for features in features_batch]
+    
+    def _run_model(self, features_batch):
+        """
+        One forward pass over a batch.
+        
+        Small batches call the model directly: Keras predict() builds a data
+        pipeline on every call, which costs more than the forward pass itself
+        for a handful of rows.
+        """
+        if len(features_batch) <= DIRECT_CALL_MAX_ROWS and callable(self.model):
+            outputs = self.model(np.asarray(features_batch, dtype=np.float32), training=False)
+            if isinstance(outputs, (tuple, list)):
+                return [np.asarray(head) for head in outputs]
+            return np.asarray(outputs)
+        return self.model.predict(features_batch, verbose=0)
+    
+    def _model_predict_batch(self, features_batch):
+        prediction = self._run_model(features_batch)
+        return [
+            self._decode_prediction(self._prediction_row(prediction, i))
+            for i in range(len(features_batch))
+        ]
+    
+    def _cascade(self, features_batch):
+        """
+        Two-stage classification.
+        
+        The kNN stage runs on every clip; clips whose vote share is below
+        cascade_threshold escalate to the Keras model in one forward pass.
+        Without a model, or if it fails, the kNN answers stand.
+        """
+        start = time.perf_counter()
+        results = self.knn_library.predict(features_batch, k=self.knn_k)
+        uncertain = [i for i, result in enumerate(results) if result["confidence"] < self.cascade_threshold]
+        can_escalate = bool(uncertain) and self.model is not None and self.model_loaded
+        answered = len(results) - len(uncertain) if can_escalate else len(results)
+        self.stats.record("knn", len(results), answered, time.perf_counter() - start)
+        
+        if can_escalate:
+            start = time.perf_counter()
+            try:
+                for i, result in zip(uncertain, self._model_predict_batch(features_batch[uncertain])):
+                    results[i] = result
+                self.stats.record("keras", len(uncertain), len(uncertain), time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Cascade escalation failed: {e}. Keeping kNN results.")
+                self.stats.record("keras", len(uncertain), 0, time.perf_counter() - start)
+        return results
+    
+    @staticmethod
+    def _prediction_row(prediction, i):
+        """Slice row i out of a batched prediction, keeping one row per output head."""
+        if isinstance(prediction, (tuple, list)):
+            return [head[i:i + 1] for head in prediction]
+        return prediction[i:i + 1]
+    
     def _heuristic_classify(self, features):
         """
         Advanced heuristic-based classification using audio feature analysis.
@@ -246,11 +438,16 @@ class EmotionClassifier:
     def _decode_prediction(self, prediction):
         """
         Decode model prediction to animal and emotion.
+        
+        Emotion outputs sized to EMOTIONS (as train_model.py builds them)
+        index into EMOTIONS; older models sized to COMMON_EMOTIONS still
+        decode against that list.
         """
         try:
             if isinstance(prediction, (tuple, list)) and len(prediction) >= 2:
-                animal_pred = prediction[0]
-                emotion_pred = prediction[1]
+                animal_pred = np.asarray(prediction[0]).flatten()
+                emotion_pred = np.asarray(prediction[1]).flatten()
+                emotion_labels = EMOTIONS if len(emotion_pred) == len(EMOTIONS) else COMMON_EMOTIONS
                 
                 animal_idx = np.argmax(animal_pred)
                 emotion_idx = np.argmax(emotion_pred)
@@ -262,7 +459,8 @@ class EmotionClassifier:
                 flat_pred = np.array(prediction).flatten()
                 
                 num_animals = len(ANIMALS)
-                num_emotions = len(COMMON_EMOTIONS)
+                emotion_labels = EMOTIONS if len(flat_pred) == num_animals + len(EMOTIONS) else COMMON_EMOTIONS
+                num_emotions = len(emotion_labels)
                 
                 if len(flat_pred) >= num_animals + num_emotions:
                     animal_idx = np.argmax(flat_pred[:num_animals])
@@ -275,7 +473,7 @@ class EmotionClassifier:
             
             return {
                 "animal": ANIMALS[animal_idx % len(ANIMALS)],
-                "emotion": COMMON_EMOTIONS[emotion_idx % len(COMMON_EMOTIONS)],
+                "emotion": emotion_labels[emotion_idx % len(emotion_labels)],
                 "confidence": round(min(0.99, confidence), 2)
             }
             
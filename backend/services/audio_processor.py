@@ -1,19 +1,56 @@
 import numpy as np
 import os
+import time
+import shutil
 import logging
+import importlib
+import subprocess
+
+from services.metrics import stage_timer
 
 logger = logging.getLogger(__name__)
 
-# Try to import librosa, but don't fail if not available
-try:
-    import librosa
-    LIBROSA_AVAILABLE = True
-    logger.info("Librosa audio processing available")
-except ImportError:
-    LIBROSA_AVAILABLE = False
-    logger.warning("Librosa not available. Audio processing will use fallback mode.")
+# librosa (with the numba/scipy stack behind it) and soundfile are imported on
+# first use rather than with this module; warm_up() pays that cost up front.
+_optional_modules = {}
+
+_MISSING_MESSAGES = {
+    "librosa": "Librosa not available. Audio processing will use fallback mode.",
+    "soundfile": "soundfile not available. Block-streaming decode disabled.",
+}
+
+
+def _optional_module(name):
+    """Import an optional dependency once; None if it isn't usable."""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except (ImportError, OSError):
+            _optional_modules[name] = None
+            logger.warning(_MISSING_MESSAGES[name])
+    return _optional_modules[name]
+
+
+def _librosa():
+    return _optional_module("librosa")
 
-def load_and_preprocess_audio(file_path, duration=3, sr=22050):
+
+def _soundfile():
+    return _optional_module("soundfile")
+
+# ffmpeg decodes formats libsndfile can't (m4a/AAC, older mp3) through a pipe
+FFMPEG_PATH = shutil.which("ffmpeg")
+FFPROBE_PATH = shutil.which("ffprobe")
+
+# MFCC frame parameters (librosa defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+
+# Bump when load_and_preprocess_audio's output changes; invalidates stored training features
+FEATURE_VERSION = 1
+
+def load_and_preprocess_audio(file_path, duration=3, sr=22050, strict=False):
     """
     Load audio file, denoise (simple), and extract MFCC features.
     
@@ -21,43 +58,52 @@ def load_and_preprocess_audio(file_path, duration=3, sr=22050):
         file_path: Path to the audio file
         duration: Maximum duration to process in seconds
         sr: Sample rate for processing
+        strict: Return None instead of mock features when the audio can't be
+            decoded, is empty or silent, or librosa isn't available. Use this
+            wherever features are stored or reported per file.
         
     Returns:
         MFCC feature vector or mock features if librosa not available
     """
+    fallback = (lambda: None) if strict else (lambda: _generate_mock_features(file_path))
     try:
         if not os.path.exists(file_path):
             logger.error(f"Audio file not found: {file_path}")
             return None
         
-        if LIBROSA_AVAILABLE:
-            return _process_with_librosa(file_path, duration, sr)
+        if _librosa() is not None:
+            return _process_with_librosa(file_path, duration, sr, fallback)
         else:
-            return _generate_mock_features(file_path)
+            return fallback()
             
     except Exception as e:
         logger.error(f"Error processing audio: {e}")
         # Return fallback features instead of None to allow demo to continue
-        return _generate_mock_features(file_path)
+        return fallback()
 
-def _process_with_librosa(file_path, duration, sr):
+def _process_with_librosa(file_path, duration, sr, fallback):
     """
     Process audio using librosa for proper MFCC extraction.
     """
+    librosa = _librosa()
     try:
-        # Load audio
-        y, sr = librosa.load(file_path, sr=sr, duration=duration)
+        # Decode only the first `duration` seconds, block by block
+        with stage_timer("decode", **{"audio.sample_rate": sr}) as span:
+            blocks = list(stream_audio(file_path, sr=sr, max_duration=duration))
+            y = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+            span.set_attribute("audio.duration", round(len(y) / sr, 3))
         
         if len(y) == 0:
             logger.warning("Empty audio file")
-            return _generate_mock_features(file_path)
+            return fallback()
         
         # Simple noise reduction (trim silence)
-        y, _ = librosa.effects.trim(y)
+        with stage_timer("trim"):
+            y, _ = librosa.effects.trim(y)
         
         if len(y) == 0:
             logger.warning("Audio file contains only silence")
-            return _generate_mock_features(file_path)
+            return fallback()
         
         # Pad or truncate to ensure consistent length
         target_length = int(sr * duration)
@@ -67,17 +113,19 @@ def _process_with_librosa(file_path, duration, sr):
             y = y[:target_length]
         
         # Extract MFCCs
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        
-        # Return mean of MFCCs (simple feature vector)
-        features = np.mean(mfccs.T, axis=0)
+        with stage_timer("mfcc"):
+            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+            
+            # Return mean of MFCCs (simple feature vector)
+            features = np.mean(mfccs.T, axis=0)
         
-        logger.info(f"Extracted MFCC features: shape={features.shape}, mean={np.mean(features):.2f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Extracted MFCC features: shape=%s, mean=%.2f", features.shape, np.mean(features))
         return features
         
     except Exception as e:
         logger.error(f"Librosa processing failed: {e}")
-        return _generate_mock_features(file_path)
+        return fallback()
 
 def _generate_mock_features(file_path):
     """
@@ -113,7 +161,8 @@ def _generate_mock_features(file_path):
         variation = (file_size / 10000) % 5
         base += variation
         
-        logger.info(f"Generated mock features: shape={base.shape}, mean={np.mean(base):.2f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated mock features: shape=%s, mean=%.2f", base.shape, np.mean(base))
         return base
         
     except Exception as e:
@@ -123,7 +172,7 @@ def _generate_mock_features(file_path):
 
 def get_audio_duration(file_path):
     """
-    Get the duration of an audio file.
+    Get the duration of an audio file from its headers, without decoding.
     
     Args:
         file_path: Path to the audio file
@@ -132,7 +181,24 @@ def get_audio_duration(file_path):
         Duration in seconds, or None if unable to determine
     """
     try:
-        if LIBROSA_AVAILABLE:
+        sf = _soundfile()
+        if sf is not None:
+            try:
+                return sf.info(file_path).duration
+            except RuntimeError:
+                pass
+        
+        if FFPROBE_PATH:
+            result = subprocess.run(
+                [FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=noprint_wrappers=1:nokey=1", file_path],
+                capture_output=True, text=True, timeout=10
+            )
+            if result.returncode == 0 and result.stdout.strip():
+                return float(result.stdout.strip())
+        
+        librosa = _librosa()
+        if librosa is not None:
             duration = librosa.get_duration(path=file_path)
             return duration
         else:
@@ -144,3 +210,278 @@ def get_audio_duration(file_path):
     except Exception as e:
         logger.error(f"Could not get audio duration: {e}")
         return None
+
+class StreamingResampler:
+    """
+    Resample audio chunk by chunk without edge artifacts between chunks.
+    
+    Uses soxr's streaming resampler when available (it ships with librosa),
+    otherwise falls back to linear interpolation that carries its phase
+    across chunks.
+    """
+    
+    def __init__(self, in_rate, out_rate):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self._stream = None
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._pos = 0.0
+        
+        if in_rate != out_rate:
+            try:
+                import soxr
+                self._stream = soxr.ResampleStream(in_rate, out_rate, 1, dtype="float32")
+            except ImportError:
+                logger.info("soxr not available. Using linear interpolation for resampling.")
+    
+    def process(self, chunk, last=False):
+        """
+        Resample one mono float32 chunk.
+        
+        Args:
+            chunk: 1D array of samples at in_rate
+            last: True for the final chunk, to flush buffered samples
+            
+        Returns:
+            1D float32 array of samples at out_rate
+        """
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if self.in_rate == self.out_rate:
+            return chunk
+        if self._stream is not None:
+            return self._stream.resample_chunk(chunk, last=last)
+        
+        buffer = np.concatenate([self._carry, chunk])
+        if len(buffer) < 2:
+            self._carry = buffer
+            return np.zeros(0, dtype=np.float32)
+        
+        step = self.in_rate / self.out_rate
+        positions = np.arange(self._pos, len(buffer) - 1, step)
+        out = np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+        
+        next_pos = positions[-1] + step if len(positions) else self._pos
+        keep_from = int(next_pos)
+        self._carry = buffer[keep_from:]
+        self._pos = next_pos - keep_from
+        return out
+
+
+def frame_mfcc(samples, sr):
+    """
+    Compute per-frame MFCCs over the whole frames in `samples` (no centering).
+    
+    Args:
+        samples: 1D float32 array, at least N_FFT samples long
+        sr: Sample rate of `samples`
+        
+    Returns:
+        Array of shape (n_frames, N_MFCC)
+    """
+    librosa = _librosa()
+    if librosa is not None:
+        mfccs = librosa.feature.mfcc(
+            y=samples, sr=sr, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False
+        )
+        return mfccs.T
+    
+    # Fallback: log band energies as MFCC-like features
+    n_frames = 1 + (len(samples) - N_FFT) // HOP_LENGTH
+    frames = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP_LENGTH][:n_frames]
+    power = np.abs(np.fft.rfft(frames * np.hanning(N_FFT), axis=1)) ** 2
+    bands = np.array_split(power, N_MFCC, axis=1)
+    energies = np.stack([band.sum(axis=1) for band in bands], axis=1)
+    return 10 * np.log10(energies + 1e-10)
+
+
+def _soundfile_blocks(file_path, block_seconds, max_duration):
+    """Yield (mono block, native sr) via libsndfile block reads."""
+    sf = _soundfile()
+    info = sf.info(file_path)
+    blocksize = max(1, int(block_seconds * info.samplerate))
+    frames = int(max_duration * info.samplerate) if max_duration else -1
+    for block in sf.blocks(file_path, blocksize=blocksize, frames=frames, dtype="float32", always_2d=True):
+        yield block.mean(axis=1), info.samplerate
+
+
+def _ffmpeg_blocks(file_path, block_seconds, max_duration, sr):
+    """Yield (mono block, sr) from an ffmpeg decode pipe; ffmpeg resamples to `sr`."""
+    command = [FFMPEG_PATH, "-nostdin", "-v", "error", "-i", file_path]
+    if max_duration:
+        command += ["-t", str(max_duration)]
+    command += ["-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+    
+    block_bytes = max(1, int(block_seconds * sr)) * 4
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % 4
+            yield np.frombuffer(data[:usable], dtype="<f4"), sr
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def _decode_blocks(file_path, block_seconds, max_duration, sr):
+    """
+    Yield (mono float32 block, sample rate) pairs using the best available decoder.
+    
+    Order: libsndfile block reads, an ffmpeg pipe, then a single librosa
+    decode as a last resort (the only path whose memory grows with length).
+    """
+    sf = _soundfile()
+    if sf is not None:
+        try:
+            sf.info(file_path)
+        except RuntimeError as e:
+            logger.info("soundfile cannot open %s (%s)", file_path, e)
+        else:
+            yield from _soundfile_blocks(file_path, block_seconds, max_duration)
+            return
+    
+    if FFMPEG_PATH:
+        yield from _ffmpeg_blocks(file_path, block_seconds, max_duration, sr)
+        return
+    
+    librosa = _librosa()
+    if librosa is None:
+        raise RuntimeError("No decoder available for block streaming")
+    logger.debug("Decoding %s in one pass", file_path)
+    y, native_sr = librosa.load(file_path, sr=None, mono=True, duration=max_duration)
+    yield y.astype(np.float32), native_sr
+
+
+def stream_audio(file_path, sr=22050, block_seconds=5.0, max_duration=None):
+    """
+    Decode an audio file as a stream of mono float32 blocks at `sr`.
+    
+    Blocks pass through a streaming resampler, so peak memory is one block
+    regardless of file length.
+    
+    Args:
+        file_path: Path to the audio file
+        sr: Output sample rate
+        block_seconds: Approximate block length
+        max_duration: Stop after this many seconds (None for the whole file)
+        
+    Yields:
+        1D float32 arrays of resampled audio
+    """
+    limit = int(max_duration * sr) if max_duration else None
+    emitted = 0
+    resampler = None
+    
+    for block, native_sr in _decode_blocks(file_path, block_seconds, max_duration, sr):
+        if resampler is None:
+            resampler = StreamingResampler(native_sr, sr)
+        out = resampler.process(block)
+        if limit is not None:
+            out = out[:limit - emitted]
+        if len(out):
+            emitted += len(out)
+            yield out
+        if limit is not None and emitted >= limit:
+            return
+    
+    if resampler is not None:
+        out = resampler.process(np.zeros(0, dtype=np.float32), last=True)
+        if limit is not None:
+            out = out[:limit - emitted]
+        if len(out):
+            yield out
+
+
+def segment_audio(file_path, window_seconds=1.0, hop_seconds=0.5, sr=22050,
+                  threshold_db=-40.0, block_seconds=5.0, max_windows=2000):
+    """
+    Split a recording into active windows and extract features for each.
+    
+    The file is decoded with stream_audio, and a window is kept when its RMS
+    level is above `threshold_db` (dBFS). Memory stays bounded by one block
+    plus one window regardless of file length.
+    
+    Args:
+        file_path: Path to the audio file
+        window_seconds: Analysis window length
+        hop_seconds: Step between window starts
+        sr: Sample rate for feature extraction
+        threshold_db: RMS level below which a window counts as silence
+        block_seconds: Decode block length
+        max_windows: Stop after this many active windows
+        
+    Returns:
+        list of (start_seconds, end_seconds, features) tuples, or None on failure
+    """
+    try:
+        if not os.path.exists(file_path):
+            logger.error(f"Audio file not found: {file_path}")
+            return None
+        
+        window = int(window_seconds * sr)
+        hop = int(hop_seconds * sr)
+        buffer = np.zeros(0, dtype=np.float32)
+        buffer_start = 0  # sample index of buffer[0]
+        segments = []
+        
+        def drain(buffer, buffer_start):
+            while len(buffer) >= window and len(segments) < max_windows:
+                chunk = buffer[:window]
+                rms = np.sqrt(np.mean(chunk ** 2))
+                if 20 * np.log10(rms + 1e-10) > threshold_db:
+                    features = frame_mfcc(chunk, sr).mean(axis=0)
+                    segments.append((buffer_start / sr, (buffer_start + window) / sr, features))
+                buffer = buffer[hop:]
+                buffer_start += hop
+            return buffer, buffer_start
+        
+        for block in stream_audio(file_path, sr=sr, block_seconds=block_seconds):
+            buffer = np.concatenate([buffer, block])
+            buffer, buffer_start = drain(buffer, buffer_start)
+            if len(segments) >= max_windows:
+                logger.warning(f"Segmentation stopped at {max_windows} windows")
+                break
+        
+        if len(segments) < max_windows:
+            total_samples = buffer_start + len(buffer)
+            # Pad a trailing partial window so the end of the clip is covered
+            covered = window - hop if buffer_start > 0 else 0
+            if len(buffer) > covered and len(buffer) >= N_FFT:
+                buffer = np.pad(buffer[:window], (0, max(0, window - len(buffer))))
+                buffer, buffer_start = drain(buffer, buffer_start)
+                if segments and segments[-1][1] * sr > total_samples:
+                    start, _, features = segments[-1]
+                    segments[-1] = (start, total_samples / sr, features)
+        
+        logger.debug("Segmented audio into %d active windows", len(segments))
+        return segments
+        
+    except Exception as e:
+        logger.error(f"Audio segmentation failed: {e}")
+        return None
+
+
+def warm_up(sr=22050):
+    """
+    Import the audio stack and extract features from a short synthetic clip,
+    so the first request doesn't pay for imports and numba compilation.
+    
+    Returns:
+        Seconds spent
+    """
+    start = time.perf_counter()
+    _soundfile()
+    librosa = _librosa()
+    if librosa is not None:
+        t = np.arange(sr // 2, dtype=np.float32) / sr
+        y = 0.1 * np.sin(2 * np.pi * 440 * t).astype(np.float32)
+        y, _ = librosa.effects.trim(y)
+        librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC)
+        frame_mfcc(y[:N_FFT * 2], sr)
+    return time.perf_counter() - start
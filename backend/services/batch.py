@@ -0,0 +1,225 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+import zipfile
+import zlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from config import config
+from services.audio_processor import load_and_preprocess_audio
+from services.ai_classifier import classifier
+from services.nlp_translator import translator
+from services.pipeline import synthesize_speech
+from services.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared feature-extraction process pool, creating it on first use."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn avoids forking a process that already runs worker threads
+            context = multiprocessing.get_context("spawn")
+            _process_pool = ProcessPoolExecutor(max_workers=config.BATCH_WORKERS, mp_context=context)
+            logger.info(f"Started feature extraction pool with {config.BATCH_WORKERS} processes")
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the shared process pool if it was started."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+class BatchItem:
+    """One clip in a batch request."""
+
+    def __init__(self, index: int, filename: str, path=None, error=None):
+        self.index = index
+        self.filename = filename
+        self.path = path
+        self.error = error
+
+
+def _allowed(filename: str) -> bool:
+    return filename.split(".")[-1].lower() in config.ALLOWED_EXTENSIONS
+
+
+def collect_items(uploads, work_dir: str):
+    """
+    Save uploaded files (expanding zip archives) into a working directory.
+
+    Args:
+        uploads: list of (filename, fileobj) pairs
+        work_dir: Directory the clips are written to
+
+    Returns:
+        list of BatchItem, with per-item errors for rejected entries
+    """
+    items = []
+    total_size = 0
+
+    def add(filename, fileobj, size):
+        nonlocal total_size
+        index = len(items)
+        if len(items) >= config.BATCH_MAX_FILES:
+            items.append(BatchItem(index, filename, error=f"Batch limited to {config.BATCH_MAX_FILES} files"))
+            return
+        if not _allowed(filename):
+            items.append(BatchItem(index, filename, error="Invalid file type"))
+            return
+        if size > config.MAX_UPLOAD_SIZE or total_size + size > config.BATCH_MAX_TOTAL_SIZE:
+            items.append(BatchItem(index, filename, error="File too large"))
+            return
+        path = os.path.join(work_dir, f"{index}_{uuid.uuid4().hex}.{filename.split('.')[-1]}")
+        try:
+            with open(path, "wb") as buffer:
+                shutil.copyfileobj(fileobj, buffer)
+        except BaseException:
+            # Don't leave a truncated clip behind
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        total_size += size
+        items.append(BatchItem(index, filename, path=path))
+
+    for filename, fileobj in uploads:
+        if filename.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile:
+                items.append(BatchItem(len(items), filename, error="Invalid zip archive"))
+                continue
+            with archive:
+                for info in archive.infolist():
+                    if info.is_dir() or os.path.basename(info.filename).startswith("."):
+                        continue
+                    # Encrypted members, unsupported compression and CRC errors
+                    # only fail their own entry
+                    try:
+                        with archive.open(info) as member:
+                            add(info.filename, member, info.file_size)
+                    except (zipfile.BadZipFile, RuntimeError, NotImplementedError, OSError, EOFError, zlib.error) as e:
+                        logger.warning(f"Could not extract {info.filename} from {filename}: {e}")
+                        items.append(BatchItem(len(items), info.filename, error="Could not extract from archive"))
+            continue
+
+        fileobj.seek(0, 2)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        add(filename, fileobj, size)
+
+    return items
+
+
+def _item_line(item: BatchItem, data=None) -> str:
+    if item.error:
+        payload = {"index": item.index, "filename": item.filename, "status": "error", "message": item.error}
+    else:
+        payload = {"index": item.index, "filename": item.filename, "status": "success", "data": data}
+    return json.dumps(payload) + "\n"
+
+
+def process_batch(items, work_dir: str):
+    """
+    Run the pipeline over a batch, yielding one NDJSON line per item in completion order.
+
+    Features are extracted in parallel across the process pool, every clip is
+    classified in one forward pass, and TTS runs once per distinct phrase.
+    Per-item failures are reported inline and never abort the batch.
+    """
+    try:
+        errors = 0
+        for item in items:
+            if item.error:
+                errors += 1
+                yield _item_line(item)
+
+        pending = [item for item in items if not item.error]
+
+        # 1. Extract features in parallel
+        ready = []
+        features = []
+        if pending:
+            pool = get_process_pool()
+            futures = {pool.submit(load_and_preprocess_audio, item.path, strict=True): item for item in pending}
+            pool_depth = QUEUE_DEPTH.labels("batch_pool")
+            pool_depth.inc(len(futures))
+            remaining = len(futures)
+            try:
+                for future in as_completed(futures):
+                    pool_depth.dec()
+                    remaining -= 1
+                    item = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Feature extraction failed for {item.filename}: {e}")
+                        result = None
+                    if result is None:
+                        item.error = "Could not process audio file"
+                        errors += 1
+                        yield _item_line(item)
+                        continue
+                    ready.append(item)
+                    features.append(result)
+            finally:
+                # The client may disconnect mid-batch
+                pool_depth.dec(remaining)
+
+        # 2. Classify the whole batch at once, then translate
+        results = {}
+        by_phrase = {}
+        if ready:
+            classifications = classifier.predict_batch(np.stack(features))
+            for item, classification in zip(ready, classifications):
+                translation_text = translator.translate(classification["animal"], classification["emotion"])
+                results[item.index] = {
+                    "animal": classification["animal"],
+                    "emotion": classification["emotion"],
+                    "confidence": classification["confidence"],
+                    "translation": translation_text,
+                    "audio_url": None,
+                }
+                by_phrase.setdefault(translation_text, []).append(item)
+
+        # 3. Synthesize each distinct phrase once, streaming items as their audio lands
+        if by_phrase and config.MURF_API_KEY:
+            with ThreadPoolExecutor(max_workers=config.BATCH_TTS_CONCURRENCY) as tts_pool:
+                futures = {
+                    tts_pool.submit(synthesize_speech, phrase, f"batch_{uuid.uuid4().hex}"): phrase
+                    for phrase in by_phrase
+                }
+                for future in as_completed(futures):
+                    phrase = futures[future]
+                    try:
+                        audio_url, _ = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch TTS failed: {e}")
+                        audio_url = None
+                    for item in by_phrase[phrase]:
+                        results[item.index]["audio_url"] = audio_url
+                        yield _item_line(item, results[item.index])
+        else:
+            for phrase_items in by_phrase.values():
+                for item in phrase_items:
+                    yield _item_line(item, results[item.index])
+
+        yield json.dumps({"status": "done", "total": len(items), "errors": errors}) + "\n"
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
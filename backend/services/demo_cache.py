@@ -0,0 +1,151 @@
+import os
+import random
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class DemoResponseCache:
+    """
+    Precomputed lookup table for the demo endpoint.
+
+    Every valid demo ID ("animal-emotion") is resolved once at startup to its
+    translation candidates, so serving a demo is a dictionary lookup plus a
+    random pick. TTS audio is rendered at most once per phrase and reused by
+    every demo ID that shares the phrase.
+    """
+
+    def __init__(self, translator, animals, emotions, upload_dir, static_prefix="/static"):
+        self.upload_dir = upload_dir
+        self.static_prefix = static_prefix
+        self.entries = {}
+        self.audio_urls = {}
+        # One lock per phrase, so a slow synthesis only blocks renders of the same phrase
+        self._render_locks = {}
+        self._render_locks_guard = threading.Lock()
+
+        for animal in animals:
+            for emotion in emotions:
+                demo_id = f"{animal.lower()}-{emotion.lower()}"
+                self.entries[demo_id] = {
+                    "animal": animal,
+                    "emotion": emotion,
+                    "phrases": tuple(translator.get_candidates(animal, emotion)),
+                }
+
+        self._scan_rendered_audio()
+        logger.info(
+            f"Demo cache built: {len(self.entries)} demo IDs, "
+            f"{len(self.phrases())} unique phrases, {len(self.audio_urls)} with audio"
+        )
+
+    def phrases(self):
+        """Return the set of unique phrases across all demo IDs."""
+        unique = set()
+        for entry in self.entries.values():
+            unique.update(entry["phrases"])
+        return unique
+
+    def lookup(self, demo_id: str) -> Optional[dict]:
+        """Return the precomputed entry for a demo ID, or None if unknown."""
+        return self.entries.get(demo_id.lower())
+
+    def pick(self, demo_id: str) -> Optional[dict]:
+        """
+        Pick a random response for a demo ID.
+
+        Args:
+            demo_id: Demo identifier in "animal-emotion" format
+
+        Returns:
+            dict with animal, emotion, translation and audio_url, or None if the
+            demo ID is not in the table
+        """
+        entry = self.lookup(demo_id)
+        record_cache("demo", entry is not None)
+        if entry is None:
+            return None
+
+        phrase = random.choice(entry["phrases"])
+        return {
+            "animal": entry["animal"],
+            "emotion": entry["emotion"],
+            "translation": phrase,
+            "audio_url": self.audio_urls.get(phrase),
+        }
+
+    @staticmethod
+    def audio_filename(phrase: str) -> str:
+        """Stable file name for a phrase's rendered audio."""
+        digest = hashlib.sha1(phrase.encode("utf-8")).hexdigest()[:16]
+        return f"demo_{digest}.mp3"
+
+    def render(self, phrase: str, tts_client) -> Optional[str]:
+        """
+        Return the audio URL for a phrase, synthesizing it once if needed.
+
+        Args:
+            phrase: Text to synthesize
+            tts_client: Client exposing generate_speech(text) -> bytes
+
+        Returns:
+            Static URL of the rendered MP3, or None if synthesis failed
+        """
+        url = self.audio_urls.get(phrase)
+        record_cache("demo_audio", bool(url))
+        if url:
+            return url
+
+        with self._render_locks_guard:
+            render_lock = self._render_locks.setdefault(phrase, threading.Lock())
+
+        with render_lock:
+            url = self.audio_urls.get(phrase)
+            if url:
+                return url
+
+            audio_content = tts_client.generate_speech(phrase)
+            if not audio_content:
+                return None
+
+            filename = self.audio_filename(phrase)
+            path = os.path.join(self.upload_dir, filename)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio_content)
+            os.replace(tmp_path, path)
+
+            url = f"{self.static_prefix}/{filename}"
+            self.audio_urls[phrase] = url
+            return url
+
+    def prerender(self, tts_client) -> int:
+        """
+        Render audio for every phrase that does not have it yet.
+
+        Returns:
+            Number of phrases rendered during this call
+        """
+        rendered = 0
+        for phrase in sorted(self.phrases()):
+            if phrase in self.audio_urls:
+                continue
+            if self.render(phrase, tts_client):
+                rendered += 1
+        logger.info(f"Demo audio prerender finished: {rendered} new, {len(self.audio_urls)} total")
+        return rendered
+
+    def _scan_rendered_audio(self):
+        """Pick up audio rendered by a previous run so it is not re-synthesized."""
+        if not os.path.isdir(self.upload_dir):
+            return
+        existing = set(os.listdir(self.upload_dir))
+        for phrase in self.phrases():
+            filename = self.audio_filename(phrase)
+            if filename in existing:
+                self.audio_urls[phrase] = f"{self.static_prefix}/{filename}"
@@ -0,0 +1,321 @@
+import os
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+from config import config
+from services.audio_processor import stream_audio
+
+logger = logging.getLogger(__name__)
+
+# scipy ships with librosa; its C maximum filter is used when available.
+# scipy.ndimage is slow to import, so that happens on the first fingerprint.
+_maximum_filter = None
+
+# Analysis parameters. Changing any of these invalidates saved indexes.
+FINGERPRINT_VERSION = 2
+SAMPLE_RATE = 11025
+N_FFT = 1024
+HOP_LENGTH = 256
+PEAK_NEIGHBORHOOD = (15, 15)  # (frames, bins)
+PEAK_THRESHOLD_DB = -50.0  # relative to the clip's loudest bin
+PEAKS_PER_SECOND = 20
+FAN_OUT = 5
+MAX_DT = 63  # frames, fits in 6 bits
+MAX_QUERY_SECONDS = 10
+MAX_REFERENCE_SECONDS = 30
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac", ".m4a")
+
+
+def _max_filter(S, size_t, size_f):
+    """Separable 2D maximum filter over a (time, freq) matrix."""
+    global _maximum_filter
+    if _maximum_filter is None:
+        try:
+            from scipy.ndimage import maximum_filter as _maximum_filter
+        except ImportError:
+            _maximum_filter = False
+    if _maximum_filter:
+        return _maximum_filter(S, size=(size_t, size_f), mode="constant", cval=-np.inf)
+
+    def along(matrix, size, axis):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (size // 2, size - 1 - size // 2)
+        padded = np.pad(matrix, pad, mode="constant", constant_values=-np.inf)
+        return np.lib.stride_tricks.sliding_window_view(padded, size, axis=axis).max(axis=-1)
+    return along(along(S, size_t, 0), size_f, 1)
+
+
+def spectral_peaks(y):
+    """
+    Find constellation peaks in a mono signal at SAMPLE_RATE.
+
+    Returns:
+        (frames, bins, magnitudes) arrays, sorted by frame
+    """
+    if len(y) < N_FFT:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    frames = np.lib.stride_tricks.sliding_window_view(y, N_FFT)[::HOP_LENGTH]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))
+    S = 20 * np.log10(spectrum + 1e-10)
+    S -= S.max()
+
+    local_max = S == _max_filter(S, *PEAK_NEIGHBORHOOD)
+    t, f = np.nonzero(local_max & (S > PEAK_THRESHOLD_DB))
+
+    # Keep only the strongest peaks in each second so noise can't flood the hashes
+    frames_per_second = SAMPLE_RATE // HOP_LENGTH
+    magnitude = S[t, f]
+    second = t // frames_per_second
+    order = np.lexsort((-magnitude, second))
+    rank = np.arange(len(order)) - np.searchsorted(second[order], second[order], side="left")
+    keep = np.sort(order[rank < PEAKS_PER_SECOND])
+    return t[keep], f[keep], magnitude[keep]
+
+
+def hash_peaks(t, f, magnitude):
+    """
+    Pair each anchor peak with the FAN_OUT strongest peaks in its target zone
+    (the next MAX_DT frames). Pairing by strength rather than by time order
+    keeps pairs stable when codec noise adds weak peaks.
+
+    Returns:
+        (hashes, offsets) uint32 arrays; a hash packs f1 (10 bits), f2 (10 bits)
+        and dt (6 bits), and the offset is the anchor frame. N_FFT // 2 + 1
+        bins need 10 bits, or the Nyquist bin would alias to bin 0.
+    """
+    hashes = []
+    offsets = []
+    zone_end = np.searchsorted(t, t + MAX_DT, side="right")
+    for i in range(len(t)):
+        start = np.searchsorted(t, t[i], side="right")
+        end = zone_end[i]
+        if end <= start:
+            continue
+        zone = np.arange(start, end)
+        if len(zone) > FAN_OUT:
+            zone = zone[np.argpartition(-magnitude[zone], FAN_OUT)[:FAN_OUT]]
+        dt = t[zone] - t[i]
+        hashes.append(((f[i] & 0x3FF) << 16) | ((f[zone] & 0x3FF) << 6) | dt)
+        offsets.append(np.full(len(zone), t[i]))
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(offsets).astype(np.uint32)
+
+
+def fingerprint_file(file_path, max_seconds):
+    """Decode up to `max_seconds` of a file and return its (hashes, offsets)."""
+    blocks = list(stream_audio(file_path, sr=SAMPLE_RATE, max_duration=max_seconds))
+    if not blocks:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+    return hash_peaks(*spectral_peaks(np.concatenate(blocks)))
+
+
+def label_from_path(path, root):
+    """
+    Derive (animal, emotion) from a reference clip's location.
+
+    Supports `<root>/<Animal>/<Emotion>/clip.wav` and `<root>/<animal>-<emotion>[-...].wav`.
+    """
+    relative = os.path.relpath(path, root)
+    parts = relative.split(os.sep)
+    if len(parts) >= 3:
+        return parts[0].capitalize(), parts[1].capitalize()
+    stem = os.path.splitext(parts[-1])[0].replace("_", "-").split("-")
+    if len(stem) >= 2:
+        return stem[0].capitalize(), stem[1].capitalize()
+    return None
+
+
+class FingerprintIndex:
+    """
+    Spectral-peak fingerprint index for recognising known reference clips.
+
+    All hashes live in three parallel NumPy arrays sorted by hash, so a query
+    is one vectorised searchsorted plus a histogram of time offsets, and
+    re-encoded copies of a reference still match.
+    """
+
+    def __init__(self, min_matches=15, min_ratio=0.05):
+        self.min_matches = min_matches
+        self.min_ratio = min_ratio
+        self._lock = threading.Lock()
+        self._set_arrays(
+            np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32),
+            np.zeros(0, dtype=np.uint32), [], []
+        )
+
+    def _set_arrays(self, hashes, ref_ids, offsets, labels, names):
+        order = np.argsort(hashes, kind="stable")
+        # Swap in one assignment so concurrent queries see a consistent index
+        self._data = (hashes[order], ref_ids[order], offsets[order], list(labels), list(names))
+
+    def __len__(self):
+        return len(self._data[3])
+
+    def add(self, file_path, animal, emotion, name=None):
+        """Fingerprint a reference clip and add it to the index."""
+        new_hashes, new_offsets = fingerprint_file(file_path, MAX_REFERENCE_SECONDS)
+        with self._lock:
+            hashes, ref_ids, offsets, labels, names = self._data
+            ref_id = len(labels)
+            self._set_arrays(
+                np.concatenate([hashes, new_hashes]),
+                np.concatenate([ref_ids, np.full(len(new_hashes), ref_id, dtype=np.uint32)]),
+                np.concatenate([offsets, new_offsets]),
+                labels + [(animal, emotion)],
+                names + [name or os.path.basename(file_path)]
+            )
+        return len(new_hashes)
+
+    def build_from_directory(self, directory):
+        """
+        Index every labelled audio file under a directory.
+
+        Returns:
+            Number of reference clips indexed
+        """
+        all_hashes, all_ids, all_offsets, labels, names = [], [], [], [], []
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                label = label_from_path(path, directory)
+                if label is None:
+                    logger.warning(f"Skipping unlabelled reference clip: {path}")
+                    continue
+                try:
+                    hashes, offsets = fingerprint_file(path, MAX_REFERENCE_SECONDS)
+                except Exception as e:
+                    logger.warning(f"Could not fingerprint {path}: {e}")
+                    continue
+                all_hashes.append(hashes)
+                all_offsets.append(offsets)
+                all_ids.append(np.full(len(hashes), len(labels), dtype=np.uint32))
+                labels.append(label)
+                names.append(os.path.relpath(path, directory))
+
+        if labels:
+            with self._lock:
+                self._set_arrays(
+                    np.concatenate(all_hashes), np.concatenate(all_ids),
+                    np.concatenate(all_offsets), labels, names
+                )
+        logger.info(f"Fingerprint index built: {len(labels)} references")
+        return len(labels)
+
+    def save(self, path):
+        """Save the index to a .npz file."""
+        hashes, ref_ids, offsets, labels, names = self._data
+        np.savez(
+            path, version=FINGERPRINT_VERSION, hashes=hashes, ref_ids=ref_ids, offsets=offsets,
+            labels=np.array(labels, dtype=str).reshape(-1, 2), names=np.array(names, dtype=str)
+        )
+
+    def load(self, path):
+        """Load an index saved with save(). Returns False if it is stale or unreadable."""
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != FINGERPRINT_VERSION:
+                    return False
+                labels = [tuple(label) for label in data["labels"].tolist()]
+                with self._lock:
+                    self._set_arrays(data["hashes"], data["ref_ids"], data["offsets"],
+                                     labels, data["names"].tolist())
+            return True
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not load fingerprint index {path}: {e}")
+            return False
+
+    def load_directory(self, directory, cache_path=None):
+        """
+        Load the cached index if it is newer than every reference clip,
+        otherwise rebuild it from the directory and refresh the cache.
+        """
+        if not os.path.isdir(directory):
+            logger.info(f"No reference clip directory at {directory}. Fingerprinting disabled.")
+            return 0
+
+        if cache_path and os.path.exists(cache_path):
+            cache_mtime = os.path.getmtime(cache_path)
+            newest = max(
+                (os.path.getmtime(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files),
+                default=0
+            )
+            if newest <= cache_mtime and self.load(cache_path):
+                logger.info(f"Loaded fingerprint index: {len(self)} references")
+                return len(self)
+
+        count = self.build_from_directory(directory)
+        if cache_path and count:
+            try:
+                self.save(cache_path)
+            except OSError as e:
+                logger.warning(f"Could not save fingerprint index to {cache_path}: {e}")
+        return count
+
+    def query_hashes(self, hashes, offsets) -> Optional[dict]:
+        """
+        Match query hashes against the index.
+
+        Returns:
+            dict with animal, emotion, confidence, reference and matches for
+            a confident match, else None
+        """
+        index_hashes, ref_ids, index_offsets, labels, names = self._data
+        if not labels or len(hashes) == 0:
+            return None
+
+        left = np.searchsorted(index_hashes, hashes, side="left")
+        right = np.searchsorted(index_hashes, hashes, side="right")
+        counts = right - left
+        if counts.sum() == 0:
+            return None
+
+        # Expand every (query hash, index entry) pair without a Python loop
+        query_idx = np.repeat(np.arange(len(hashes)), counts)
+        starts = np.repeat(left - np.cumsum(counts) + counts, counts)
+        entry_idx = starts + np.arange(counts.sum())
+
+        matched_refs = ref_ids[entry_idx].astype(np.int64)
+        deltas = index_offsets[entry_idx].astype(np.int64) - offsets[query_idx].astype(np.int64)
+
+        # True matches line up at a single time offset per reference
+        keys = (matched_refs << 32) | (deltas & 0xFFFFFFFF)
+        unique_keys, key_counts = np.unique(keys, return_counts=True)
+        best = int(np.argmax(key_counts))
+        score = int(key_counts[best])
+        ref_id = int(unique_keys[best] >> 32)
+
+        ratio = score / len(hashes)
+        if score < self.min_matches or ratio < self.min_ratio:
+            return None
+
+        animal, emotion = labels[ref_id]
+        return {
+            "animal": animal,
+            "emotion": emotion,
+            "confidence": round(min(0.99, 0.8 + ratio), 2),
+            "reference": names[ref_id],
+            "matches": score,
+        }
+
+    def match(self, file_path) -> Optional[dict]:
+        """Fingerprint the start of a file and look it up. Never raises."""
+        if not len(self):
+            return None
+        try:
+            return self.query_hashes(*fingerprint_file(file_path, MAX_QUERY_SECONDS))
+        except Exception as e:
+            logger.warning(f"Fingerprint lookup failed: {e}")
+            return None
+
+
+# Global index, populated at startup from config.FINGERPRINT_DIR
+fingerprint_index = FingerprintIndex(min_matches=config.FINGERPRINT_MIN_MATCHES)
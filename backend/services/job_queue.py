@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATES = (COMPLETED, FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker no longer owns the job it is processing."""
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared by every worker process.
+
+    The table is the queue: workers claim the oldest queued job with an
+    atomic UPDATE, and a claim is a lease that expires if the worker dies,
+    so jobs survive a worker restart. Every claim counts as an attempt; a
+    job whose lease has expired `max_attempts` times (one that keeps killing
+    or hanging its worker) is failed instead of claimed again.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: int = 300, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state_created ON jobs (state, created_at)")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "attempts" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    def create(self, file_path: str, max_queued: int) -> str:
+        """
+        Insert a queued job, refusing if too many jobs are already waiting.
+
+        Raises:
+            QueueFullError: if max_queued jobs are already queued
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                queued = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)
+                ).fetchone()[0]
+                if queued >= max_queued:
+                    raise QueueFullError(f"{queued} jobs already queued")
+                self._conn.execute(
+                    "INSERT INTO jobs (id, state, stage, file_path, result, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, QUEUED, file_path, json.dumps({}), now, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim_next(self, owner: str) -> Optional[dict]:
+        """
+        Claim the oldest queued job, or a running job whose lease expired.
+
+        Expired jobs that have used up their attempts are failed on the way
+        and their uploads removed.
+        """
+        now = time.time()
+        abandoned = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (QUEUED, RUNNING, now),
+                    ).fetchone()
+                    if row is None or row["attempts"] < self.max_attempts:
+                        break
+                    logger.error(f"Job {row['id']} lost its lease {row['attempts']} times; marking it failed")
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, stage = ?, error = ?, owner = NULL, lease_expires = NULL, "
+                        "updated_at = ? WHERE id = ?",
+                        (FAILED, FAILED, f"Abandoned after {row['attempts']} attempts", now, row["id"]),
+                    )
+                    abandoned.append(row["file_path"])
+                if row is not None:
+                    if row["state"] == RUNNING:
+                        logger.warning(f"Reclaiming job {row['id']} from expired owner {row['owner']}")
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?",
+                        (RUNNING, owner, now + self.lease_seconds, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for file_path in abandoned:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        return None if row is None else self.get(row["id"])
+
+    def update(self, job_id: str, stage: str, result: dict, state: str = RUNNING,
+               error: Optional[str] = None, owner: Optional[str] = None) -> bool:
+        """
+        Publish a stage result and renew the lease.
+
+        With `owner`, only writes while that worker still holds the job.
+
+        Returns:
+            False if the job is gone or owned by another worker
+        """
+        now = time.time()
+        sql = ("UPDATE jobs SET state = ?, stage = ?, result = ?, error = ?, "
+               "lease_expires = ?, updated_at = ? WHERE id = ?")
+        params = [state, stage, json.dumps(result), error, now + self.lease_seconds, now, job_id]
+        if owner is not None:
+            sql += " AND owner = ? AND state = ?"
+            params += [owner, RUNNING]
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str, owner: str) -> bool:
+        """Extend the lease of a running job; False if `owner` no longer holds it."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND state = ?",
+                (time.time() + self.lease_seconds, job_id, owner, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a job as a dict, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "state": row["state"],
+            "stage": row["stage"],
+            "file_path": row["file_path"],
+            "result": json.loads(row["result"] or "{}"),
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def count(self, state: str) -> int:
+        """Number of jobs currently in a state."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)).fetchone()[0]
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than the retention window."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?",
+                (COMPLETED, FAILED, cutoff),
+            )
+        return cursor.rowcount
+
+
+class JobQueue:
+    """
+    Local worker pool draining a JobStore.
+
+    The handler is called as handler(job, publish) and reports progress by
+    calling publish(stage, result) after each pipeline stage.
+    """
+
+    def __init__(self, store: JobStore, handler: Callable, workers: int = 2,
+                 max_queued: int = 100, poll_interval: float = 1.0):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._owner_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def start(self):
+        """Start the worker threads."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{self._owner_prefix}-{i}",),
+                name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Signal workers to stop and wait for them to finish their current job."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, file_path: str) -> str:
+        """
+        Enqueue a saved audio file for processing.
+
+        Returns:
+            The new job ID
+
+        Raises:
+            QueueFullError: if the queue is at capacity
+        """
+        job_id = self.store.create(file_path, self.max_queued)
+        self._wakeup.set()
+        return job_id
+
+    def _run(self, owner: str):
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim_next(owner)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._process(job, owner)
+
+    def _heartbeat(self, job_id: str, owner: str, done: threading.Event, lost: threading.Event):
+        """Renew the lease every third of its length until the job finishes."""
+        while not done.wait(max(self.store.lease_seconds / 3, 0.05)):
+            try:
+                if not self.store.renew(job_id, owner):
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to renew lease on job {job_id}: {e}")
+
+    def _process(self, job: dict, owner: str):
+        job_id = job["job_id"]
+        result = dict(job["result"])
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, owner, done, lost),
+                                     name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+
+        def publish(stage: str, partial: dict):
+            result.update(partial)
+            if lost.is_set() or not self.store.update(job_id, stage, result, owner=owner):
+                raise LeaseLostError(f"Job {job_id} was re-leased by another worker")
+
+        owned = True
+        try:
+            self.handler(job, publish)
+            owned = self.store.update(job_id, COMPLETED, result, state=COMPLETED, owner=owner)
+        except LeaseLostError as e:
+            owned = False
+            logger.warning(str(e))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            owned = self.store.update(job_id, FAILED, result, state=FAILED, error=str(e), owner=owner)
+        finally:
+            done.set()
+            heartbeat.join()
+            # The new owner still needs the upload
+            if owned and os.path.exists(job["file_path"]):
+                os.remove(job["file_path"])
+            elif not owned:
+                logger.warning(f"Job {job_id} lost its lease; leaving the result to its new owner")
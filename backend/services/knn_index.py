@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+LABELS_FILE = "labels.json"
+STATS_FILE = "stats.npz"
+IVF_FILE = "ivf.npz"
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _spherical_kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Cluster unit vectors by cosine similarity. Returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_clusters * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class ReferenceLibrary:
+    """
+    Labelled reference feature vectors for nearest-neighbour classification.
+
+    Vectors are standardised, L2-normalised and stored as one contiguous
+    float32 matrix, so cosine similarity is a single matrix product and the
+    file can be memory-mapped. Above `ivf_threshold` rows the library also
+    keeps a coarse inverted-file index: rows are grouped by nearest
+    centroid, and a query only scans the `nprobe` closest groups.
+    """
+
+    def __init__(self, vectors, labels, mean, std, centroids=None, list_offsets=None):
+        self.vectors = vectors
+        self.labels = [tuple(label) for label in labels]
+        self.mean = mean
+        self.std = std
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+
+        self.animals = sorted({animal for animal, _ in self.labels})
+        self.emotions = sorted({emotion for _, emotion in self.labels})
+        animal_index = {animal: i for i, animal in enumerate(self.animals)}
+        emotion_index = {emotion: i for i, emotion in enumerate(self.emotions)}
+        self.animal_codes = np.array([animal_index[a] for a, _ in self.labels], dtype=np.int32)
+        self.emotion_codes = np.array([emotion_index[e] for _, e in self.labels], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def build(cls, features, labels, ivf_threshold=20000, n_lists=None):
+        """
+        Build a library from raw feature vectors.
+
+        Args:
+            features: (n, d) array of feature vectors (e.g. MFCC means)
+            labels: list of (animal, emotion) pairs, one per row
+            ivf_threshold: Build a coarse index when n exceeds this
+            n_lists: Number of coarse clusters (default sqrt(n))
+        """
+        features = np.asarray(features, dtype=np.float32)
+        mean = features.mean(axis=0)
+        std = features.std(axis=0) + 1e-6
+        vectors = _normalize_rows((features - mean) / std).astype(np.float32)
+        labels = list(labels)
+
+        centroids = list_offsets = None
+        if len(vectors) > ivf_threshold:
+            n_lists = n_lists or int(np.sqrt(len(vectors)))
+            centroids = _spherical_kmeans(vectors, n_lists)
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            # Reorder rows so every list is a contiguous slice
+            order = np.argsort(assignment, kind="stable")
+            vectors = np.ascontiguousarray(vectors[order])
+            labels = [labels[i] for i in order]
+            list_offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+
+        return cls(vectors, labels, mean, std, centroids, list_offsets)
+
+    def save(self, directory):
+        """Write the library to a directory."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), self.vectors)
+        np.savez(os.path.join(directory, STATS_FILE), mean=self.mean, std=self.std)
+        with open(os.path.join(directory, LABELS_FILE), "w") as f:
+            json.dump(self.labels, f)
+        ivf_path = os.path.join(directory, IVF_FILE)
+        if self.centroids is not None:
+            np.savez(ivf_path, centroids=self.centroids, list_offsets=self.list_offsets)
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a library saved with save(), memory-mapping the vectors by default."""
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        with open(os.path.join(directory, LABELS_FILE)) as f:
+            labels = json.load(f)
+        with np.load(os.path.join(directory, STATS_FILE)) as stats:
+            mean, std = stats["mean"], stats["std"]
+        centroids = list_offsets = None
+        ivf_path = os.path.join(directory, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                centroids, list_offsets = ivf["centroids"], ivf["list_offsets"]
+        if len(labels) != len(vectors):
+            raise ValueError(f"Library at {directory} has {len(vectors)} vectors but {len(labels)} labels")
+        return cls(vectors, labels, mean, std, centroids, list_offsets)
+
+    def add(self, features, animal, emotion):
+        """
+        Return a new library with one more labelled clip.
+
+        Standardisation stats and coarse centroids are kept from the original
+        build, so adding clips never requires retraining.
+        """
+        vectors = np.vstack([np.asarray(self.vectors), self._prepare(features)])
+        labels = self.labels + [(animal, emotion)]
+        list_offsets = None
+        if self.centroids is not None:
+            assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            vectors = vectors[order]
+            labels = [labels[i] for i in order]
+            list_offsets = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        return ReferenceLibrary(
+            np.ascontiguousarray(vectors, dtype=np.float32), labels,
+            self.mean, self.std, self.centroids, list_offsets
+        )
+
+    def _prepare(self, features):
+        queries = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        return _normalize_rows((queries - self.mean) / self.std).astype(np.float32)
+
+    def search(self, features, k=10, nprobe=8):
+        """
+        Top-k cosine search.
+
+        With the IVF index, each query scans its `nprobe` closest non-empty
+        lists, and keeps widening to the next closest until they hold at
+        least k rows, so every query gets the same number of neighbours.
+
+        Args:
+            features: (d,) or (n, d) raw feature vectors
+            k: Neighbours per query
+            nprobe: Coarse lists scanned per query when the IVF index exists
+
+        Returns:
+            (indices, similarities) arrays of shape (n, min(k, len(self))), best first
+        """
+        queries = self._prepare(features)
+        if self.centroids is None:
+            return self._top_k(queries @ self.vectors.T, k, None)
+
+        k = min(k, len(self))
+        sizes = np.diff(self.list_offsets)
+        all_indices, all_scores = [], []
+        for query, order in zip(queries, np.argsort(-(queries @ self.centroids.T), axis=1)):
+            order = order[sizes[order] > 0]
+            # First list index at which the closest lists hold k rows
+            enough = int(np.searchsorted(np.cumsum(sizes[order]), k)) + 1
+            rows = np.concatenate([
+                np.arange(self.list_offsets[c], self.list_offsets[c + 1])
+                for c in order[:max(nprobe, enough)]
+            ])
+            indices, scores = self._top_k((self.vectors[rows] @ query)[None, :], k, rows)
+            all_indices.append(indices[0])
+            all_scores.append(scores[0])
+        return np.stack(all_indices), np.stack(all_scores)
+
+    @staticmethod
+    def _top_k(scores, k, rows):
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+        return top, top_scores
+
+    def predict(self, features, k=10, nprobe=8):
+        """
+        kNN vote for animal and emotion.
+
+        Neighbours vote with weight max(similarity, 0); confidence is the
+        winning share of the vote, averaged over the two labels.
+
+        Returns:
+            list of dicts with animal, emotion, and confidence
+        """
+        indices, similarities = self.search(features, k=k, nprobe=nprobe)
+        weights = np.maximum(similarities, 0) + 1e-6
+
+        results = []
+        for row_indices, row_weights in zip(indices, weights):
+            animal_votes = np.bincount(self.animal_codes[row_indices], row_weights, len(self.animals))
+            emotion_votes = np.bincount(self.emotion_codes[row_indices], row_weights, len(self.emotions))
+            total = row_weights.sum()
+            confidence = (animal_votes.max() + emotion_votes.max()) / (2 * total)
+            results.append({
+                "animal": self.animals[int(np.argmax(animal_votes))],
+                "emotion": self.emotions[int(np.argmax(emotion_votes))],
+                "confidence": round(min(0.99, float(confidence)), 2),
+            })
+        return results
+
+
+def load_library(directory) -> Optional[ReferenceLibrary]:
+    """Load a library if one exists at `directory`, else None."""
+    if not os.path.exists(os.path.join(directory, VECTORS_FILE)):
+        return None
+    try:
+        library = ReferenceLibrary.load(directory)
+        logger.info(f"Loaded kNN reference library: {len(library)} vectors from {directory}")
+        return library
+    except Exception as e:
+        logger.warning(f"Failed to load kNN library from {directory}: {e}")
+        return None
+
+
+def build_from_clips(clip_dir, library_dir):
+    """
+    Extract features for every labelled clip under `clip_dir` and save a library.
+
+    Uses the same labelling convention as the fingerprint index.
+    """
+    from services.audio_processor import load_and_preprocess_audio
+    from services.fingerprint import AUDIO_EXTENSIONS, label_from_path
+
+    features, labels = [], []
+    for root, _, files in os.walk(clip_dir):
+        for filename in sorted(files):
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            label = label_from_path(path, clip_dir)
+            if label is None:
+                logger.warning(f"Skipping unlabelled clip: {path}")
+                continue
+            # Strict: a clip that fails to decode must not enter the library as mock features
+            vector = load_and_preprocess_audio(path, strict=True)
+            if vector is None:
+                logger.warning(f"Skipping undecodable clip: {path}")
+                continue
+            features.append(vector)
+            labels.append(label)
+
+    if not features:
+        raise ValueError(f"No labelled clips found under {clip_dir}")
+    library = ReferenceLibrary.build(np.stack(features), labels)
+    library.save(library_dir)
+    return len(library)
+
+
+if __name__ == "__main__":
+    # python -m services.knn_index <clip_dir> <library_dir>
+    if len(sys.argv) != 3:
+        print("Usage: python -m services.knn_index <clip_dir> <library_dir>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    count = build_from_clips(sys.argv[1], sys.argv[2])
+    print(f"Saved {count} reference vectors to {sys.argv[2]}")
@@ -0,0 +1,200 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from config import config
+from services.metrics import EVENT_LOOP_LAG, EXECUTOR_WAIT, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+def _threadpool_stats():
+    """Borrowed/total tokens and waiters of anyio's default thread limiter (run_in_threadpool)."""
+    try:
+        import anyio.to_thread
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        return {"busy": stats.borrowed_tokens, "size": int(stats.total_tokens), "waiting": stats.tasks_waiting}
+    except Exception:
+        return {"busy": 0, "size": 0, "waiting": 0}
+
+
+class LoopMonitor:
+    """
+    Watches one worker's event loop for stalls and saturation.
+
+    A ticker task sleeps `interval` and records how late it wakes up (loop
+    lag). A watchdog thread notices when the ticker stops ticking and logs
+    the loop thread's stack while it is still blocked, which names the
+    offending code. Threadpool queue wait is measured by run_in_threadpool
+    below, and in-flight requests are counted by the HTTP middleware.
+
+    Saturation is judged on sustained figures, so a single slow callback or
+    a momentary threadpool queue doesn't flag a healthy worker: the p95 of
+    lag and threadpool wait over the window, and queueing or a full
+    in-flight count that has lasted at least `sustain` seconds.
+    """
+
+    def __init__(self, interval=0.1, lag_threshold=0.25, window=10.0, max_in_flight=64,
+                 sustain=5.0, min_samples=20):
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self.sustain = sustain
+        self.min_samples = min_samples
+        self.in_flight = 0
+        self._pool_waiting_since = None
+        self._in_flight_full_since = None
+        self._lags = deque()  # (monotonic time, lag seconds)
+        self._waits = deque()  # (monotonic time, threadpool wait seconds)
+        self._waits_lock = threading.Lock()  # appended from worker threads
+        self._last_tick = None
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+        self._stall_reported = False
+
+    @staticmethod
+    def _trim(samples, now, window):
+        while samples and now - samples[0][0] > window:
+            samples.popleft()
+
+    @staticmethod
+    def _since(since, condition, now):
+        """When `condition` started holding continuously, or None."""
+        if not condition:
+            return None
+        return since if since is not None else now
+
+    def _p95(self, values):
+        """95th percentile, or 0 with too few samples to tell a trend from a spike."""
+        if len(values) < self.min_samples:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+    def record_executor_wait(self, wait):
+        now = time.monotonic()
+        with self._waits_lock:
+            self._waits.append((now, wait))
+            self._trim(self._waits, now, self.window)
+        EXECUTOR_WAIT.observe(wait)
+
+    def _record_lag(self, lag):
+        now = time.monotonic()
+        self._last_tick = now
+        self._stall_reported = False
+        self._lags.append((now, lag))
+        self._trim(self._lags, now, self.window)
+        EVENT_LOOP_LAG.observe(lag)
+        waiting = _threadpool_stats()["waiting"]
+        QUEUE_DEPTH.labels("threadpool").set(waiting)
+        self._pool_waiting_since = self._since(self._pool_waiting_since, waiting > 0, now)
+        self._in_flight_full_since = self._since(
+            self._in_flight_full_since, self.in_flight >= self.max_in_flight, now
+        )
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._record_lag(max(0.0, loop.time() - expected))
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._last_tick
+            if stalled < self.lag_threshold or self._stall_reported:
+                continue
+            self._stall_reported = True
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            logger.warning("Event loop blocked for %.0f ms; loop thread stack:\n%s", stalled * 1000, stack)
+
+    def start(self):
+        """Start monitoring the running loop. Call from inside it (e.g. a startup hook)."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    def snapshot(self):
+        """Current lag, threadpool and in-flight figures over the recent window."""
+        now = time.monotonic()
+        self._trim(self._lags, now, self.window)
+        with self._waits_lock:
+            self._trim(self._waits, now, self.window)
+            waits = [wait for _, wait in self._waits]
+        lags = [lag for _, lag in self._lags]
+        # A loop blocked right now hasn't recorded its lag yet
+        stalled = max(0.0, now - self._last_tick - self.interval) if self.running else 0.0
+
+        def held_for(since):
+            return round(now - since, 1) if since is not None else 0.0
+
+        return {
+            "loop_lag_ms": round(1000 * max([stalled] + lags), 1),
+            "loop_lag_p95_ms": round(1000 * self._p95(lags), 1),
+            "loop_stalled_ms": round(1000 * stalled, 1),
+            "executor_wait_ms": round(1000 * max([0.0] + waits), 1),
+            "executor_wait_p95_ms": round(1000 * self._p95(waits), 1),
+            "in_flight": self.in_flight,
+            "threadpool": _threadpool_stats(),
+            "threadpool_queued_seconds": held_for(self._pool_waiting_since),
+            "in_flight_full_seconds": held_for(self._in_flight_full_since),
+        }
+
+    def saturation(self, snapshot=None):
+        """Reasons this worker counts as saturated; empty when it is healthy."""
+        snapshot = snapshot or self.snapshot()
+        threshold_ms = self.lag_threshold * 1000
+        reasons = []
+        if snapshot["loop_lag_p95_ms"] >= threshold_ms:
+            reasons.append(f"event loop lag p95 {snapshot['loop_lag_p95_ms']:.0f}ms")
+        if snapshot["loop_stalled_ms"] >= self.sustain * 1000:
+            reasons.append(f"event loop blocked for {snapshot['loop_stalled_ms']:.0f}ms")
+        if snapshot["executor_wait_p95_ms"] >= threshold_ms:
+            reasons.append(f"threadpool wait p95 {snapshot['executor_wait_p95_ms']:.0f}ms")
+        if snapshot["threadpool_queued_seconds"] >= self.sustain:
+            reasons.append(f"tasks waiting for a thread for {snapshot['threadpool_queued_seconds']:.0f}s")
+        if snapshot["in_flight_full_seconds"] >= self.sustain:
+            reasons.append(f"{self.in_flight} requests in flight for {snapshot['in_flight_full_seconds']:.0f}s")
+        return reasons
+
+
+loop_monitor = LoopMonitor(
+    interval=config.LOOP_MONITOR_INTERVAL_MS / 1000,
+    lag_threshold=config.LOOP_LAG_THRESHOLD_MS / 1000,
+    max_in_flight=config.MAX_IN_FLIGHT,
+    sustain=config.LOOP_SATURATION_SECONDS
+)
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """starlette's run_in_threadpool, recording how long the call queued for a thread."""
+    submitted = time.perf_counter()
+
+    def call():
+        loop_monitor.record_executor_wait(time.perf_counter() - submitted)
+        return func(*args, **kwargs)
+
+    return await _run_in_threadpool(call)
@@ -0,0 +1,167 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+from services.tracing import tracer, set_attribute
+
+logger = logging.getLogger(__name__)
+
+# Prometheus export is optional; without the client every metric is a no-op
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+        CONTENT_TYPE_LATEST, generate_latest, multiprocess
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    logger.warning("prometheus_client not available. /metrics is disabled.")
+
+# With several uvicorn/gunicorn workers, each process writes its samples to
+# this directory and /metrics merges them. It must be set before start-up
+# and emptied whenever the server (not a single worker) restarts.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Pipeline stages timed by STAGE_SECONDS
+STAGES = (
+    "upload_spool", "fingerprint", "decode", "trim", "mfcc",
+    "inference", "translation", "tts", "file_write",
+)
+
+_STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+
+class _NoopMetric:
+    """Stands in for a metric (and its children) when prometheus_client is missing."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram(
+        "zoolingo_stage_seconds", "Time spent in each pipeline stage",
+        ["stage"], buckets=_STAGE_BUCKETS
+    )
+    REQUEST_SECONDS = Histogram(
+        "zoolingo_request_seconds", "HTTP request duration",
+        ["method", "route", "status"], buckets=_STAGE_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        "zoolingo_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+        ["cache", "result"]
+    )
+    MURF_RESPONSES = Counter(
+        "zoolingo_murf_responses_total", "Murf API responses by HTTP status or error kind",
+        ["status"]
+    )
+    MURF_RETRIES = Counter("zoolingo_murf_retries_total", "Murf API retry attempts")
+    IN_FLIGHT = Gauge(
+        "zoolingo_in_flight_requests", "HTTP requests currently being handled",
+        multiprocess_mode="livesum"
+    )
+    QUEUE_DEPTH = Gauge(
+        "zoolingo_queue_depth", "Work waiting in each queue or pool",
+        ["queue"], multiprocess_mode="livesum"
+    )
+    EVENT_LOOP_LAG = Histogram(
+        "zoolingo_event_loop_lag_seconds", "How late the event loop ran a scheduled callback",
+        buckets=_STAGE_BUCKETS
+    )
+    EXECUTOR_WAIT = Histogram(
+        "zoolingo_executor_wait_seconds", "Time threadpool work waited for a free thread",
+        buckets=_STAGE_BUCKETS
+    )
+    ADMISSION_DECISIONS = Counter(
+        "zoolingo_admission_total", "Admission decisions by lane and outcome",
+        ["lane", "outcome"]
+    )
+    ADMISSION_LIMIT = Gauge(
+        "zoolingo_admission_limit", "Current adaptive concurrency limit for heavy requests",
+        multiprocess_mode="livesum"
+    )
+    RATE_LIMITED = Counter(
+        "zoolingo_rate_limited_total", "Requests refused by the per-client rate limiter",
+        ["scope"]
+    )
+    CASCADE_CLIPS = Counter(
+        "zoolingo_cascade_clips_total", "Clips seen by each classifier cascade stage, "
+        "by whether it answered them (hit) or passed them on (fallback)",
+        ["stage", "outcome"]
+    )
+    LOG_RECORDS_DROPPED = Counter(
+        "zoolingo_log_records_dropped_total", "Log records dropped because the logging queue was full"
+    )
+    # The job queue lives in a shared SQLite store, so every worker sees the same depth
+    JOB_QUEUE_DEPTH = Gauge(
+        "zoolingo_job_queue_depth", "Jobs waiting in the async job queue",
+        multiprocess_mode="livemax"
+    )
+else:
+    STAGE_SECONDS = REQUEST_SECONDS = CACHE_REQUESTS = _NoopMetric()
+    MURF_RESPONSES = MURF_RETRIES = IN_FLIGHT = QUEUE_DEPTH = JOB_QUEUE_DEPTH = _NoopMetric()
+    EVENT_LOOP_LAG = EXECUTOR_WAIT = ADMISSION_DECISIONS = ADMISSION_LIMIT = RATE_LIMITED = _NoopMetric()
+    CASCADE_CLIPS = LOG_RECORDS_DROPPED = _NoopMetric()
+
+
+@contextmanager
+def stage_timer(stage: str, **attributes):
+    """
+    Time a pipeline stage into STAGE_SECONDS and, inside a trace, a span.
+
+    Yields the span so the stage can attach attributes.
+    """
+    start = time.perf_counter()
+    try:
+        with tracer.span(stage, **attributes) as span:
+            yield span
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+    set_attribute(f"cache.{cache}", "hit" if hit else "miss")
+
+
+def render_metrics() -> bytes:
+    """
+    Return the Prometheus text exposition for this process, or for every
+    worker when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client is not installed")
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead(pid: int):
+    """Drop a dead worker's live gauges; call from the process manager's child-exit hook."""
+    if PROMETHEUS_AVAILABLE and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -4,13 +4,16 @@ import json
 import logging
 from typing import Optional
 
+from config import config
+from services.metrics import MURF_RESPONSES, MURF_RETRIES
+from services.tracing import set_attribute
+
 logger = logging.getLogger(__name__)
 
 class MurfClient:
     def __init__(self):
         self.api_key = os.getenv("MURF_API_KEY")
-        # Murf API endpoint - Update this based on actual Murf documentation
-        self.base_url = "https://api.murf.ai/v1/speech/generate"
+        self.base_url = config.MURF_API_URL
         self.timeout = 30  # seconds
         
     def generate_speech(self, text: str, voice_id: str = "en-US-1", retries: int = 2) -> Optional[bytes]:
@@ -46,8 +49,11 @@ class MurfClient:
         }
 
         for attempt in range(retries + 1):
+            if attempt:
+                MURF_RETRIES.inc()
+            set_attribute("murf.attempts", attempt + 1)
             try:
-                logger.info(f"Calling Murf API (attempt {attempt + 1}/{retries + 1})...")
+                logger.debug("Calling Murf API (attempt %d/%d)...", attempt + 1, retries + 1)
                 
                 response = requests.post(
                     self.base_url,
@@ -55,6 +61,7 @@ class MurfClient:
                     headers=headers,
                     timeout=self.timeout
                 )
+                MURF_RESPONSES.labels(str(response.status_code)).inc()
                 
                 if response.status_code == 200:
                     logger.info("Murf TTS generation successful")
@@ -75,16 +82,19 @@ class MurfClient:
                     return None
                     
             except requests.exceptions.Timeout:
+                MURF_RESPONSES.labels("timeout").inc()
                 logger.error(f"Murf API timeout (attempt {attempt + 1})")
                 if attempt < retries:
                     continue
                 return None
             except requests.exceptions.ConnectionError:
+                MURF_RESPONSES.labels("connection_error").inc()
                 logger.error(f"Murf API connection error (attempt {attempt + 1})")
                 if attempt < retries:
                     continue
                 return None
             except Exception as e:
+                MURF_RESPONSES.labels("error").inc()
                 logger.error(f"Unexpected error calling Murf API: {e}")
                 return None
         
@@ -1,5 +1,7 @@
 import random
 
+from services.metrics import stage_timer
+
 class NLPTranslator:
     """
     Comprehensive NLP Translator for animal sounds to human language.
@@ -974,43 +976,57 @@ class NLPTranslator:
             A natural language translation string
         """
         try:
-            # Try exact match first
-            animal_mappings = self.mappings.get(animal, {})
-            if animal_mappings and emotion in animal_mappings:
-                return random.choice(animal_mappings[emotion])
-            
-            # If emotion not found for animal, try similar emotions
-            similar_emotions = {
-                "Excited": ["Happy", "Playful"],
-                "Playful": ["Happy", "Excited"],
-                "Calm": ["Happy"],
-                "Demanding": ["Hungry", "Angry"],
-                "Alert": ["Scared", "Angry"],
-                "Mischievous": ["Playful", "Happy"],
-                "Proud": ["Happy"],
-                "Chatty": ["Happy", "Excited"],
-                "Aggressive": ["Angry"],
-                "Lonely": ["Sad"],
-                "Bossy": ["Angry", "Demanding"],
-                "Singing": ["Happy"],
-            }
-            
-            if emotion in similar_emotions:
-                for similar in similar_emotions[emotion]:
-                    if similar in animal_mappings:
-                        return random.choice(animal_mappings[similar])
-            
-            # Try unknown animal with specific emotion
-            if emotion in self.unknown_animal_responses:
-                return random.choice(self.unknown_animal_responses[emotion])
-            
-            # Final fallback
-            return random.choice(self.default_responses)
+            with stage_timer("translation"):
+                return random.choice(self.get_candidates(animal, emotion))
             
         except Exception as e:
             print(f"Translation error: {e}")
             return "I am an animal with something important to say!"
     
+    def get_candidates(self, animal, emotion):
+        """
+        Resolve the pool of phrases that `translate` picks from.
+        
+        Args:
+            animal: The detected animal type
+            emotion: The detected emotion
+            
+        Returns:
+            List of candidate translation strings (never empty)
+        """
+        # Try exact match first
+        animal_mappings = self.mappings.get(animal, {})
+        if animal_mappings and emotion in animal_mappings:
+            return animal_mappings[emotion]
+        
+        # If emotion not found for animal, try similar emotions
+        similar_emotions = {
+            "Excited": ["Happy", "Playful"],
+            "Playful": ["Happy", "Excited"],
+            "Calm": ["Happy"],
+            "Demanding": ["Hungry", "Angry"],
+            "Alert": ["Scared", "Angry"],
+            "Mischievous": ["Playful", "Happy"],
+            "Proud": ["Happy"],
+            "Chatty": ["Happy", "Excited"],
+            "Aggressive": ["Angry"],
+            "Lonely": ["Sad"],
+            "Bossy": ["Angry", "Demanding"],
+            "Singing": ["Happy"],
+        }
+        
+        if emotion in similar_emotions:
+            for similar in similar_emotions[emotion]:
+                if similar in animal_mappings:
+                    return animal_mappings[similar]
+        
+        # Try unknown animal with specific emotion
+        if emotion in self.unknown_animal_responses:
+            return self.unknown_animal_responses[emotion]
+        
+        # Final fallback
+        return self.default_responses
+    
     def get_supported_animals(self):
         """Return list of all supported animals."""
         return list(self.mappings.keys())
@@ -0,0 +1,217 @@
+import os
+import uuid
+import shutil
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config import config
+from services.audio_processor import load_and_preprocess_audio, segment_audio
+from services.ai_classifier import classifier
+from services.nlp_translator import translator
+from services.murf_integration import murf_client
+from services.fingerprint import fingerprint_index
+from services.metrics import stage_timer, record_cache
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def save_upload(fileobj, original_filename: str, directory: str) -> Tuple[str, str]:
+    """
+    Copy an uploaded file object to disk under a random name.
+
+    Args:
+        fileobj: Readable binary file object
+        original_filename: Client-supplied name, used only for its extension
+        directory: Destination directory
+
+    Returns:
+        (file_path, filename) of the saved copy
+    """
+    file_extension = original_filename.split(".")[-1]
+    filename = f"{uuid.uuid4()}.{file_extension}"
+    file_path = os.path.join(directory, filename)
+
+    with stage_timer("upload_spool") as span, open(file_path, "wb") as buffer:
+        shutil.copyfileobj(fileobj, buffer)
+        span.set_attribute("file.size", buffer.tell())
+
+    logger.debug("File saved: %s", file_path)
+    return file_path, filename
+
+
+def analyze_audio(file_path: str) -> Optional[dict]:
+    """
+    Run feature extraction, classification and translation on a saved file.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        dict with animal, emotion, confidence and translation, or None if the
+        audio could not be processed
+    """
+    # 0. Known reference clip? Skip feature extraction entirely
+    if len(fingerprint_index):
+        with stage_timer("fingerprint"):
+            match = fingerprint_index.match(file_path)
+            record_cache("fingerprint", match is not None)
+    else:
+        match = None
+    if match:
+        logger.info("Fingerprint match: %s (%d hashes)", match["reference"], match["matches"])
+        return {
+            "animal": match["animal"],
+            "emotion": match["emotion"],
+            "confidence": match["confidence"],
+            "translation": translator.translate(match["animal"], match["emotion"]),
+        }
+
+    # 1. Process Audio
+    logger.debug("Extracting audio features...")
+    features = load_and_preprocess_audio(file_path)
+    if features is None:
+        return None
+
+    # 2. Classify Emotion/Intent
+    logger.debug("Classifying emotion and animal...")
+    classification = classifier.predict(features)
+    animal = classification["animal"]
+    emotion = classification["emotion"]
+    confidence = classification["confidence"]
+
+    logger.info("Classification: %s - %s (confidence: %s)", animal, emotion, confidence)
+
+    # 3. Translate to Human Language
+    logger.debug("Generating translation...")
+    translation_text = translator.translate(animal, emotion)
+
+    return {
+        "animal": animal,
+        "emotion": emotion,
+        "confidence": confidence,
+        "translation": translation_text,
+    }
+
+
+def _merge_timeline(segments, classifications):
+    """Merge overlapping consecutive windows that share a label."""
+    timeline = []
+    for (start, end, _), classification in zip(segments, classifications):
+        entry = {
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "animal": classification["animal"],
+            "emotion": classification["emotion"],
+            "confidence": classification["confidence"],
+        }
+        previous = timeline[-1] if timeline else None
+        if (previous and previous["animal"] == entry["animal"]
+                and previous["emotion"] == entry["emotion"] and entry["start"] <= previous["end"]):
+            previous["_confidences"].append(entry["confidence"])
+            previous["end"] = entry["end"]
+            continue
+        entry["_confidences"] = [entry["confidence"]]
+        timeline.append(entry)
+
+    for entry in timeline:
+        entry["confidence"] = round(float(np.mean(entry.pop("_confidences"))), 2)
+    return timeline
+
+
+def analyze_timeline(file_path: str) -> Optional[dict]:
+    """
+    Classify every active window of a recording.
+
+    Windows are classified in one batch and merged into a timeline; the
+    label covering the most time becomes the clip's overall result.
+
+    Args:
+        file_path: Path to the audio file
+
+    Returns:
+        dict like analyze_audio plus a "timeline" list of
+        {start, end, animal, emotion, confidence}, or None if no active
+        audio was found
+    """
+    logger.debug("Segmenting audio into active windows...")
+    segments = segment_audio(
+        file_path,
+        window_seconds=config.SEGMENT_WINDOW_SECONDS,
+        hop_seconds=config.SEGMENT_HOP_SECONDS,
+        threshold_db=config.SEGMENT_THRESHOLD_DB,
+        max_windows=config.SEGMENT_MAX_WINDOWS
+    )
+    if not segments:
+        return None
+
+    classifications = classifier.predict_batch(np.stack([features for _, _, features in segments]))
+    timeline = _merge_timeline(segments, classifications)
+
+    durations = {}
+    for entry in timeline:
+        label = (entry["animal"], entry["emotion"])
+        durations[label] = durations.get(label, 0) + entry["end"] - entry["start"]
+    animal, emotion = max(durations, key=durations.get)
+    dominant = [e["confidence"] for e in timeline if (e["animal"], e["emotion"]) == (animal, emotion)]
+
+    logger.info("Timeline: %d segments, dominant %s - %s", len(timeline), animal, emotion)
+
+    return {
+        "animal": animal,
+        "emotion": emotion,
+        "confidence": round(float(np.mean(dominant)), 2),
+        "translation": translator.translate(animal, emotion),
+        "timeline": timeline,
+    }
+
+
+def synthesize_speech(text: str, stem: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Generate TTS audio for a translation and write it to the upload directory.
+
+    Args:
+        text: Translation text to speak
+        stem: Unique name used to build the output file name
+
+    Returns:
+        (audio_url, output_path), both None if TTS is unavailable or failed
+    """
+    if not config.MURF_API_KEY:
+        logger.debug("Murf API key not configured, skipping TTS")
+        return None, None
+
+    logger.debug("Generating TTS with Murf...")
+    with stage_timer("tts"):
+        audio_content = murf_client.generate_speech(text)
+    if not audio_content:
+        logger.warning("TTS generation failed")
+        return None, None
+
+    output_audio_filename = f"response_{stem}.mp3"
+    output_audio_path = os.path.join(config.UPLOAD_DIR, output_audio_filename)
+
+    with stage_timer("file_write", **{"file.size": len(audio_content)}), open(output_audio_path, "wb") as f:
+        f.write(audio_content)
+    audio_url = f"/static/{output_audio_filename}"
+    logger.info("TTS audio generated: %s", audio_url)
+    return audio_url, output_audio_path
+
+
+def process_job(job: dict, publish):
+    """
+    Job queue handler: run the pipeline on a queued file, publishing each stage.
+
+    Classification is published as soon as it is available so clients can
+    show it while TTS is still running.
+    """
+    with tracer.start_trace("job", **{"job.id": job["job_id"]}):
+        analysis = analyze_audio(job["file_path"])
+        if analysis is None:
+            raise ValueError("Could not process audio file")
+        publish("classified", analysis)
+
+        audio_url, _ = synthesize_speech(analysis["translation"], job["job_id"])
+        publish("synthesized", {"audio_url": audio_url})
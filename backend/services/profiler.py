@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+
+from services.loop_monitor import run_in_threadpool
+
+# Leaf frames in these stdlib modules mean the thread is parked, not working
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "socket.py", "ssl.py", "base_events.py")
+
+_profile_lock = threading.Lock()
+_alloc_lock = threading.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile or allocation capture is already running."""
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    """Root-first, semicolon-joined labels for a thread's current stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _is_idle(frame):
+    return os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter:
+    """
+    Sample every thread's Python stack for `seconds`.
+
+    Uses sys._current_frames(), so no tracing hooks are installed and the
+    sampled code runs at full speed; the cost is one stack walk per thread
+    per interval. Worker processes (the batch feature pool) are not covered.
+
+    Returns:
+        Counter mapping "thread;frame;frame;..." to sample count
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                stacks[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Brendan Gregg collapsed-stack format, readable by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+_ALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _stat_row(stat):
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_ALLOC_FILTERS)
+
+
+def _top_rows(snapshot, top):
+    return [_stat_row(stat) for stat in snapshot.statistics("lineno")[:top]]
+
+
+def _growth_rows(after, before, top):
+    return [
+        dict(_stat_row(stat), size_diff_kb=round(stat.size_diff / 1024, 1), count_diff=stat.count_diff)
+        for stat in after.compare_to(before, "lineno")[:top]
+    ]
+
+
+async def capture_allocations(seconds: float, top: int = 25, frames: int = 1) -> dict:
+    """
+    Report where memory is allocated, and how it changed over `seconds`.
+
+    Tracing is switched on only for the capture (unless it was already on),
+    since tracemalloc slows every allocation while active. Snapshots and
+    their comparison walk the whole traced heap, so they run in the
+    threadpool rather than on the event loop being diagnosed.
+
+    Returns:
+        dict with traced current/peak sizes, the traceback depth actually
+        recorded (tracing that was already on keeps its own), the top
+        allocation sites, and (for seconds > 0) the top growth sites between
+        two snapshots
+    """
+    if not _alloc_lock.acquire(blocking=False):
+        raise ProfilerBusyError("An allocation capture is already running")
+    started = False
+    try:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        before = await run_in_threadpool(_snapshot)
+        diff = None
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+            after = await run_in_threadpool(_snapshot)
+            diff = await run_in_threadpool(_growth_rows, after, before, top)
+            before = after
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "tracing_started_for_capture": started,
+            "frames": tracemalloc.get_traceback_limit(),
+            "top": await run_in_threadpool(_top_rows, before, top),
+            "growth": diff,
+        }
+    finally:
+        if started:
+            tracemalloc.stop()
+        _alloc_lock.release()
@@ -0,0 +1,147 @@
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+import ipaddress
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# One statement refills and debits a bucket atomically, so every worker
+# process can share the table without extra locking. The WHERE clause makes
+# the UPDATE a no-op when the bucket can't cover the cost, in which case
+# RETURNING yields no row.
+_CONSUME_SQL = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = MIN(:burst, tokens + (:now - updated) * :rate) - :cost,
+    updated = :now
+WHERE MIN(:burst, tokens + (:now - updated) * :rate) >= :cost
+RETURNING tokens
+"""
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by client, stored in SQLite shared by all workers.
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second; a request debits its endpoint's cost. The state is throwaway
+    (losing it just refills every bucket), so the database runs with
+    synchronous=OFF and a check costs one in-memory-speed UPSERT.
+    """
+
+    def __init__(self, db_path: str, prune_every: int = 1000):
+        self.db_path = db_path
+        self.prune_every = prune_every
+        self._calls = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        # Never hold the event loop long on a contended lock; fail open instead
+        self._conn.execute("PRAGMA busy_timeout=50")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def consume(self, key: str, cost: float, rate: float, burst: float,
+                now: Optional[float] = None) -> Tuple[bool, float, int]:
+        """
+        Try to take `cost` tokens from the bucket for `key`.
+
+        Returns:
+            (allowed, tokens left, seconds until the cost would fit)
+        """
+        now = time.time() if now is None else now
+        # A cost above the burst could never be paid; treat it as a full bucket
+        cost = min(cost, burst)
+        params = {"key": key, "cost": cost, "rate": rate, "burst": burst, "now": now}
+        try:
+            with self._lock:
+                row = self._conn.execute(_CONSUME_SQL, params).fetchone()
+                if row is None:
+                    current = self._conn.execute(
+                        "SELECT MIN(:burst, tokens + (:now - updated) * :rate) FROM buckets WHERE key = :key",
+                        params
+                    ).fetchone()[0]
+                self._calls += 1
+                if self._calls % self.prune_every == 0:
+                    self._prune(now)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit check failed, allowing request: %s", e)
+            return True, burst, 0
+        if row is not None:
+            return True, row[0], 0
+        return False, current, max(1, math.ceil((cost - current) / rate))
+
+    def _prune(self, now: float):
+        """Drop buckets idle for an hour; they have refilled, which is the same as absent."""
+        self._conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+
+    def reset(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM buckets")
+
+
+def client_key(api_key: Optional[str], client_ip: Optional[str], known_keys) -> Tuple[str, str]:
+    """
+    Pick the bucket for a request: its API key if it is a known one, else its IP.
+
+    Unknown keys are ignored so that rotating made-up keys can't dodge the
+    per-IP limit. Keys are stored hashed.
+
+    Returns:
+        (scope, bucket key) where scope is "key" or "ip"
+    """
+    if api_key and api_key in known_keys:
+        return "key", "key:" + hashlib.sha1(api_key.encode()).hexdigest()[:16]
+    return "ip", "ip:" + (client_ip or "unknown")
+
+
+def parse_networks(spec: str):
+    """Comma-separated IPs/CIDRs -> tuple of ip_network; invalid entries raise ValueError."""
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip())
+
+
+def _trusted(address: Optional[str], networks) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except (TypeError, ValueError):
+        return False
+    return any(ip in network for network in networks)
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str], real_ip: Optional[str],
+                      trusted_proxies) -> Optional[str]:
+    """
+    The address to rate-limit a request by.
+
+    Forwarding headers are only believed when the connection itself comes
+    from a trusted proxy; anyone else could set them to dodge their limit.
+    X-Forwarded-For is read right to left, skipping trusted hops, so the
+    first untrusted address is the client as seen by the outermost proxy we
+    trust. Without it, X-Real-IP is used.
+    """
+    if not _trusted(peer, trusted_proxies):
+        return peer
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not _trusted(hop, trusted_proxies):
+                return hop
+        if hops:
+            return hops[0]
+    if real_ip and real_ip.strip():
+        return real_ip.strip()
+    return peer
+
+
+def endpoint_cost(method: str, path: str, costs) -> float:
+    """Token cost of a request; endpoints not listed are free."""
+    for cost_method, prefix, cost in costs:
+        if method == cost_method and path.startswith(prefix):
+            return cost
+    return 0
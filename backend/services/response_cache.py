@@ -0,0 +1,69 @@
+import json
+import hashlib
+import logging
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Prefer orjson for serialization, but don't fail if not available
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not available. Falling back to stdlib JSON encoding.")
+
+# Response class for pipeline endpoints
+FastJSONResponse = ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+
+
+def dumps(content) -> bytes:
+    """Serialize content to JSON bytes with the fastest available encoder."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+class CachedJSONResponse:
+    """
+    A JSON payload serialized once, served with a strong ETag.
+
+    Use for data that only changes on deploy. Conditional requests carrying a
+    matching If-None-Match get an empty 304.
+    """
+
+    def __init__(self, content, max_age: int = 300):
+        self.body = dumps(content)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+
+    def matches(self, if_none_match: str) -> bool:
+        """Check an If-None-Match header value against this response's ETag."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            # If-None-Match uses weak comparison
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+    def respond(self, request: Request) -> Response:
+        """Return a 304 if the client copy is current, else the cached body."""
+        if self.matches(request.headers.get("if-none-match", "")):
+            record_cache("metadata", True)
+            return Response(status_code=304, headers=self.headers)
+        record_cache("metadata", False)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
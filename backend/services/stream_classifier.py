@@ -0,0 +1,123 @@
+import logging
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from services.audio_processor import StreamingResampler, frame_mfcc, N_FFT, HOP_LENGTH, N_MFCC
+from services.ai_classifier import classifier
+from services.nlp_translator import translator
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ENCODINGS = ("pcm16", "float32")
+
+
+class StreamingSession:
+    """
+    Incremental classifier for audio that arrives in small chunks.
+
+    Each chunk is resampled and only its new frames are analysed; per-frame
+    features are kept in a rolling window with a running sum, so the work per
+    chunk is bounded by the chunk size rather than the recording length.
+    """
+
+    def __init__(self, sample_rate=16000, encoding="pcm16", target_sr=22050,
+                 window_seconds=3.0, update_interval=0.5, min_seconds=1.0, max_seconds=60.0):
+        if encoding not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}. Use one of {', '.join(SUPPORTED_ENCODINGS)}")
+        if not 8000 <= int(sample_rate) <= 192000:
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+
+        self.encoding = encoding
+        self.target_sr = target_sr
+        self.update_interval = update_interval
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+        self._resampler = StreamingResampler(int(sample_rate), target_sr)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._leftover = b""
+        self._window = deque(maxlen=max(1, int(window_seconds * target_sr / HOP_LENGTH)))
+        self._window_sum = np.zeros(N_MFCC)
+        self._samples_seen = 0
+        self._last_update_at = 0
+
+    @property
+    def seconds(self) -> float:
+        """Seconds of audio received so far."""
+        return self._samples_seen / self.target_sr
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the session reached its maximum length."""
+        return self.seconds >= self.max_seconds
+
+    def _decode(self, chunk: bytes):
+        # Chunks need not end on a sample boundary: carry the partial sample over
+        if self._leftover:
+            chunk = self._leftover + chunk
+        width = 2 if self.encoding == "pcm16" else 4
+        usable = len(chunk) - len(chunk) % width
+        self._leftover = chunk[usable:]
+        if self.encoding == "pcm16":
+            return np.frombuffer(chunk[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        return np.frombuffer(chunk[:usable], dtype="<f4")
+
+    def _ingest(self, samples):
+        self._samples_seen += len(samples)
+        self._pending = np.concatenate([self._pending, samples])
+        if len(self._pending) < N_FFT:
+            return
+
+        n_frames = 1 + (len(self._pending) - N_FFT) // HOP_LENGTH
+        segment = self._pending[:N_FFT + (n_frames - 1) * HOP_LENGTH]
+        for frame in frame_mfcc(segment, self.target_sr):
+            if len(self._window) == self._window.maxlen:
+                self._window_sum -= self._window[0]
+            self._window.append(frame)
+            self._window_sum += frame
+        # Keep the overlap the next frame needs
+        self._pending = self._pending[n_frames * HOP_LENGTH:]
+
+    def features(self) -> Optional[np.ndarray]:
+        """Mean MFCC vector over the rolling window, or None if no frames yet."""
+        if not self._window:
+            return None
+        return self._window_sum / len(self._window)
+
+    def feed(self, chunk: bytes) -> Optional[dict]:
+        """
+        Add a chunk of audio.
+
+        Returns:
+            A classification update if one is due, else None
+        """
+        if self.exhausted:
+            return None
+        self._ingest(self._resampler.process(self._decode(chunk)))
+
+        due = self._samples_seen - self._last_update_at >= self.update_interval * self.target_sr
+        if self.seconds >= self.min_seconds and due:
+            self._last_update_at = self._samples_seen
+            return self.classify()
+        return None
+
+    def finish(self) -> Optional[dict]:
+        """Flush buffered audio and return the final classification."""
+        self._ingest(self._resampler.process(np.zeros(0, dtype=np.float32), last=True))
+        return self.classify()
+
+    def classify(self) -> Optional[dict]:
+        """Classify the current rolling window."""
+        features = self.features()
+        if features is None:
+            return None
+        result = classifier.predict(features)
+        return {
+            "animal": result["animal"],
+            "emotion": result["emotion"],
+            "confidence": result["confidence"],
+            "translation": translator.translate(result["animal"], result["emotion"]),
+            "audio_seconds": round(self.seconds, 2),
+        }
@@ -0,0 +1,305 @@
+import json
+import time
+import heapq
+import queue
+import logging
+import secrets
+import threading
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+import requests
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "zoolingo-api"
+
+# The span currently open in this context; None outside a trace
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation inside a trace."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int((self.end or self.start) * 1e9),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() outside a trace, so instrumented code needs no checks."""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one request (or job). Spans opened after the root ends are dropped."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            if not self.finished:
+                self.spans.append(span)
+
+    def to_dict(self):
+        root = self.spans[0]
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "duration_ms": round(root.duration * 1000, 3),
+            "start": root.start,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class SlowestTraces:
+    """Keeps the N slowest finished traces."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, trace: Trace):
+        if self.size <= 0:
+            return
+        entry = (trace.spans[0].duration, next(self._counter), trace)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def snapshot(self):
+        with self._lock:
+            entries = sorted(self._heap, key=lambda e: e[0], reverse=True)
+        return [trace.to_dict() for _, _, trace in entries]
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces):
+    """Encode finished traces as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    spans = []
+    for trace in traces:
+        for i, span in enumerate(trace.spans):
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if i == 0 else 1,  # SERVER for roots, INTERNAL otherwise
+                "startTimeUnixNano": str(int(span.start * 1e9)),
+                "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "zoolingo"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """
+    Ships finished traces from a background thread so requests never wait on I/O.
+
+    Targets: a JSONL file (one span per line) and/or an OTLP/HTTP collector
+    (e.g. http://otel-collector:4318/v1/traces). Traces are dropped when the
+    queue is full.
+    """
+
+    def __init__(self, file_path=None, otlp_endpoint=None, batch_size=64, flush_interval=2.0, queue_size=1000):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def submit(self, trace: Trace):
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.export(batch)
+
+    def export(self, traces):
+        if self.file_path:
+            try:
+                with open(self.file_path, "a") as f:
+                    for trace in traces:
+                        for span in trace.spans:
+                            f.write(json.dumps(span.to_dict(), default=str) + "\n")
+            except OSError as e:
+                logger.warning("Could not write traces to %s: %s", self.file_path, e)
+        if self.otlp_endpoint:
+            try:
+                requests.post(self.otlp_endpoint, json=to_otlp(traces), timeout=5)
+            except requests.RequestException as e:
+                logger.warning("Could not export traces to %s: %s", self.otlp_endpoint, e)
+
+
+class Tracer:
+    def __init__(self, exporter: TraceExporter, slowest_n: int = 20):
+        self.exporter = exporter
+        self.slowest = SlowestTraces(slowest_n)
+
+    @contextmanager
+    def start_trace(self, name, trace_id=None, parent_id=None, **attributes):
+        """
+        Open the root span of a new trace in the current context.
+
+        trace_id and parent_id continue a trace started upstream (from an
+        incoming traceparent), so the root span links to the caller's span.
+        """
+        trace = Trace(trace_id)
+        root = Span(trace, name, parent_id=parent_id, attributes=attributes)
+        trace.add(root)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            root.end = time.time()
+            _current_span.reset(token)
+            trace.finished = True
+            self.slowest.offer(trace)
+            self.exporter.submit(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Open a child of the current span; a no-op outside a trace."""
+        parent = _current_span.get()
+        if parent is None or parent.trace.finished:
+            yield _NOOP_SPAN
+            return
+        child = Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+        parent.trace.add(child)
+        token = _current_span.set(child)
+        try:
+            yield child
+        except BaseException as e:
+            child.error = repr(e)
+            raise
+        finally:
+            child.end = time.time()
+            _current_span.reset(token)
+
+
+def current_span():
+    """The open span in this context, or a no-op span."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def set_attribute(key, value):
+    """Annotate the current span."""
+    current_span().set_attribute(key, value)
+
+
+def parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return (trace ID, parent span ID) from a W3C traceparent header, or (None, None) if invalid."""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if (len(parts) == 4 and len(parts[1]) == 32 and parts[1] != "0" * 32
+            and len(parts[2]) == 16 and parts[2] != "0" * 16):
+        try:
+            int(parts[1], 16)
+            int(parts[2], 16)
+            return parts[1], parts[2]
+        except ValueError:
+            return None, None
+    return None, None
+
+
+tracer = Tracer(
+    TraceExporter(
+        file_path=config.TRACE_FILE,
+        otlp_endpoint=config.TRACE_OTLP_ENDPOINT,
+    ),
+    slowest_n=config.TRACE_SLOWEST_N,
+)
@@ -0,0 +1,177 @@
+"""
+startup_report: where a worker spends its start-up time.
+
+    python startup_report.py
+    python startup_report.py --budget-ms 1500 --module-budget fastapi=600
+    python startup_report.py --warm-up --json
+
+Imports app.py in a fresh interpreter with -X importtime, so nothing is
+already cached, then times each startup hook the app registers (and, with
+--warm-up, the audio warm-up those hooks start in the background). The
+report breaks the import down by the modules app.py imports and by the
+top-level packages that time was spent in.
+
+Exits 1 when importing the app takes longer than STARTUP_BUDGET_MS (or
+--budget-ms), when a --module-budget is exceeded, or when a module that is
+meant to load lazily was imported eagerly.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Deferred until first use or warm-up; importing app.py must not load these
+LAZY_MODULES = ("librosa.feature", "librosa.effects", "numba", "scipy.ndimage", "soundfile", "tensorflow")
+
+
+def _child(warm_up):
+    """Runs inside the measured interpreter; prints timings as JSON on stdout."""
+    import time
+    import asyncio
+
+    start = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - start) * 1000
+    eager = [name for name in LAZY_MODULES if name in sys.modules]
+
+    async def run_hooks(hooks):
+        timings = []
+        for hook in hooks:
+            hook_start = time.perf_counter()
+            result = hook()
+            if asyncio.iscoroutine(result):
+                await result
+            timings.append({"name": hook.__name__, "ms": round((time.perf_counter() - hook_start) * 1000, 2)})
+        return timings
+
+    async def lifecycle():
+        hooks = await run_hooks(app.app.router.on_startup)
+        if warm_up:
+            from services.audio_processor import warm_up as warm_up_audio
+            hooks.append({"name": "audio warm-up", "ms": round(warm_up_audio() * 1000, 2)})
+        await run_hooks(app.app.router.on_shutdown)
+        return hooks
+
+    report = {"import_ms": round(import_ms, 2), "eager_lazy_modules": eager, "startup_hooks": asyncio.run(lifecycle())}
+    sys.stdout.write(json.dumps(report) + "\n")
+
+
+def parse_importtime(stderr: str, root: str = "app"):
+    """
+    Pull the subtree of `root` out of -X importtime output.
+
+    Returns:
+        list of (depth below root, module, self ms, cumulative ms)
+    """
+    subtree = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = (depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000)
+        if depth == 0:
+            if entry[1] == root:
+                return subtree + [entry]
+            subtree = []
+        else:
+            subtree.append(entry)
+    raise RuntimeError(f"{root} was not imported; is it already imported by the report itself?")
+
+
+def collect(warm_up=False):
+    """Measure a fresh import of the app and its startup hooks."""
+    env = dict(os.environ, LOG_FILE="", LOG_LEVEL="WARNING", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--child"] + (["--warm-up"] if warm_up else []),
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr[-4000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    subtree = parse_importtime(result.stderr)
+    packages = defaultdict(float)
+    for _, name, self_ms, _ in subtree:
+        top = name.split(".")[0]
+        packages[name if top == "services" else top] += self_ms
+    report["modules"] = sorted(
+        ({"name": name, "ms": round(cumulative, 2)} for depth, name, _, cumulative in subtree if depth == 1),
+        key=lambda row: -row["ms"]
+    )
+    report["packages"] = sorted(
+        ({"name": name, "ms": round(ms, 2)} for name, ms in packages.items()),
+        key=lambda row: -row["ms"]
+    )
+    return report
+
+
+def check_budgets(report, budget_ms, module_budgets=None):
+    """List every budget the report breaks; empty when it is within budget."""
+    failures = []
+    if report["import_ms"] > budget_ms:
+        failures.append(f"importing app took {report['import_ms']:.0f}ms (budget {budget_ms:.0f}ms)")
+    measured = {row["name"]: row["ms"] for row in report["packages"]}
+    measured.update({row["name"]: row["ms"] for row in report["modules"]})
+    for name, budget in (module_budgets or {}).items():
+        if measured.get(name, 0) > budget:
+            failures.append(f"{name} took {measured[name]:.0f}ms (budget {budget:.0f}ms)")
+    for name in report["eager_lazy_modules"]:
+        failures.append(f"{name} was imported eagerly; it should load on first use or warm-up")
+    return failures
+
+
+def format_report(report, top=15):
+    lines = [f"Importing app: {report['import_ms']:.0f}ms", "", "Imported by app.py (cumulative):"]
+    lines += [f"  {row['ms']:9.1f}ms  {row['name']}" for row in report["modules"][:top]]
+    lines += ["", "By package (self time):"]
+    lines += [f"  {row['ms']:9.1f}ms  {row['name']}" for row in report["packages"][:top]]
+    lines += ["", "Startup hooks:"]
+    lines += [f"  {row['ms']:9.1f}ms  {row['name']}" for row in report["startup_hooks"]]
+    return "\n".join(lines)
+
+
+def _module_budget(value):
+    name, _, ms = value.partition("=")
+    if not name or not ms:
+        raise argparse.ArgumentTypeError("expected MODULE=MS")
+    return name, float(ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="startup_report", description="Break down app import and startup time")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Budget for importing the app (default: STARTUP_BUDGET_MS)")
+    parser.add_argument("--module-budget", type=_module_budget, action="append", default=[],
+                        metavar="MODULE=MS", help="Budget for one module or package; repeatable")
+    parser.add_argument("--warm-up", action="store_true", help="Also time the audio warm-up")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.warm_up)
+        return 0
+
+    if args.budget_ms is None:
+        sys.path.insert(0, BACKEND_DIR)
+        from config import config
+        args.budget_ms = config.STARTUP_BUDGET_MS
+
+    report = collect(args.warm_up)
+    failures = check_budgets(report, args.budget_ms, dict(args.module_budget))
+    if args.json:
+        print(json.dumps(dict(report, failures=failures), indent=2))
+    else:
+        print(format_report(report))
+        if failures:
+            print("\nOver budget:\n" + "\n".join(f"  - {failure}" for failure in failures))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
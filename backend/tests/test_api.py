@@ -6,10 +6,16 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
+from app import app, rate_limiter
+from services.ai_classifier import ANIMALS
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Start every test with full buckets; the limiter state outlives a test run"""
+    rate_limiter.reset()
+
 def test_root_endpoint():
     """Test root endpoint returns correct response"""
     response = client.get("/")
@@ -73,3 +79,411 @@ def test_process_audio_valid_mock():
     assert "emotion" in data["data"]
     assert "translation" in data["data"]
     assert "confidence" in data["data"]
+
+def test_demo_endpoint_known_id():
+    """Test demo endpoint serves a precomputed response"""
+    response = client.post("/api/demo/dog-happy")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["animal"] == "Dog"
+    assert data["emotion"] == "Happy"
+    assert data["demo_mode"] is True
+    assert len(data["translation"]) > 0
+
+def test_demo_endpoint_invalid_format():
+    """Test demo endpoint rejects malformed IDs"""
+    response = client.post("/api/demo/doghappy")
+    assert response.status_code == 400
+
+def test_metadata_endpoints_support_conditional_requests():
+    """Test cacheable metadata endpoints return ETags and honour If-None-Match"""
+    for path in ["/", "/api/config", "/api/supported"]:
+        response = client.get(path)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert "max-age" in response.headers["cache-control"]
+
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        stale = client.get(path, headers={"If-None-Match": '"stale"'})
+        assert stale.status_code == 200
+
+def test_job_lifecycle():
+    """Test async job API queues audio and publishes results"""
+    import time
+
+    wav_header = (
+        b'RIFF' + (36).to_bytes(4, 'little') +
+        b'WAVE' + b'fmt ' + (16).to_bytes(4, 'little') +
+        (1).to_bytes(2, 'little') + (1).to_bytes(2, 'little') +
+        (22050).to_bytes(4, 'little') + (44100).to_bytes(4, 'little') +
+        (2).to_bytes(2, 'little') + (16).to_bytes(2, 'little') +
+        b'data' + (0).to_bytes(4, 'little')
+    )
+
+    with TestClient(app) as job_client:
+        files = {"file": ("test.wav", wav_header, "audio/wav")}
+        response = job_client.post("/api/jobs", files=files)
+        assert response.status_code == 202
+        job_id = response.json()["data"]["job_id"]
+
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            job = job_client.get(f"/api/jobs/{job_id}").json()["data"]
+            if job["state"] in ("completed", "failed"):
+                break
+            time.sleep(0.1)
+
+        assert job["state"] == "completed"
+        assert "animal" in job["result"]
+        assert "translation" in job["result"]
+
+        events = job_client.get(f"/api/jobs/{job_id}/events")
+        assert events.status_code == 200
+        assert "event: completed" in events.text
+
+def test_job_not_found():
+    """Test unknown job IDs return 404"""
+    assert client.get("/api/jobs/does-not-exist").status_code == 404
+
+def test_process_batch_streams_ndjson():
+    """Test batch endpoint accepts files and zips and reports per-item errors, including undecodable audio"""
+    import io
+    import json
+    import zipfile
+
+    import numpy as np
+    import soundfile as sf
+
+    def make_wav(freq):
+        buffer = io.BytesIO()
+        t = np.linspace(0, 1, 22050, endpoint=False)
+        sf.write(buffer, 0.5 * np.sin(2 * np.pi * freq * t), 22050, format="WAV")
+        return buffer.getvalue()
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("clips/a.wav", make_wav(440))
+        zf.writestr("clips/notes.txt", b"not audio")
+
+    files = [
+        ("files", ("b.wav", make_wav(880), "audio/wav")),
+        ("files", ("clips.zip", archive.getvalue(), "application/zip")),
+        ("files", ("broken.wav", b"RIFF\x00\x00garbage" * 64, "audio/wav")),
+    ]
+    response = client.post("/api/process-batch", files=files)
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.text.strip().split("\n")]
+    items, summary = lines[:-1], lines[-1]
+    assert summary == {"status": "done", "total": 4, "errors": 2}
+    assert sorted(item["filename"] for item in items) == ["b.wav", "broken.wav", "clips/a.wav", "clips/notes.txt"]
+    for item in items:
+        if item["filename"] in ("clips/notes.txt", "broken.wav"):
+            assert item["status"] == "error"
+        else:
+            assert item["status"] == "success"
+            assert "translation" in item["data"]
+
+def test_process_batch_removes_work_dir_when_collecting_fails(monkeypatch, tmp_path):
+    """Test a failure while saving the uploads doesn't leave the batch directory behind"""
+    import app as app_module
+
+    work_dir = tmp_path / "batch"
+    work_dir.mkdir()
+    (work_dir / "0_saved.wav").write_bytes(b"RIFF")
+
+    def fail(uploads, directory):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app_module.tempfile, "mkdtemp", lambda prefix=None: str(work_dir))
+    monkeypatch.setattr(app_module, "collect_items", fail)
+    failing_client = TestClient(app, raise_server_exceptions=False)
+    response = failing_client.post("/api/process-batch", files=[("files", ("a.wav", b"RIFF", "audio/wav"))])
+    assert response.status_code == 500
+    assert not work_dir.exists()
+
+def test_websocket_listen_streams_updates():
+    """Test live streaming pushes classifications while audio arrives"""
+    import numpy as np
+
+    t = np.arange(16000 * 2) / 16000
+    pcm = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2").tobytes()
+    chunk_bytes = 3200  # 100ms at 16kHz
+
+    with client.websocket_connect("/ws/listen") as ws:
+        ws.send_json({"type": "config", "sample_rate": 16000, "encoding": "pcm16"})
+        assert ws.receive_json()["type"] == "ready"
+
+        for offset in range(0, len(pcm), chunk_bytes):
+            ws.send_bytes(pcm[offset:offset + chunk_bytes])
+        ws.send_json({"type": "stop"})
+
+        messages = [ws.receive_json()]
+        while messages[-1]["type"] != "final":
+            messages.append(ws.receive_json())
+
+    assert messages[-1]["type"] == "final"
+    assert messages[-1]["data"]["audio_seconds"] >= 1.9
+    classifications = [m for m in messages if m["type"] == "classification"]
+    assert classifications
+    assert "translation" in classifications[0]["data"]
+
+def test_websocket_listen_rejects_bad_config():
+    """Test invalid stream config closes the socket with an error"""
+    with client.websocket_connect("/ws/listen") as ws:
+        ws.send_json({"type": "config", "sample_rate": 16000, "encoding": "opus"})
+        message = ws.receive_json()
+        assert message["type"] == "error"
+
+    for bad in ([], {"type": "config", "sample_rate": "fast"}, {"type": "config", "sample_rate": [16000]}):
+        with client.websocket_connect("/ws/listen") as ws:
+            ws.send_json(bad)
+            assert ws.receive_json()["type"] == "error"
+
+def test_process_audio_segment_timeline():
+    """Test segment mode returns a timeline covering only active audio"""
+    import io
+
+    import numpy as np
+    import soundfile as sf
+
+    sr = 22050
+    t = np.arange(sr * 6) / sr
+    y = np.zeros_like(t)
+    y[sr:sr * 3] = 0.5 * np.sin(2 * np.pi * 440 * t[sr:sr * 3])
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format="WAV")
+
+    files = {"file": ("long.wav", buffer.getvalue(), "audio/wav")}
+    response = client.post("/api/process-audio?segment=true", files=files)
+    assert response.status_code == 200
+    data = response.json()["data"]
+
+    timeline = data["timeline"]
+    assert timeline
+    assert timeline[0]["start"] >= 0.5
+    assert timeline[-1]["end"] <= 3.5
+    for entry in timeline:
+        assert entry["animal"] in ANIMALS
+        assert entry["start"] < entry["end"]
+
+def test_metrics_endpoint_exports_stage_histograms():
+    """Test /metrics exposes per-stage timings, request durations and cache counters"""
+    pytest.importorskip("prometheus_client")
+    import io
+    import numpy as np
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    t = np.arange(22050 * 2) / 22050
+    sf.write(buffer, 0.3 * np.sin(2 * np.pi * 440 * t), 22050, format="WAV")
+    response = client.post("/api/process-audio", files={"file": ("tone.wav", buffer.getvalue(), "audio/wav")})
+    assert response.status_code == 200
+    etag = client.get("/").headers["etag"]
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("upload_spool", "decode", "trim", "mfcc", "inference", "translation"):
+        assert f'zoolingo_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'route="/api/process-audio"' in body
+    assert 'zoolingo_cache_requests_total{cache="metadata",result="hit"}' in body
+    assert "zoolingo_in_flight_requests" in body
+    assert "zoolingo_job_queue_depth" in body
+    assert "zoolingo_log_records_dropped_total" in body
+
+def test_request_id_is_echoed():
+    """Test the middleware propagates a client request ID and generates one otherwise"""
+    assert client.get("/health", headers={"X-Request-ID": "abc123"}).headers["x-request-id"] == "abc123"
+    assert len(client.get("/health").headers["x-request-id"]) == 16
+
+def test_slowest_traces_record_pipeline_spans():
+    """Test a processed request leaves a trace with nested stage spans"""
+    import io
+    import numpy as np
+    import soundfile as sf
+    from services.tracing import tracer
+
+    tracer.slowest.clear()
+    buffer = io.BytesIO()
+    t = np.arange(22050 * 2) / 22050
+    sf.write(buffer, 0.3 * np.sin(2 * np.pi * 440 * t), 22050, format="WAV")
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.post(
+        "/api/process-audio",
+        files={"file": ("tone.wav", buffer.getvalue(), "audio/wav")},
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+    )
+    assert response.headers["x-trace-id"] == trace_id
+
+    traces = client.get("/debug/traces").json()["traces"]
+    trace = next(t for t in traces if t["trace_id"] == trace_id)
+    assert trace["name"] == "POST /api/process-audio"
+    spans = {span["name"]: span for span in trace["spans"]}
+    root = spans["POST /api/process-audio"]
+    assert spans["upload_spool"]["attributes"]["file.size"] == len(buffer.getvalue())
+    assert spans["decode"]["attributes"]["audio.sample_rate"] == 22050
+    assert "model.version" in spans["inference"]["attributes"]
+    assert spans["decode"]["parent_span_id"] == root["span_id"]
+    # The root links back to the caller's span from traceparent
+    assert root["parent_span_id"] == "00f067aa0ba902b7"
+
+    from services.tracing import to_otlp, Trace, Span
+    exported = Trace(trace_id)
+    exported.spans = [Span(exported, root["name"], parent_id="00f067aa0ba902b7")]
+    otlp_root = to_otlp([exported])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_root["parentSpanId"] == "00f067aa0ba902b7" and otlp_root["kind"] == 2
+
+def test_debug_profile_returns_collapsed_stacks():
+    """Test the sampling profiler sees a busy thread and the alloc endpoint reports growth"""
+    import threading
+    import time
+
+    stop = threading.Event()
+
+    def busy_profiler_target():
+        while not stop.is_set():
+            sum(i * i for i in range(1000))
+
+    worker = threading.Thread(target=busy_profiler_target, name="busy-worker")
+    worker.start()
+    try:
+        response = client.get("/debug/profile", params={"seconds": 0.3, "interval_ms": 2})
+    finally:
+        stop.set()
+        worker.join()
+
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    lines = response.text.strip().splitlines()
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy and "busy_profiler_target" in busy[0]
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    assert client.get("/debug/profile", params={"seconds": 120}).status_code == 400
+
+    alloc = client.get("/debug/alloc", params={"seconds": 0.1, "top": 5}).json()
+    assert alloc["tracing_started_for_capture"] is True and alloc["frames"] == 1
+    assert isinstance(alloc["growth"], list) and len(alloc["top"]) <= 5
+
+def test_debug_endpoints_require_token(monkeypatch):
+    """Test /debug endpoints reject requests without the configured token"""
+    from config import config
+
+    monkeypatch.setattr(config, "DEBUG_TOKEN", "s3cret")
+    assert client.get("/debug/traces").status_code == 403
+    assert client.get("/debug/profile", params={"seconds": 0.1}, headers={"X-Debug-Token": "wrong"}).status_code == 403
+    assert client.get("/debug/traces", headers={"X-Debug-Token": "s3cret"}).status_code == 200
+
+def test_heavy_requests_are_shed_while_cheap_ones_pass(monkeypatch):
+    """Test a saturated worker answers process-audio with 503 + Retry-After but keeps serving /health"""
+    from services.admission import admission
+
+    monkeypatch.setattr(admission, "in_use", admission.capacity)
+    monkeypatch.setattr(admission, "queue_size", 0)
+    files = {"file": ("test.wav", b"fake audio content", "audio/wav")}
+    response = client.post("/api/process-audio", files=files)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+    assert client.get("/api/supported").status_code == 200
+    response = client.post("/api/demo/dog-happy")
+    assert response.status_code == 200
+    assert client.get("/health").json()["admission"]["in_use"] == admission.capacity
+
+def test_streamed_batch_holds_admission_slot_until_body_ends(monkeypatch):
+    """Test a streamed batch keeps its admission slot while the body is generated and reports the full latency"""
+    import time
+    import app as app_module
+    from services.admission import admission
+
+    monkeypatch.setattr(admission, "short_rtt", None)
+    monkeypatch.setattr(admission, "long_rtt", None)
+    in_use_during = []
+
+    def slow_batch(items, work_dir):
+        yield "{}\n"
+        time.sleep(0.3)
+        in_use_during.append(admission.in_use)
+        yield "{}\n"
+
+    monkeypatch.setattr(app_module, "process_batch", slow_batch)
+    before = admission.in_use
+    response = client.post("/api/process-batch", files=[("files", ("a.wav", b"x", "audio/wav"))])
+    assert response.status_code == 200
+    assert in_use_during == [before + 1]
+    assert admission.in_use == before
+    assert admission.short_rtt >= 0.3
+
+def test_rate_limit_separates_clients_behind_trusted_proxy(monkeypatch):
+    """Test forwarded client IPs get their own buckets only when the peer is a trusted proxy"""
+    import asyncio
+    import httpx
+    import app as app_module
+    from config import config
+    from services.rate_limit import parse_networks
+
+    monkeypatch.setattr(config, "RATE_LIMIT_IP_RATE", 0.001)
+    monkeypatch.setattr(config, "RATE_LIMIT_IP_BURST", 1)
+    monkeypatch.setattr(app_module, "trusted_proxies", parse_networks("10.0.0.0/8"))
+
+    async def demo_statuses(peer, forwarded_ips):
+        transport = httpx.ASGITransport(app=app, client=(peer, 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxied") as proxied:
+            statuses = []
+            for ip in forwarded_ips:
+                response = await proxied.post("/api/demo/dog-happy", headers={"X-Forwarded-For": f"{ip}, 10.0.0.2"})
+                statuses.append(response.status_code)
+            return statuses
+
+    # Through the proxy: two clients, one request each, both within their own bucket
+    assert asyncio.run(demo_statuses("10.0.0.3", ["203.0.113.7", "198.51.100.9"])) == [200, 200]
+    assert asyncio.run(demo_statuses("10.0.0.3", ["203.0.113.7"])) == [429]
+    # An untrusted peer can't pick its bucket with a forged header
+    assert asyncio.run(demo_statuses("192.0.2.50", ["203.0.113.8", "198.51.100.10"])) == [200, 429]
+
+def test_health_stays_200_while_degraded(monkeypatch):
+    """Test sustained saturation is reported in the body without failing the health check"""
+    from services.loop_monitor import loop_monitor
+
+    monkeypatch.setattr(loop_monitor, "saturation", lambda snapshot=None: ["event loop lag p95 400ms"])
+    response = client.get("/health")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "degraded" and data["degraded"] is True
+    assert data["saturation"] == ["event loop lag p95 400ms"]
+
+def test_ready_returns_503_while_saturated(monkeypatch):
+    """Test the readiness probe fails while saturated and recovers once it clears"""
+    from services.loop_monitor import loop_monitor
+
+    assert client.get("/ready").status_code == 200
+    monkeypatch.setattr(loop_monitor, "saturation", lambda snapshot=None: ["event loop lag p95 400ms"])
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["saturation"] == ["event loop lag p95 400ms"]
+    monkeypatch.undo()
+    assert client.get("/ready").status_code == 200
+
+def test_rate_limit_charges_uploads_more_than_demos(monkeypatch):
+    """Test an IP's bucket covers many demos but few uploads, then answers 429"""
+    from config import config
+
+    monkeypatch.setattr(config, "RATE_LIMIT_IP_RATE", 0.001)
+    monkeypatch.setattr(config, "RATE_LIMIT_IP_BURST", 12)
+    for _ in range(2):
+        assert client.post("/api/demo/dog-happy").status_code == 200
+    files = {"file": ("test.txt", b"not audio", "text/plain")}
+    response = client.post("/api/process-audio", files=files)
+    assert response.status_code == 400
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+
+    response = client.post("/api/demo/dog-happy")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/api/supported").status_code == 200
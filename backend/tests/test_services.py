@@ -1,4 +1,5 @@
 import pytest
+import json
 import numpy as np
 import os
 import sys
@@ -41,3 +42,758 @@ def test_translator_invalid_inputs():
     result = translator.translate("InvalidAnimal", "InvalidEmotion")
     assert isinstance(result, str)
     assert len(result) > 0  # Should return default response
+
+def test_translator_candidates_match_translate():
+    """Test translate picks from the resolved candidate pool"""
+    candidates = translator.get_candidates("Dog", "Happy")
+    assert translator.translate("Dog", "Happy") in candidates
+    assert len(translator.get_candidates("InvalidAnimal", "InvalidEmotion")) > 0
+
+def test_demo_cache_renders_each_phrase_once(tmp_path):
+    """Test demo cache covers every pair and reuses rendered audio"""
+    from services.demo_cache import DemoResponseCache
+
+    class FakeTTS:
+        calls = 0
+
+        def generate_speech(self, text):
+            FakeTTS.calls += 1
+            return b"mp3"
+
+    cache = DemoResponseCache(translator, ANIMALS, EMOTIONS, str(tmp_path))
+    assert len(cache.entries) == len(ANIMALS) * len(EMOTIONS)
+
+    result = cache.pick("Cat-Hungry")
+    assert result["animal"] == "Cat"
+    assert result["translation"] in translator.get_candidates("Cat", "Hungry")
+    assert cache.pick("unicorn-happy") is None
+
+    tts = FakeTTS()
+    url = cache.render(result["translation"], tts)
+    assert cache.render(result["translation"], tts) == url
+    assert FakeTTS.calls == 1
+
+    # A rebuilt cache picks up audio already on disk
+    rebuilt = DemoResponseCache(translator, ANIMALS, EMOTIONS, str(tmp_path))
+    assert rebuilt.audio_urls[result["translation"]] == url
+
+def test_demo_cache_renders_different_phrases_concurrently(tmp_path):
+    """Test a slow synthesis only holds up renders of the same phrase"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from services.demo_cache import DemoResponseCache
+
+    both_started = threading.Barrier(2, timeout=5)
+
+    class SlowTTS:
+        def __init__(self):
+            self.calls = []
+
+        def generate_speech(self, text):
+            self.calls.append(text)
+            both_started.wait()  # breaks (and raises) if the other render is blocked
+            return b"mp3"
+
+    cache = DemoResponseCache(translator, ANIMALS, EMOTIONS, str(tmp_path))
+    first, second = sorted(cache.phrases())[:2]
+    tts = SlowTTS()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        urls = list(pool.map(lambda phrase: cache.render(phrase, tts), [first, second]))
+    assert all(urls) and urls[0] != urls[1]
+    assert sorted(tts.calls) == [first, second]
+
+def test_job_store_bounds_and_reclaims(tmp_path):
+    """Test job store rejects over-capacity submits and reclaims expired leases"""
+    from services.job_queue import JobStore, QueueFullError, RUNNING
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=-1)
+    job_id = store.create("a.wav", max_queued=1)
+    with pytest.raises(QueueFullError):
+        store.create("b.wav", max_queued=1)
+
+    claimed = store.claim_next("worker-1")
+    assert claimed["job_id"] == job_id
+    assert claimed["state"] == RUNNING
+
+    # Lease already expired, so another worker can take it over
+    reclaimed = store.claim_next("worker-2")
+    assert reclaimed["job_id"] == job_id
+
+def test_job_store_fails_job_after_max_attempts(tmp_path):
+    """Test a job whose lease keeps expiring is failed instead of reclaimed forever"""
+    from services.job_queue import JobStore, FAILED
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=-1, max_attempts=2)
+    upload = tmp_path / "poison.wav"
+    upload.write_bytes(b"x")
+    poison = store.create(str(upload), max_queued=10)
+    healthy = store.create("b.wav", max_queued=10)
+
+    assert store.claim_next("worker-1")["attempts"] == 1
+    assert store.claim_next("worker-2")["attempts"] == 2
+    # Out of attempts: the next claim fails it and moves on to the next job
+    assert store.claim_next("worker-3")["job_id"] == healthy
+
+    job = store.get(poison)
+    assert job["state"] == FAILED and "2 attempts" in job["error"]
+    assert not upload.exists()
+
+def test_job_queue_renews_lease_and_respects_new_owner(tmp_path):
+    """Test a long job keeps its lease, and a worker that lost it neither publishes nor deletes the upload"""
+    import time
+    from services.job_queue import JobStore, JobQueue, COMPLETED, RUNNING
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.3)
+    upload = tmp_path / "a.wav"
+    upload.write_bytes(b"x")
+
+    def slow(job, publish):
+        time.sleep(0.8)
+        assert store.claim_next("worker-2") is None  # still leased to worker-1
+        publish("analysis", {"animal": "Dog"})
+
+    queue = JobQueue(store, slow)
+    job_id = store.create(str(upload), max_queued=10)
+    queue._process(store.claim_next("worker-1"), "worker-1")
+    assert store.get(job_id)["state"] == COMPLETED
+    assert not upload.exists()
+
+    upload.write_bytes(b"x")
+
+    def stolen(job, publish):
+        store._conn.execute("UPDATE jobs SET owner = 'worker-2' WHERE id = ?", (job["job_id"],))
+        publish("analysis", {"animal": "Cat"})
+
+    queue = JobQueue(store, stolen)
+    job_id = store.create(str(upload), max_queued=10)
+    queue._process(store.claim_next("worker-1"), "worker-1")
+    job = store.get(job_id)
+    assert job["state"] == RUNNING and job["result"] == {}
+    assert upload.exists()
+
+def test_decode_two_head_prediction_uses_full_emotion_list():
+    """Test predictions from train_model's two-head model decode against EMOTIONS"""
+    from services.ai_classifier import EmotionClassifier, ANIMALS, EMOTIONS
+
+    decoder = EmotionClassifier(backend="heuristic")
+    animal = np.zeros((1, len(ANIMALS)))
+    animal[0, ANIMALS.index("Wolf")] = 0.9
+    emotion = np.zeros((1, len(EMOTIONS)))
+    emotion[0, EMOTIONS.index("Lonely")] = 0.7
+
+    result = decoder._decode_prediction([animal, emotion])
+    assert (result["animal"], result["emotion"], result["confidence"]) == ("Wolf", "Lonely", 0.8)
+
+    flat = decoder._decode_prediction(np.concatenate([animal, emotion], axis=1))
+    assert (flat["animal"], flat["emotion"]) == ("Wolf", "Lonely")
+
+def test_classifier_predict_batch():
+    """Test batch prediction returns one valid result per row"""
+    results = classifier.predict_batch(np.random.rand(4, 13))
+    assert len(results) == 4
+    for result in results:
+        assert result["animal"] in ANIMALS
+        assert result["emotion"] in EMOTIONS
+
+def test_collect_items_fails_only_the_bad_archive_member(tmp_path):
+    """Test encrypted and corrupt zip members become per-item errors without partial files"""
+    import io
+    import zipfile
+    from services.batch import collect_items
+
+    big = b"RIFF" + bytes(range(256)) * 800  # larger than one copy chunk
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("first.wav", b"RIFF" + b"\x01" * 1000)
+        zf.writestr("corrupt.wav", big)
+        zf.writestr("secret.wav", b"RIFF" + b"\x02" * 1000)
+        zf.writestr("last.wav", b"RIFF" + b"\x03" * 1000)
+    data = bytearray(archive.getvalue())
+    # Flip a byte near the end of corrupt.wav so its CRC fails after the first chunk is written
+    corrupt_at = data.index(big) + len(big) - 10
+    data[corrupt_at] ^= 0xFF
+    # Mark secret.wav as encrypted in the central directory
+    central = data.index(b"PK\x01\x02")
+    for _ in range(2):
+        central = data.index(b"PK\x01\x02", central + 1)
+    data[central + 8] |= 0x01
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    items = collect_items([("clips.zip", io.BytesIO(bytes(data)))], str(work_dir))
+
+    by_name = {item.filename: item for item in items}
+    assert [item.filename for item in items] == ["first.wav", "corrupt.wav", "secret.wav", "last.wav"]
+    assert by_name["corrupt.wav"].error and by_name["secret.wav"].error
+    assert by_name["first.wav"].path and by_name["last.wav"].path
+    assert sorted(os.listdir(work_dir)) == sorted(os.path.basename(by_name[n].path) for n in ("first.wav", "last.wav"))
+
+def test_streaming_session_window_is_bounded():
+    """Test live sessions keep a fixed-size rolling window of frames"""
+    from services.stream_classifier import StreamingSession
+
+    session = StreamingSession(sample_rate=22050, encoding="float32", window_seconds=1.0, max_seconds=10)
+    chunk = (0.1 * np.random.randn(2205)).astype("<f4").tobytes()
+    updates = [session.feed(chunk) for _ in range(50)]
+
+    assert len(session._window) == session._window.maxlen
+    assert any(update is not None for update in updates)
+    assert session.features().shape == (13,)
+    assert session.finish()["audio_seconds"] == 5.0
+
+def test_streaming_session_carries_partial_samples_across_chunks():
+    """Test odd-length pcm16 chunks decode to the same samples as the whole stream"""
+    from services.stream_classifier import StreamingSession
+
+    samples = (0.3 * np.sin(2 * np.pi * 440 * np.arange(4000) / 16000) * 32767).astype("<i2")
+    data = samples.tobytes()
+    session = StreamingSession(sample_rate=16000, encoding="pcm16")
+    decoded = [session._decode(data[i:i + 321]) for i in range(0, len(data), 321)]
+
+    assert np.array_equal(np.concatenate(decoded), samples.astype(np.float32) / 32768.0)
+    assert session._leftover == b""
+
+def test_segment_audio_skips_silence(tmp_path):
+    """Test segmentation keeps only windows above the activity threshold"""
+    import soundfile as sf
+    from services.audio_processor import segment_audio
+
+    sr = 44100
+    t = np.arange(sr * 8) / sr
+    y = np.zeros_like(t)
+    y[sr * 5:sr * 6] = 0.5 * np.sin(2 * np.pi * 440 * t[sr * 5:sr * 6])
+    path = tmp_path / "clip.flac"
+    sf.write(str(path), y, sr)
+
+    segments = segment_audio(str(path), window_seconds=1.0, hop_seconds=0.5, block_seconds=0.7)
+    assert segments
+    for start, end, features in segments:
+        assert 4.0 <= start and end <= 7.0
+        assert features.shape == (13,)
+
+def test_stream_audio_resamples_in_blocks(tmp_path):
+    """Test streaming decode yields bounded blocks and honours max_duration"""
+    import soundfile as sf
+    from services.audio_processor import stream_audio, get_audio_duration
+
+    sr = 44100
+    path = tmp_path / "clip.wav"
+    sf.write(str(path), 0.1 * np.random.randn(sr * 4), sr)
+
+    blocks = list(stream_audio(str(path), sr=22050, block_seconds=0.5))
+    assert max(len(block) for block in blocks) < 22050
+    assert abs(sum(len(block) for block in blocks) - 22050 * 4) <= 1
+
+    limited = list(stream_audio(str(path), sr=22050, max_duration=1.5))
+    assert sum(len(block) for block in limited) == int(22050 * 1.5)
+
+    assert get_audio_duration(str(path)) == 4.0
+
+def _tone_clip(seed, sr=22050, seconds=4):
+    """Deterministic clip of decaying chirps, distinct per seed"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(sr * seconds) / sr
+    y = np.zeros_like(t)
+    for _ in range(12):
+        start = rng.integers(0, sr * (seconds - 1))
+        length = rng.integers(sr // 10, sr // 2)
+        envelope = np.exp(-np.linspace(0, rng.uniform(2, 6), length))
+        y[start:start + length] += np.sin(2 * np.pi * rng.uniform(200, 4000) * t[:length]) * envelope * 0.2
+    return y
+
+def test_fingerprint_index_matches_reencoded_clip(tmp_path):
+    """Test a re-encoded, resampled copy of a reference clip is recognised"""
+    import soundfile as sf
+    from services.audio_processor import StreamingResampler
+    from services.fingerprint import FingerprintIndex
+
+    refs = tmp_path / "refs"
+    (refs / "Dog" / "Happy").mkdir(parents=True)
+    sf.write(str(refs / "Dog" / "Happy" / "bark.wav"), _tone_clip(1), 22050)
+    sf.write(str(refs / "cat-angry-hiss.wav"), _tone_clip(2), 22050)
+
+    index = FingerprintIndex()
+    assert index.load_directory(str(refs), str(tmp_path / "index.npz")) == 2
+
+    # Same clip, resampled to 44.1kHz, re-encoded as Ogg Vorbis with noise
+    query = StreamingResampler(22050, 44100).process(_tone_clip(1), last=True)
+    query = query + 0.003 * np.random.default_rng(0).standard_normal(len(query))
+    sf.write(str(tmp_path / "query.ogg"), query, 44100)
+
+    match = index.match(str(tmp_path / "query.ogg"))
+    assert match["animal"] == "Dog"
+    assert match["emotion"] == "Happy"
+
+    sf.write(str(tmp_path / "other.wav"), _tone_clip(3), 22050)
+    assert index.match(str(tmp_path / "other.wav")) is None
+
+    # The cached index is reused on the next start
+    cached = FingerprintIndex()
+    assert cached.load(str(tmp_path / "index.npz"))
+    assert cached.match(str(tmp_path / "query.ogg"))["reference"] == match["reference"]
+
+    # The Nyquist bin gets its own hash rather than aliasing to bin 0
+    from services.fingerprint import hash_peaks, N_FFT
+    t, magnitude = np.array([0, 1]), np.zeros(2)
+    nyquist, _ = hash_peaks(t, np.array([N_FFT // 2, 10]), magnitude)
+    dc, _ = hash_peaks(t, np.array([0, 10]), magnitude)
+    assert nyquist[0] != dc[0]
+
+def test_knn_backend_votes_from_reference_library(tmp_path):
+    """Test the kNN backend classifies from a saved reference library"""
+    from services.ai_classifier import EmotionClassifier
+    from services.knn_index import ReferenceLibrary
+
+    rng = np.random.default_rng(0)
+    centers = {("Dog", "Happy"): rng.normal(0, 10, 13), ("Cow", "Calm"): rng.normal(0, 10, 13)}
+    features, labels = [], []
+    for label, center in centers.items():
+        for _ in range(50):
+            features.append(center + rng.normal(0, 1, 13))
+            labels.append(label)
+
+    # Force the coarse index so both search paths are exercised
+    ReferenceLibrary.build(np.stack(features), labels, ivf_threshold=10, n_lists=4).save(str(tmp_path))
+
+    knn = EmotionClassifier(backend="knn", knn_library_path=str(tmp_path))
+    assert knn.active_backend == "knn"
+    assert isinstance(knn.knn_library.vectors, np.memmap)
+
+    result = knn.predict(centers[("Cow", "Calm")])
+    assert (result["animal"], result["emotion"]) == ("Cow", "Calm")
+    assert result["confidence"] > 0.9
+
+    batch = knn.predict_batch(np.stack(list(centers.values())))
+    assert [(r["animal"], r["emotion"]) for r in batch] == list(centers.keys())
+
+    # New clips drop in without rebuilding normalisation or centroids
+    library = knn.knn_library.add(rng.normal(50, 1, 13), "Lion", "Proud")
+    assert len(library) == 101
+    assert library.predict(rng.normal(50, 1, 13), k=1)[0]["animal"] == "Lion"
+
+def test_knn_ivf_search_widens_past_empty_and_sparse_lists():
+    """Test IVF queries whose closest lists are empty or small still get k neighbours each"""
+    from services.knn_index import ReferenceLibrary
+
+    rng = np.random.default_rng(2)
+    dog, cow = rng.normal(0, 10, (2, 13))
+    features = np.stack([center + rng.normal(0, 1, 13) for center in [dog] * 20 + [cow] * 20])
+    labels = [("Dog", "Happy")] * 20 + [("Cow", "Calm")] * 20
+    flat = ReferenceLibrary.build(features, labels, ivf_threshold=1000)
+
+    # Hand-built coarse index: the list closest to `dog` is empty, the one closest
+    # to `cow` holds a single row, and every other row sits in a third list
+    dog_query, cow_query = flat._prepare(np.stack([dog, cow]))
+    centroids = np.stack([dog_query, cow_query, -(dog_query + cow_query) / np.linalg.norm(dog_query + cow_query)])
+    vectors = np.concatenate([flat.vectors[20:21], flat.vectors[:20], flat.vectors[21:]])
+    ivf = ReferenceLibrary(vectors, [labels[20]] + labels[:20] + labels[21:], flat.mean, flat.std,
+                           centroids.astype(np.float32), np.array([0, 0, 1, 40]))
+
+    indices, similarities = ivf.search(np.stack([dog, cow]), k=5, nprobe=1)
+    assert indices.shape == similarities.shape == (2, 5)
+    assert np.all(np.diff(similarities, axis=1) <= 0)
+    # The sparse cow query doesn't cut the dog query's neighbour list short
+    assert np.array_equal(indices[0], ivf.search(dog, k=5, nprobe=1)[0][0])
+    assert [r["animal"] for r in ivf.predict(np.stack([dog, cow]), k=5, nprobe=1)] == ["Dog", "Cow"]
+
+def test_knn_build_from_clips_skips_undecodable(tmp_path):
+    """Test a corrupt reference clip is left out of the library instead of stored as mock features"""
+    import soundfile as sf
+    from services.knn_index import build_from_clips, load_library
+
+    clips = tmp_path / "clips"
+    (clips / "Dog" / "Happy").mkdir(parents=True)
+    sf.write(str(clips / "Dog" / "Happy" / "bark.wav"), _tone_clip(1), 22050)
+    (clips / "Dog" / "Happy" / "broken.wav").write_bytes(b"RIFF\x00\x00garbage" * 64)
+
+    assert build_from_clips(str(clips), str(tmp_path / "library")) == 1
+    assert len(load_library(str(tmp_path / "library"))) == 1
+
+def test_cascade_escalates_only_uncertain_clips(tmp_path):
+    """Test the cascade answers confident clips with kNN and escalates the rest"""
+    from services.ai_classifier import EmotionClassifier, ANIMALS
+    from services.knn_index import ReferenceLibrary
+
+    rng = np.random.default_rng(1)
+    dog, cow, ambiguous = rng.normal(0, 10, (3, 13))
+    centers = [dog] * 20 + [cow] * 20 + [ambiguous] * 20
+    features = [center + rng.normal(0, 1, 13) for center in centers]
+    # The third neighbourhood is labelled half Dog, half Cow, so its vote is split
+    labels = ([("Dog", "Happy")] * 20 + [("Cow", "Calm")] * 20
+              + [("Dog", "Happy"), ("Cow", "Calm")] * 10)
+    ReferenceLibrary.build(np.stack(features), labels).save(str(tmp_path))
+
+    class Model:
+        def __init__(self):
+            self.rows = 0
+
+        def predict(self, batch, verbose=0):
+            self.rows += len(batch)
+            prediction = np.zeros((len(batch), len(ANIMALS) + 8))
+            prediction[:, ANIMALS.index("Lion")] = 0.9
+            return prediction
+
+    from services.metrics import PROMETHEUS_AVAILABLE, CASCADE_CLIPS
+
+    def exported(stage, outcome):
+        return CASCADE_CLIPS.labels(stage, outcome)._value.get() if PROMETHEUS_AVAILABLE else 0
+
+    before = exported("knn", "hit"), exported("knn", "fallback")
+    cascade = EmotionClassifier(backend="cascade", knn_library_path=str(tmp_path), cascade_threshold=0.95)
+    cascade.model, cascade.model_loaded = Model(), True
+    assert cascade.active_backend == "cascade"
+
+    results = cascade.predict_batch(np.stack([dog, cow, ambiguous]))
+    assert [r["animal"] for r in results[:2]] == ["Dog", "Cow"]
+    assert results[2]["animal"] == "Lion"
+    assert cascade.model.rows == 1
+
+    stats = cascade.stats.snapshot()
+    assert stats["knn"]["calls"] == 3 and stats["knn"]["answered"] == 2
+    assert stats["keras"]["calls"] == 1
+    assert stats["knn"]["hit_rate"] == round(2 / 3, 3)
+    if PROMETHEUS_AVAILABLE:
+        assert (exported("knn", "hit") - before[0], exported("knn", "fallback") - before[1]) == (2, 1)
+
+def test_feature_store_only_extracts_new_or_changed_clips(tmp_path):
+    """Test re-syncing the training feature store skips unchanged clips and excludes undecodable ones"""
+    import soundfile as sf
+    from feature_store import FeatureStore
+
+    data = tmp_path / "data"
+    (data / "Dog" / "Happy").mkdir(parents=True)
+    sf.write(str(data / "Dog" / "Happy" / "a.wav"), _tone_clip(1), 22050)
+    sf.write(str(data / "cat-angry-1.wav"), _tone_clip(2), 22050)
+    (data / "Dog" / "Happy" / "broken.wav").write_bytes(b"RIFF\x00\x00garbage" * 64)
+
+    # The corrupt clip is counted as failed and kept out of the training data
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.sync(str(data), workers=1) == {"total": 2, "extracted": 2, "failed": 1}
+
+    # A fresh instance reads the manifest; nothing needs extracting
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.sync(str(data), workers=1)["extracted"] == 0
+
+    sf.write(str(data / "cat-angry-1.wav"), _tone_clip(3), 22050)
+    sf.write(str(data / "cow-calm-1.wav"), _tone_clip(1), 22050)  # duplicate content of a.wav
+    # The corrupt clip is retried, and fails again
+    assert store.sync(str(data), workers=1) == {"total": 3, "extracted": 1, "failed": 1}
+
+    batches = list(store.iter_batches(batch_size=2))
+    assert [len(features) for features, _, _ in batches] == [2, 1]
+    features = np.concatenate([f for f, _, _ in batches])
+    assert features.shape == (3, 13) and features.dtype == np.float32
+    assert sorted(a for _, animals, _ in batches for a in animals) == ["Cat", "Cow", "Dog"]
+    assert len(store.index(keep=lambda animal, emotion: emotion != "Calm")) == 2
+
+def test_feature_store_retries_failed_extractions(tmp_path, monkeypatch):
+    """Test a clip whose extraction failed is extracted again on the next sync"""
+    import soundfile as sf
+    import feature_store
+    from feature_store import FeatureStore
+
+    data = tmp_path / "data"
+    (data / "Dog" / "Happy").mkdir(parents=True)
+    sf.write(str(data / "Dog" / "Happy" / "a.wav"), _tone_clip(1), 22050)
+
+    real_extract = feature_store._extract
+    monkeypatch.setattr(feature_store, "_extract", lambda path: None)
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.sync(str(data), workers=1) == {"total": 0, "extracted": 0, "failed": 1}
+
+    # A transient failure: the unchanged clip is picked up again, by a fresh instance too
+    monkeypatch.setattr(feature_store, "_extract", real_extract)
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.sync(str(data), workers=1) == {"total": 1, "extracted": 1, "failed": 0}
+    assert store.sync(str(data), workers=1)["extracted"] == 0
+
+def test_batch_cli_resumes_from_existing_output(tmp_path):
+    """Test the offline batch CLI writes CSV results and skips files already done"""
+    import csv
+    import soundfile as sf
+    from batch_cli import main
+
+    recordings = tmp_path / "recordings"
+    recordings.mkdir()
+    for i in range(3):
+        sf.write(str(recordings / f"clip{i}.wav"), _tone_clip(i, seconds=2), 22050)
+    (recordings / "broken.wav").write_bytes(b"not audio")
+    output = tmp_path / "results.csv"
+
+    assert main([str(recordings), "-o", str(output), "-w", "1", "-b", "2"]) == 0
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 4
+    assert all(row["animal"] in ANIMALS for row in rows if row["status"] == "ok")
+    assert {os.path.basename(row["path"]): row["status"] for row in rows} == {
+        "broken.wav": "error", "clip0.wav": "ok", "clip1.wav": "ok", "clip2.wav": "ok"
+    }
+
+    sf.write(str(recordings / "clip3.wav"), _tone_clip(3, seconds=2), 22050)
+    assert main([str(recordings), "-o", str(output), "-w", "1"]) == 0
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(os.path.basename(row["path"]) for row in rows) == [
+        "broken.wav", "clip0.wav", "clip1.wav", "clip2.wav", "clip3.wav"
+    ]
+
+def test_structured_logging_is_queued_tagged_and_throttled():
+    """Test log records carry the request ID, format as JSON and are rate limited per call site"""
+    import json
+    import logging
+    import queue
+    from services.structured_logging import (
+        JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, RequestContextFilter, request_id_var
+    )
+    from services.metrics import PROMETHEUS_AVAILABLE, LOG_RECORDS_DROPPED
+
+    def exported_drops():
+        return LOG_RECORDS_DROPPED._value.get() if PROMETHEUS_AVAILABLE else 0
+
+    drops_before = exported_drops()
+
+    records = queue.Queue(maxsize=3)
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(RateLimitFilter(per_second=2))
+    log = logging.getLogger("test.structured")
+    log.propagate = False
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+    token = request_id_var.set("req-123")
+    try:
+        for i in range(5):
+            log.info("hot path %d", i)
+        log.warning("never throttled")
+        log.error("dropped, queue is full")
+    finally:
+        request_id_var.reset(token)
+        log.removeHandler(handler)
+
+    assert records.qsize() == 3
+    assert handler.dropped == 1
+    if PROMETHEUS_AVAILABLE:
+        assert exported_drops() - drops_before == 1
+    first = records.get_nowait()
+    # Formatting is deferred to the writer thread
+    assert first.msg == "hot path %d" and first.args == (0,)
+
+    payload = json.loads(JsonFormatter().format(first))
+    assert payload["message"] == "hot path 0"
+    assert payload["request_id"] == "req-123"
+    assert payload["level"] == "INFO"
+
+def test_loop_monitor_reports_blocked_loop(caplog):
+    """Test a blocked loop is measured and logged with its stack, and only sustained lag marks saturation"""
+    import asyncio
+    import logging
+    import time
+    from services.loop_monitor import LoopMonitor
+
+    def blocking_handler():
+        time.sleep(0.3)
+
+    async def scenario():
+        monitor = LoopMonitor(interval=0.02, lag_threshold=0.1)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.6)
+            assert monitor.saturation() == []
+            blocking_handler()
+            await asyncio.sleep(0.05)
+            spike = monitor.snapshot(), monitor.saturation()
+            for _ in range(10):
+                time.sleep(0.15)
+                await asyncio.sleep(0.025)
+            return spike, monitor.saturation()
+        finally:
+            monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="services.loop_monitor"):
+        (snapshot, after_spike), sustained = asyncio.run(scenario())
+
+    assert snapshot["loop_lag_ms"] >= 200
+    assert after_spike == []
+    assert sustained and sustained[0].startswith("event loop lag p95")
+    assert any("blocking_handler" in record.getMessage() for record in caplog.records)
+
+def test_capture_allocations_snapshots_off_the_event_loop(monkeypatch):
+    """Test allocation snapshots run in the threadpool and report the depth tracing really uses"""
+    import asyncio
+    import threading
+    import tracemalloc
+    from services import profiler
+
+    snapshot_threads = []
+    real_snapshot = profiler._snapshot
+
+    def recording_snapshot():
+        snapshot_threads.append(threading.get_ident())
+        return real_snapshot()
+
+    monkeypatch.setattr(profiler, "_snapshot", recording_snapshot)
+
+    async def capture():
+        loop_thread = threading.get_ident()
+        first, second = await asyncio.gather(profiler.capture_allocations(0.05, top=3, frames=1),
+                                             profiler.capture_allocations(0, top=3), return_exceptions=True)
+        return loop_thread, first, second
+
+    tracemalloc.start(4)
+    try:
+        loop_thread, result, busy = asyncio.run(capture())
+    finally:
+        tracemalloc.stop()
+    assert snapshot_threads and loop_thread not in snapshot_threads
+    assert result["tracing_started_for_capture"] is False and result["frames"] == 4
+    assert isinstance(busy, profiler.ProfilerBusyError)
+
+def test_admission_controller_queues_sheds_and_adapts():
+    """Test the admission limit queues then rejects overflow, and tracks latency"""
+    import asyncio
+    from services.admission import AdmissionController, Rejected
+
+    async def scenario():
+        controller = AdmissionController(initial_limit=1, max_limit=8, queue_size=1, queue_timeout=0.5)
+        await controller.acquire()
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after >= 1
+        controller.release(0.1)
+        await queued  # the freed slot went to the waiter
+        assert controller.in_use == 1 and controller.queued == 0
+        controller.release(0.1)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_use == 0
+
+    # Steady latency lets the limit grow; a latency spike shrinks it
+    for _ in range(30):
+        controller.observe(0.1)
+    grown = controller.limit
+    assert grown > 1
+    for _ in range(10):
+        controller.observe(1.0)
+    assert controller.limit < grown
+
+def test_token_bucket_refills_over_time(tmp_path):
+    """Test buckets are debited by cost, refill at their rate and are shared between connections"""
+    from services.rate_limit import TokenBucketLimiter
+
+    db_path = str(tmp_path / "limits.sqlite3")
+    limiter = TokenBucketLimiter(db_path)
+    other_worker = TokenBucketLimiter(db_path)
+
+    assert limiter.consume("ip:1", 6, rate=2, burst=10, now=100.0)[0]
+    allowed, remaining, retry_after = other_worker.consume("ip:1", 6, rate=2, burst=10, now=100.0)
+    assert not allowed and remaining == 4 and retry_after == 1
+    assert other_worker.consume("ip:1", 6, rate=2, burst=10, now=101.0)[0]
+    assert limiter.consume("ip:2", 10, rate=2, burst=10, now=101.0)[0]
+
+def test_serve_derives_workers_from_cgroup_quota(monkeypatch):
+    """Test the pre-fork server sizes itself from the CPU quota, not the host core count"""
+    import serve
+
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(serve.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    monkeypatch.setattr(serve, "cgroup_cpu_limit", lambda: 2.5)
+    assert serve.default_workers() == 3
+    monkeypatch.setattr(serve, "cgroup_cpu_limit", lambda: None)
+    assert serve.default_workers() == 16
+    monkeypatch.setenv("WEB_CONCURRENCY", "5")
+    assert serve.default_workers() == 5
+
+def test_startup_report_breaks_down_import_time():
+    """Test the startup report attributes import time per module and enforces budgets"""
+    import startup_report
+
+    report = startup_report.collect()
+    # Heavy audio dependencies must wait for first use or warm-up
+    assert report["eager_lazy_modules"] == []
+    modules = {row["name"] for row in report["modules"]}
+    assert {"config", "services.pipeline", "services.ai_classifier"} <= modules
+    assert [hook["name"] for hook in report["startup_hooks"]][:1] == ["prerender_demo_audio"]
+
+    assert startup_report.check_budgets(report, budget_ms=60000) == []
+    failures = startup_report.check_budgets(report, budget_ms=0.001, module_budgets={"services.pipeline": 0.001})
+    assert len(failures) == 2 and "services.pipeline" in failures[1]
+
+def test_pipeline_benchmark_writes_comparable_results(tmp_path):
+    """Test the benchmark corpus is deterministic and every stage reports latency stats"""
+    from benchmarks.corpus import synth_call
+    from benchmarks.pipeline_bench import run
+    from config import config
+
+    assert np.array_equal(synth_call(0.5, seed=3), synth_call(0.5, seed=3))
+
+    report = run(str(tmp_path), quick=True, levels=(2,), requests=2)
+    names = {row["name"] for row in report["results"]}
+    assert {"load_and_preprocess_audio", "classifier.predict_batch", "translator.translate", "process_audio"} <= names
+    formats = {row["params"]["format"] for row in report["results"] if row["name"] == "load_and_preprocess_audio"}
+    assert formats | set(report["meta"]["skipped_formats"]) == config.ALLOWED_EXTENSIONS
+    e2e = next(row for row in report["results"] if row["name"] == "process_audio")
+    assert e2e["statuses"] == {"200": 2} and e2e["p95_ms"] >= e2e["p50_ms"] > 0
+    json.dumps(report)
+
+def test_mock_murf_and_load_generator(monkeypatch):
+    """Test the mock Murf contract and a short open-loop run against the app"""
+    import asyncio
+    import httpx
+    from fastapi.testclient import TestClient
+    from benchmarks.mock_murf import build_app
+    from benchmarks.loadgen import run_load
+    from app import app
+    from config import config
+
+    murf = TestClient(build_app(latency="fixed:1", throttle_rate=0.5, seed=1))
+    payload = {"voiceId": "en-US-1", "text": "Woof", "format": "MP3"}
+    assert murf.post("/v1/speech/generate", json=payload).status_code == 401
+    codes = [murf.post("/v1/speech/generate", json=payload, headers={"api-key": "x"}).status_code for _ in range(20)]
+    assert set(codes) == {200, 429}
+    reliable = TestClient(build_app(latency="fixed:1"))
+    audio = reliable.post("/v1/speech/generate", json=dict(payload, text="Woof woof"), headers={"api-key": "x"})
+    assert audio.status_code == 200
+    assert audio.content.startswith(b"ID3") and len(audio.content) == 8000 + 400 * 9
+
+    monkeypatch.setattr(config, "RATE_LIMIT_ENABLED", False)
+
+    async def load():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            return await run_load(client, rps=40, duration=0.5, mix="demo=1,metadata=1")
+
+    report = asyncio.run(load())
+    assert report["sent"] >= 15
+    assert set(report["requests"]) == {"demo", "metadata"}
+    assert all(stats["error_rate"] == 0 for stats in report["requests"].values())
+
+def test_regression_gate(tmp_path):
+    """Test regression detection, noise tolerance and the committed baseline's metric set"""
+    from benchmarks.regression import compare, measure, BASELINE_PATH
+
+    def run(median, mad=0.01, fastest=None, calibration=1.0):
+        return {"calibration": {"median_ms": calibration, "min_ms": calibration, "mad_ms": 0, "rounds": 7},
+                "metrics": {"m": {"median_ms": median, "min_ms": fastest or median, "mad_ms": mad, "rounds": 7}}}
+
+    baseline = run(1.0)
+    assert compare(run(1.05), baseline)[0]["status"] == "ok"
+    assert compare(run(1.4), baseline)[0]["status"] == "regressed"
+    # 1.5x slower is caught even when one round happened to be fast
+    assert compare(run(1.5, fastest=0.6), baseline)[0]["status"] == "regressed"
+    # Past the threshold, but rounds scatter too widely to tell it from noise
+    assert compare(run(1.4, mad=0.5), run(1.0, mad=0.5))[0]["status"] == "ok"
+    # Twice as slow on a machine that is twice as slow
+    assert compare(run(2.0, calibration=2.0), baseline)[0]["status"] == "ok"
+    assert compare(run(2.0, calibration=2.0), baseline, normalize=False)[0]["status"] == "regressed"
+    assert compare(run(1.4), dict(baseline, thresholds={"m": 0.5}))[0]["status"] == "ok"
+    assert compare(run(0.5), baseline)[0]["status"] == "improved"
+
+    current = measure(str(tmp_path), rounds=2, min_time=0.005)
+    with open(BASELINE_PATH) as f:
+        committed = json.load(f)
+    assert set(current["metrics"]) == set(committed["metrics"])
@@ -1,43 +1,108 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
 import numpy as np
+import argparse
+import time
 import os
 
-# Placeholder for dataset loading
-def load_dataset(data_path):
-    # In a real project, this would load .wav files and labels
-    # Returning random data for structure demonstration
-    X = np.random.rand(100, 13) # 100 samples, 13 MFCC features
-    y = np.random.randint(0, 5, 100) # 5 classes
-    return X, y
-
-def build_model(input_shape, num_classes):
-    model = models.Sequential([
-        layers.Input(shape=input_shape),
-        layers.Dense(128, activation='relu'),
-        layers.Dropout(0.3),
-        layers.Dense(64, activation='relu'),
-        layers.Dense(num_classes, activation='softmax')
-    ])
-    
+from feature_store import FeatureStore
+from services.audio_processor import N_MFCC
+from services.ai_classifier import ANIMALS, EMOTIONS
+
+ANIMAL_INDEX = {animal: i for i, animal in enumerate(ANIMALS)}
+EMOTION_INDEX = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+
+def head_labels(animals, emotions):
+    return {
+        "animal": np.array([ANIMAL_INDEX[a] for a in animals], dtype=np.int32),
+        "emotion": np.array([EMOTION_INDEX[e] for e in emotions], dtype=np.int32),
+    }
+
+def load_dataset(data_path, store_path="feature_store", workers=None, batch_size=32):
+    # Extract features for new or changed clips, then stream from the store
+    store = FeatureStore(store_path)
+    stats = store.sync(data_path, workers=workers)
+    print(f"Feature store: {stats['total']} clips ({stats['extracted']} extracted, {stats['failed']} failed)")
+
+    # Clips labelled with animals or emotions the classifier doesn't know can't be trained on
+    keep = lambda animal, emotion: animal in ANIMAL_INDEX and emotion in EMOTION_INDEX
+    dataset = store.as_tf_dataset(head_labels, batch_size=batch_size, keep=keep)
+    return dataset, len(store.index(keep))
+
+def build_model(input_shape, num_animals=len(ANIMALS), num_emotions=len(EMOTIONS)):
+    # Shared trunk, one softmax head per label: one forward pass serves both predictions.
+    # Output order matches EmotionClassifier._decode_prediction: [animal, emotion]
+    inputs = layers.Input(shape=input_shape, name="features")
+    x = layers.Dense(128, activation='relu')(inputs)
+    x = layers.Dropout(0.3)(x)
+    x = layers.Dense(64, activation='relu')(x)
+    animal = layers.Dense(num_animals, activation='softmax', name='animal')(x)
+    emotion = layers.Dense(num_emotions, activation='softmax', name='emotion')(x)
+    model = models.Model(inputs=inputs, outputs=[animal, emotion])
+
     model.compile(optimizer='adam',
-                  loss='sparse_categorical_crossentropy',
-                  metrics=['accuracy'])
+                  loss={'animal': 'sparse_categorical_crossentropy',
+                        'emotion': 'sparse_categorical_crossentropy'},
+                  metrics={'animal': 'accuracy', 'emotion': 'accuracy'})
     return model
 
+def export_model(model, output_path):
+    # Inference-only copy: no optimizer slots, so it is smaller and loads faster
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    model.save(output_path, include_optimizer=False)
+
+def benchmark_inference(model_path, batch_sizes=(1, 8, 64, 256), repeats=50):
+    """Time the serving classifier's forward pass on the exported model."""
+    from services.ai_classifier import EmotionClassifier
+
+    serving = EmotionClassifier(model_path=model_path, backend="keras")
+    if not serving.model_loaded:
+        raise RuntimeError(f"Serving classifier could not load {model_path}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>6} {'ms/call':>10} {'ms/row':>10}")
+    for batch_size in batch_sizes:
+        batch = rng.normal(0, 10, (batch_size, N_MFCC)).astype(np.float32)
+        run = serving.predict if batch_size == 1 else serving.predict_batch
+        sample = batch[0] if batch_size == 1 else batch
+        run(sample)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            run(sample)
+        per_call = 1000 * (time.perf_counter() - start) / repeats
+        print(f"{batch_size:>6} {per_call:>10.3f} {per_call / batch_size:>10.4f}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the animal/emotion classifier")
+    parser.add_argument("data", nargs="?", default="data/train",
+                        help="Labelled clips: <Animal>/<Emotion>/clip.wav or animal-emotion-*.wav")
+    parser.add_argument("--store", default="feature_store", help="Feature store directory")
+    parser.add_argument("--workers", type=int, default=None, help="Feature extraction processes")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", default="models/emotion_classifier.h5")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time single-row and batched inference on the exported model")
+    args = parser.parse_args()
+
     print("Starting training pipeline...")
-    
+
     # 1. Load Data
-    X_train, y_train = load_dataset("data/train")
-    
+    dataset, n_clips = load_dataset(args.data, args.store, args.workers, args.batch_size)
+
     # 2. Build Model
-    model = build_model((13,), 5)
+    model = build_model((N_MFCC,))
     model.summary()
-    
-    # 3. Train
-    # model.fit(X_train, y_train, epochs=10, batch_size=32)
-    
-    # 4. Save
-    # model.save("models/emotion_classifier.h5")
-    print("Training complete (simulation). Model structure defined.")
+
+    if n_clips == 0:
+        print(f"No labelled clips found under {args.data}. Model structure defined, nothing to train.")
+    else:
+        # 3. Train
+        model.fit(dataset, epochs=args.epochs)
+
+        # 4. Save
+        export_model(model, args.output)
+        print(f"Training complete. Model saved to {args.output}")
+
+        if args.benchmark:
+            benchmark_inference(args.output)
@@ -340,6 +340,7 @@ function AppContent() {
                                     <AudioRecorder
                                         onRecordingComplete={handleRecordingComplete}
                                         isProcessing={isProcessing}
+                                        apiBase={API_BASE}
                                     />
                                 </motion.div>
                             ) : (
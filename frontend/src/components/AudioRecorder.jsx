@@ -2,14 +2,87 @@ import React, { useState, useRef, useCallback } from 'react';
 import { Mic, Square, Loader2, Upload, X } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
 
-const AudioRecorder = ({ onRecordingComplete, isProcessing }) => {
+// Build the live-classification WebSocket URL from the API base
+const getListenUrl = (apiBase) => {
+    const base = apiBase || window.location.origin;
+    return `${base.replace(/^http/, 'ws')}/ws/listen`;
+};
+
+const AudioRecorder = ({ onRecordingComplete, isProcessing, apiBase = '' }) => {
     const [isRecording, setIsRecording] = useState(false);
     const [recordingTime, setRecordingTime] = useState(0);
     const [isDragOver, setIsDragOver] = useState(false);
+    const [liveResult, setLiveResult] = useState(null);
     const mediaRecorderRef = useRef(null);
     const chunksRef = useRef([]);
     const timerRef = useRef(null);
     const fileInputRef = useRef(null);
+    const socketRef = useRef(null);
+    const audioContextRef = useRef(null);
+    const processorRef = useRef(null);
+
+    // Stream raw PCM to the backend while recording for live guesses.
+    // Best-effort: the full clip is still uploaded when recording stops.
+    const startLiveStream = (stream) => {
+        try {
+            const socket = new WebSocket(getListenUrl(apiBase));
+            socket.binaryType = 'arraybuffer';
+            socketRef.current = socket;
+
+            const audioContext = new (window.AudioContext || window.webkitAudioContext)();
+            audioContextRef.current = audioContext;
+            const source = audioContext.createMediaStreamSource(stream);
+            const processor = audioContext.createScriptProcessor(4096, 1, 1);
+            processorRef.current = processor;
+
+            socket.onopen = () => {
+                socket.send(JSON.stringify({
+                    type: 'config',
+                    sample_rate: audioContext.sampleRate,
+                    encoding: 'pcm16',
+                }));
+            };
+
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'classification' || message.type === 'final') {
+                    setLiveResult(message.data);
+                }
+            };
+
+            processor.onaudioprocess = (event) => {
+                if (socket.readyState !== WebSocket.OPEN) return;
+                const input = event.inputBuffer.getChannelData(0);
+                const pcm = new Int16Array(input.length);
+                for (let i = 0; i < input.length; i++) {
+                    const sample = Math.max(-1, Math.min(1, input[i]));
+                    pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+                }
+                socket.send(pcm.buffer);
+            };
+
+            source.connect(processor);
+            processor.connect(audioContext.destination);
+        } catch (err) {
+            console.warn("Live classification unavailable:", err);
+        }
+    };
+
+    const stopLiveStream = () => {
+        if (processorRef.current) {
+            processorRef.current.disconnect();
+            processorRef.current = null;
+        }
+        if (audioContextRef.current) {
+            audioContextRef.current.close();
+            audioContextRef.current = null;
+        }
+        const socket = socketRef.current;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'stop' }));
+        }
+        socketRef.current = null;
+    };
 
     const startRecording = async () => {
         try {
@@ -38,6 +111,8 @@ const AudioRecorder = ({ onRecordingComplete, isProcessing }) => {
 
             mediaRecorderRef.current.start(100); // Collect data every 100ms
             setIsRecording(true);
+            setLiveResult(null);
+            startLiveStream(stream);
 
             // Start timer
             timerRef.current = setInterval(() => {
@@ -55,6 +130,7 @@ const AudioRecorder = ({ onRecordingComplete, isProcessing }) => {
             mediaRecorderRef.current.stop();
             setIsRecording(false);
             clearInterval(timerRef.current);
+            stopLiveStream();
 
             // Stop all tracks
             mediaRecorderRef.current.stream.getTracks().forEach(track => track.stop());
@@ -187,6 +263,20 @@ const AudioRecorder = ({ onRecordingComplete, isProcessing }) => {
                 )}
             </AnimatePresence>
 
+            {/* Live guess while recording */}
+            <AnimatePresence>
+                {isRecording && liveResult && (
+                    <motion.p
+                        initial={{ opacity: 0 }}
+                        animate={{ opacity: 1 }}
+                        exit={{ opacity: 0 }}
+                        className="text-sm text-text-secondary text-center"
+                    >
+                        Hearing: {liveResult.animal} · {liveResult.emotion} ({Math.round(liveResult.confidence * 100)}%)
+                    </motion.p>
+                )}
+            </AnimatePresence>
+
             {/* Status Text */}
             <motion.p
                 className="text-text-secondary font-medium text-center"
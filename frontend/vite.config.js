@@ -19,6 +19,10 @@ export default defineConfig({
                 changeOrigin: true,
                 secure: false,
             },
+            '/ws': {
+                target: 'ws://localhost:8000',
+                ws: true,
+            },
             '/health': {
                 target: 'http://localhost:8000',
                 changeOrigin: true,